@@ -0,0 +1,107 @@
+"""
+Tiempo de arranque en frío: importa cada módulo de entrada en un intérprete nuevo
+(python -X importtime) y muestra la mediana de varias ejecuciones y qué dependencias
+pesadas quedan cargadas solo por importar. Termina con código 1 si alguna se carga al
+importar o si se supera --max-ms.
+
+Con --comparar <ref> mide también el árbol de ese commit (extraído con git archive)
+para ver la diferencia, p. ej. --comparar HEAD~1.
+
+Uso: python benchmarks/arranque.py [--modulos main,lotes] [--repeticiones 5] [--max-ms 300]
+        [--comparar <ref>]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MODULOS_POR_DEFECTO = "main,lotes,servicio,scripts.resumidor_ia,scripts.lote_openai"
+# Se importan al primer uso; cargarlas solo por importar un módulo es una regresión
+DEPENDENCIAS_PESADAS = ("openai", "fitz", "pymupdf", "docx", "tiktoken")
+
+SONDA = (
+    "import sys, json; import {modulo}; "
+    "print(json.dumps(sorted({{m.split('.')[0] for m in sys.modules}})))"
+)
+
+def medir_importacion(modulo: str, raiz: str) -> tuple[float, list[str]]:
+    """Milisegundos que tarda `import modulo` en frío y dependencias pesadas que arrastra."""
+    # Los árboles antiguos crean el cliente al importar y necesitan una clave
+    entorno = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "arranque"), "PYTHONDONTWRITEBYTECODE": "1"}
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", SONDA.format(modulo=modulo)],
+                             cwd=raiz, env=entorno, capture_output=True, text=True)
+    if proceso.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}: {proceso.stderr.strip().splitlines()[-1]}")
+
+    # Cada línea: "import time: propio | acumulado | módulo", con las importaciones anidadas
+    # sangradas; se suman las de primer nivel del módulo y sus paquetes padre
+    partes = modulo.split(".")
+    propios = {".".join(partes[:i]) for i in range(1, len(partes) + 1)}
+    microsegundos = 0
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or linea.count("|") != 2:
+            continue
+        _, acumulado, nombre = linea.split("|")
+        if nombre[1:] in propios:
+            microsegundos += int(acumulado)
+    cargados = json.loads(proceso.stdout.strip().splitlines()[-1])
+    return microsegundos / 1000, [d for d in DEPENDENCIAS_PESADAS if d in cargados]
+
+def medir_arbol(modulos: list[str], raiz: str, repeticiones: int) -> dict:
+    resultados = {}
+    for modulo in modulos:
+        medidas = [medir_importacion(modulo, raiz) for _ in range(repeticiones)]
+        resultados[modulo] = {
+            "ms": round(statistics.median(m[0] for m in medidas), 1),
+            "pesadas": medidas[0][1],
+        }
+    return resultados
+
+def extraer_commit(ref: str, destino: str):
+    archivo = subprocess.run(["git", "archive", ref], cwd=RAIZ, capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", destino], input=archivo, check=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modulos", default=MODULOS_POR_DEFECTO)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=0, help="Tope de la mediana por módulo (0 = sin tope)")
+    parser.add_argument("--comparar", help="Commit con el que comparar, p. ej. HEAD~1")
+    args = parser.parse_args(argv)
+    modulos = [m.strip() for m in args.modulos.split(",") if m.strip()]
+
+    actual = medir_arbol(modulos, RAIZ, args.repeticiones)
+    anterior = {}
+    if args.comparar:
+        with tempfile.TemporaryDirectory() as carpeta:
+            extraer_commit(args.comparar, carpeta)
+            anterior = medir_arbol(modulos, carpeta, args.repeticiones)
+
+    print(f"\n🚀 Importación en frío (mediana de {args.repeticiones}):")
+    fallos = []
+    for modulo, r in actual.items():
+        linea = f"   {modulo:<24} {r['ms']:8.1f} ms"
+        if modulo in anterior:
+            previo = anterior[modulo]["ms"]
+            linea += f"   ({args.comparar}: {previo:.1f} ms, {previo / r['ms']:.1f}x)" if r["ms"] else ""
+        if r["pesadas"]:
+            linea += f"   ⚠️ carga {', '.join(r['pesadas'])}"
+            fallos.append(f"{modulo} importa {', '.join(r['pesadas'])} al cargarse")
+        if args.max_ms and r["ms"] > args.max_ms:
+            fallos.append(f"{modulo} tarda {r['ms']:.0f} ms (tope {args.max_ms:.0f} ms)")
+        print(linea)
+
+    if fallos:
+        print("\n❌ Arranque lento:")
+        for f in fallos:
+            print(f"   - {f}")
+        return 1
+    print("\n✅ Ninguna dependencia pesada se carga al importar.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Benchmark de extracción: compara la extracción secuencial original (concatenación
+con `+=`, un solo núcleo) con `extraer_documentos` en paralelo por rangos de páginas.
+
+Uso: python benchmarks/bench_extraccion.py [--paginas 500] [--documentos 2] [--procesos N]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import fitz  # PyMuPDF
+import scripts.extractor_texto as extractor_texto
+from scripts.extractor_texto import extraer_documentos, unir_textos_documentos, MAX_PROCESOS_EXTRACCION
+
+# Se compara texto idéntico al del extractor original: sin quitar cabeceras ni pies repetidos
+extractor_texto.QUITAR_REPETIDAS = False
+
+PARRAFO = (
+    "Artículo {n}. Podrán ser beneficiarias de estas ayudas las personas físicas que cumplan "
+    "los requisitos establecidos en la presente orden. La cuantía de la ayuda será de 1.500,00 € "
+    "por hijo nacido o adoptado, incrementándose en 500 € en el caso de familias numerosas. "
+)
+
+def generar_pdf(ruta: str, paginas: int):
+    with fitz.open() as doc:
+        for n in range(paginas):
+            pagina = doc.new_page()
+            pagina.insert_textbox(fitz.Rect(50, 50, 550, 800), PARRAFO.format(n=n + 1) * 12, fontsize=9)
+        doc.save(ruta)
+
+def extraer_secuencial_original(rutas: list[str]) -> str:
+    # Réplica del extractor anterior: un documento tras otro y `texto +=` por página
+    textos = []
+    for i, ruta in enumerate(rutas):
+        texto = ""
+        with fitz.open(ruta) as doc:
+            for pagina in doc:
+                texto += pagina.get_text()
+        textos.append(f"--- DOCUMENTO {i+1} ({os.path.basename(ruta)}) ---\n{texto.strip()}")
+    return "\n\n".join(textos)
+
+def cronometrar(funcion, repeticiones: int = 3):
+    mejor = float("inf")
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, default=500)
+    parser.add_argument("--documentos", type=int, default=2)
+    parser.add_argument("--procesos", type=int, default=MAX_PROCESOS_EXTRACCION)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        rutas = [os.path.join(carpeta, f"boletin_{i+1}.pdf") for i in range(args.documentos)]
+        for ruta in rutas:
+            generar_pdf(ruta, args.paginas)
+
+        t_original, texto_original = cronometrar(lambda: extraer_secuencial_original(rutas))
+        t_nuevo, texto_nuevo = cronometrar(lambda: unir_textos_documentos(extraer_documentos(rutas, args.procesos)))
+
+    assert texto_original == texto_nuevo, "El texto extraído difiere del extractor original"
+    print(f"📄 {args.documentos} documentos x {args.paginas} páginas, {args.procesos} procesos")
+    print(f"   Original (secuencial): {t_original:.2f}s")
+    print(f"   Paralelo por páginas:  {t_nuevo:.2f}s")
+    print(f"   Aceleración: x{t_original / t_nuevo:.2f}")
+
+if __name__ == "__main__":
+    main()
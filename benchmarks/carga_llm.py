@@ -0,0 +1,71 @@
+"""
+Prueba de carga de las llamadas al modelo contra scripts/servidor_simulado.py: mide
+rendimiento, latencia y reintentos de resumir_chunks con la concurrencia indicada,
+sin red ni coste. Con --grabar, las respuestas quedan en FICHAS_GRABACIONES_DIR para
+reproducirlas después con FICHAS_TRANSPORTE_LLM=reproducir.
+
+Uso: python benchmarks/carga_llm.py [--chunks 40] [--concurrencia 4] [--latencia 0.5]
+        [--errores 0.05] [--limite 0.05] [--max-concurrencia 6] [--grabar]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("OPENAI_API_KEY", "simulado")
+
+from openai import OpenAI
+import scripts.resumidor_ia as resumidor
+from scripts.metricas import MetricasEjecucion
+from scripts.servidor_simulado import SimuladorOpenAI, iniciar_servidor
+from scripts.transporte_llm import TransporteOpenAI, TransporteGrabacion
+
+PARRAFO = (
+    "Artículo {n}. Podrán ser beneficiarias de estas ayudas las personas físicas que cumplan "
+    "los requisitos establecidos en la presente orden. La cuantía de la ayuda será de 1.500,00 € "
+    "por hijo nacido o adoptado. El plazo de presentación de solicitudes será de un mes. "
+)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=40)
+    parser.add_argument("--concurrencia", type=int, default=resumidor.MAX_CONCURRENCIA)
+    parser.add_argument("--latencia", type=float, default=0.5)
+    parser.add_argument("--variacion", type=float, default=0.2)
+    parser.add_argument("--errores", type=float, default=0.05)
+    parser.add_argument("--limite", type=float, default=0.05)
+    parser.add_argument("--max-concurrencia", type=int, default=0)
+    parser.add_argument("--grabar", action="store_true")
+    args = parser.parse_args()
+
+    simulador = SimuladorOpenAI(args.latencia, args.variacion, args.errores, args.limite,
+                                args.max_concurrencia, retry_after=0.2, semilla=1)
+    servidor = iniciar_servidor(simulador)
+    cliente = OpenAI(base_url=f"http://127.0.0.1:{servidor.server_address[1]}/v1", api_key="simulado", max_retries=0)
+    transporte = TransporteOpenAI(cliente)
+    resumidor.configurar_transporte(TransporteGrabacion(transporte) if args.grabar else transporte)
+    # Sin caché: cada chunk debe llegar al servidor
+    resumidor.cache = None
+
+    chunks = [PARRAFO.format(n=i + 1) * 20 for i in range(args.chunks)]
+    metricas = MetricasEjecucion("carga")
+    with tempfile.TemporaryDirectory() as carpeta:
+        inicio = time.perf_counter()
+        with metricas.etapa("resumen"):
+            resumenes = resumidor.resumir_chunks(chunks, "carga", args.concurrencia, carpeta_salida=carpeta, metricas=metricas)
+        duracion = time.perf_counter() - inicio
+    servidor.shutdown()
+
+    r = metricas.resumen()
+    print(f"\n🧪 {args.chunks} chunks, concurrencia {args.concurrencia}, latencia {args.latencia}s, "
+          f"errores {args.errores:.0%}, 429 {args.limite:.0%}")
+    print(f"   Duración: {duracion:.2f}s ({args.chunks / duracion:.1f} chunks/s)")
+    print(f"   Correctos: {sum(1 for x in resumenes if x)}/{args.chunks}, reintentos: {r['contadores'].get('reintentos', 0)}, "
+          f"errores: {r['contadores'].get('errores', 0)}")
+    print(f"   Latencia p50 {r['latencia_p50']:.2f}s, p95 {r['latencia_p95']:.2f}s, máx {r['latencia_max']:.2f}s")
+    print(f"   Servidor: {simulador.estadisticas()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Generador de convocatorias sintéticas con estructura legal realista (título, preámbulo,
+artículos con apartados, tablas de cuantías en euros, disposiciones y anexo-formulario)
+en PDF y DOCX del número de páginas indicado. Es determinista para una misma semilla.
+
+Uso: python benchmarks/corpus_sintetico.py carpeta_destino [--paginas 100] [--semilla 1]
+"""
+import os
+import sys
+import random
+import argparse
+
+import fitz  # PyMuPDF
+from docx import Document
+
+MATERIAS = [
+    ("natalidad", "las familias residentes con hijas o hijos nacidos o adoptados"),
+    ("alquiler de vivienda habitual", "las personas arrendatarias menores de 35 años"),
+    ("eficiencia energética", "las comunidades de propietarios y personas físicas"),
+    ("atención a la dependencia", "las personas cuidadoras en el entorno familiar"),
+]
+ORGANOS = ["Consejería de Salud y Servicios Sociales", "Consejería de Hacienda y Administración Pública",
+           "Consejería de Infraestructuras, Transporte y Vivienda"]
+NORMAS = [
+    "Ley 38/2003, de 17 de noviembre, General de Subvenciones",
+    "Ley 39/2015, de 1 de octubre, del Procedimiento Administrativo Común de las Administraciones Públicas",
+    "Real Decreto 887/2006, de 21 de julio, por el que se aprueba el Reglamento de la Ley General de Subvenciones",
+    "Ley 6/2011, de 23 de marzo, de Subvenciones de la Comunidad Autónoma de Extremadura",
+    "Ley Orgánica 3/2018, de 5 de diciembre, de Protección de Datos Personales y garantía de los derechos digitales",
+]
+ARTICULOS = [
+    ("Objeto y finalidad", "El presente decreto tiene por objeto establecer las bases reguladoras de las ayudas para {materia}, "
+     "con la finalidad de apoyar a {destinatarios} en el ámbito de la Comunidad Autónoma."),
+    ("Personas beneficiarias", "Podrán ser beneficiarias de estas ayudas {destinatarios} que cumplan los requisitos "
+     "establecidos en el artículo siguiente a la fecha de presentación de la solicitud."),
+    ("Requisitos", "Las personas solicitantes deberán reunir los siguientes requisitos: a) Estar empadronadas en cualquier "
+     "municipio de la Comunidad Autónoma con una antigüedad mínima de un año. b) Hallarse al corriente de sus obligaciones "
+     "tributarias y con la Seguridad Social. c) No estar incursas en ninguna de las circunstancias del artículo 13 de la {norma}."),
+    ("Cuantía de las ayudas", "La cuantía de la ayuda será de {importe} euros por persona beneficiaria, incrementándose en "
+     "{incremento} € en el caso de familias numerosas o monoparentales, con un importe máximo de {maximo} euros."),
+    ("Plazo de presentación", "El plazo de presentación de solicitudes será desde el {inicio} hasta el {fin}, ambos inclusive. "
+     "Las solicitudes presentadas fuera de plazo serán inadmitidas mediante resolución expresa."),
+    ("Documentación", "La solicitud deberá acompañarse de la siguiente documentación: copia del DNI o NIE de la persona "
+     "solicitante, certificado de empadronamiento, libro de familia y declaración responsable de no estar incursa en causa de prohibición."),
+    ("Lugar de presentación", "Las solicitudes se presentarán en la sede electrónica de la Junta de Extremadura o en cualquiera "
+     "de las oficinas de registro previstas en el artículo 16.4 de la {norma}."),
+    ("Procedimiento de concesión", "El procedimiento se tramitará en régimen de concurrencia competitiva. Los criterios de "
+     "valoración serán la renta de la unidad familiar y el número de miembros, con una puntuación máxima de 100 puntos."),
+    ("Resolución", "La persona titular de la {organo} dictará resolución en el plazo máximo de seis meses. Transcurrido dicho plazo "
+     "sin notificación expresa, la solicitud se entenderá desestimada por silencio administrativo."),
+    ("Financiación", "Las ayudas se financiarán con cargo a la aplicación presupuestaria 11.03.252B.489.00 con un crédito "
+     "total de {credito} euros para la presente convocatoria."),
+]
+MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+
+# Caracteres por página aproximados con el formato de generar_pdf
+CARACTERES_POR_PAGINA = 3000
+
+def formatear_euros(valor: float) -> str:
+    entero, decimales = f"{valor:,.2f}".split(".")
+    return f"{entero.replace(',', '.')},{decimales}"
+
+def fecha_aleatoria(azar: random.Random, anio: int) -> str:
+    return f"{azar.randint(1, 28)} de {azar.choice(MESES)} de {anio}"
+
+def generar_bloques(paginas: int, semilla: int = 1) -> list[tuple[str, object]]:
+    """
+    Contenido de la convocatoria como lista de (tipo, contenido): "titulo", "encabezado",
+    "parrafo" o "tabla" (lista de filas). El volumen de texto se ajusta a `paginas`.
+    """
+    azar = random.Random(semilla)
+    materia, destinatarios = azar.choice(MATERIAS)
+    organo = azar.choice(ORGANOS)
+    anio = azar.randint(2023, 2026)
+    bloques = [
+        ("titulo", f"DECRETO {azar.randint(10, 300)}/{anio}, de {fecha_aleatoria(azar, anio)}, por el que se establecen "
+                   f"las bases reguladoras de las ayudas para {materia} y se aprueba la convocatoria para el año {anio}."),
+        ("parrafo", f"La {organo} considera necesario articular un régimen de ayudas destinado a {destinatarios}. "
+                    f"De conformidad con la {azar.choice(NORMAS)}, y en virtud de las competencias atribuidas, DISPONGO:"),
+    ]
+
+    caracteres = 0
+    articulo = 0
+    while caracteres < paginas * CARACTERES_POR_PAGINA:
+        articulo += 1
+        titulo, plantilla = ARTICULOS[(articulo - 1) % len(ARTICULOS)]
+        importe = azar.choice([300, 500, 750, 1000, 1500, 3000])
+        texto = plantilla.format(
+            materia=materia, destinatarios=destinatarios, organo=organo, norma=azar.choice(NORMAS),
+            importe=formatear_euros(importe), incremento=formatear_euros(importe / 2),
+            maximo=formatear_euros(importe * 3), credito=formatear_euros(azar.randint(100, 5000) * 1000),
+            inicio=fecha_aleatoria(azar, anio), fin=fecha_aleatoria(azar, anio),
+        )
+        apartados = [f"{n}. {texto}" for n in range(1, azar.randint(2, 4) + 1)]
+        bloques.append(("encabezado", f"Artículo {articulo}. {titulo}."))
+        bloques.extend(("parrafo", a) for a in apartados)
+        caracteres += len(titulo) + sum(len(a) for a in apartados)
+
+        if titulo == "Cuantía de las ayudas":
+            filas = [["Concepto", "Importe"]] + [
+                [f"Tramo {t} de renta", f"{formatear_euros(importe * (1 + t / 4))} €"] for t in range(1, 5)
+            ]
+            bloques.append(("tabla", filas))
+            caracteres += 200
+
+    bloques.append(("encabezado", "Disposición final única. Entrada en vigor."))
+    bloques.append(("parrafo", "El presente decreto entrará en vigor el día siguiente al de su publicación en el Diario Oficial de Extremadura."))
+    bloques.append(("encabezado", "ANEXO I. MODELO DE SOLICITUD"))
+    bloques.extend(("parrafo", f"{campo}: ______________________________")
+                   for campo in ["Nombre y apellidos", "DNI/NIE", "Domicilio", "Teléfono", "Correo electrónico", "Firma"])
+    return bloques
+
+def texto_tabla(filas: list[list[str]]) -> str:
+    return "\n".join("    ".join(f"{celda:<30}" for celda in fila) for fila in filas)
+
+def generar_pdf(ruta: str, paginas: int, semilla: int = 1) -> str:
+    # TextWriter con fuentes Font admite "€" y tildes, que insert_textbox no codifica con las base-14
+    fuente, fuente_tabla = fitz.Font("helv"), fitz.Font("cour")
+    with fitz.open() as doc:
+        pagina, y = doc.new_page(), 50
+        escritor = fitz.TextWriter(pagina.rect)
+        for tipo, contenido in generar_bloques(paginas, semilla):
+            texto = texto_tabla(contenido) if tipo == "tabla" else contenido
+            tamano = 11 if tipo in ("titulo", "encabezado") else 9
+            alto = 14 * (len(texto) // 95 + texto.count("\n") + 1)
+            if y + alto > 800:
+                escritor.write_text(pagina)
+                pagina, y = doc.new_page(), 50
+                escritor = fitz.TextWriter(pagina.rect)
+            escritor.fill_textbox(fitz.Rect(50, y, 550, y + alto), texto, fontsize=tamano,
+                                  font=fuente_tabla if tipo == "tabla" else fuente)
+            y += alto + 6
+        escritor.write_text(pagina)
+        doc.save(ruta)
+    return ruta
+
+def generar_docx(ruta: str, paginas: int, semilla: int = 1) -> str:
+    doc = Document()
+    for tipo, contenido in generar_bloques(paginas, semilla):
+        if tipo == "titulo":
+            doc.add_heading(contenido, level=1)
+        elif tipo == "encabezado":
+            doc.add_heading(contenido, level=2)
+        elif tipo == "tabla":
+            tabla = doc.add_table(rows=len(contenido), cols=len(contenido[0]))
+            for fila, valores in zip(tabla.rows, contenido):
+                for celda, valor in zip(fila.cells, valores):
+                    celda.text = valor
+        else:
+            doc.add_paragraph(contenido)
+    doc.save(ruta)
+    return ruta
+
+def generar_corpus(carpeta: str, paginas: int, semilla: int = 1) -> list[str]:
+    """Una convocatoria en PDF de `paginas` páginas y su anexo en DOCX (una décima parte)."""
+    os.makedirs(carpeta, exist_ok=True)
+    return [
+        generar_pdf(os.path.join(carpeta, f"convocatoria_{paginas}p.pdf"), paginas, semilla),
+        generar_docx(os.path.join(carpeta, f"anexo_{paginas}p.docx"), max(1, paginas // 10), semilla + 1),
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("carpeta")
+    parser.add_argument("--paginas", type=int, default=100)
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args(argv)
+    for ruta in generar_corpus(args.carpeta, args.paginas, args.semilla):
+        print(f"📄 {ruta}")
+
+if __name__ == "__main__":
+    sys.exit(main())
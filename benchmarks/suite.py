@@ -0,0 +1,285 @@
+"""
+Banco de pruebas de rendimiento sobre convocatorias sintéticas (corpus_sintetico.py):
+mide cada etapa (extracción, troceado, fusión, limpieza y Word) y el proceso completo
+con un modelo simulado, sin red ni coste. Cada medida se toma en un proceso hijo para
+que el pico de memoria (RSS) sea el de esa etapa.
+
+Los resultados se comparan con benchmarks/lineas_base.json: si alguna etapa tarda o
+consume más de lo tolerado, termina con código 1. Las líneas base dependen de la
+máquina, así que se generan en cada equipo con --guardar-linea-base.
+
+Uso: python benchmarks/suite.py [--paginas 10,100] [--etapas extraccion,pipeline]
+        [--repeticiones 3] [--tolerancia 0.25] [--guardar-linea-base] [--json resultados.json]
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+
+try:
+    import resource
+except ImportError:  # Windows: sin getrusage, el pico de memoria no se mide
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "simulado")
+
+from openai.types.chat import ChatCompletion
+from corpus_sintetico import generar_corpus
+from scripts.extractor_texto import extraer_textos_unificados
+from scripts.chunker import dividir_en_chunks
+from scripts.fusionador import fusionar_jsons
+from scripts.limpiador_json import sanear_json_final
+from scripts.generar_docx import generar_docx_desde_json
+from scripts.prompt_ia import cargar_plantilla_json
+from scripts.servidor_simulado import construir_respuesta
+import scripts.resumidor_ia as resumidor
+import scripts.almacen as almacen
+from main import procesar_convocatoria
+
+RUTA_LINEAS_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lineas_base.json")
+PAGINAS_POR_DEFECTO = "10,100"
+# Margen absoluto además del relativo: en etapas de milisegundos el ruido supera el 25 %
+HOLGURA_SEGUNDOS = 0.05
+HOLGURA_RSS_MB = 20.0
+
+PATRON_IMPORTE = re.compile(r"\d{1,3}(?:\.\d{3})*,\d{2}\s*€")
+
+def ficha_sintetica(texto: str) -> dict:
+    """Respuesta determinista del modelo simulado: rellena la plantilla con datos del chunk."""
+    semilla = int(hashlib.sha256(texto.encode("utf-8")).hexdigest()[:8], 16)
+    ficha = cargar_plantilla_json()
+    importes = PATRON_IMPORTE.findall(texto)[:4]
+    ficha.update({
+        "denominacion_normativa_nombre_ayuda": texto[:120].strip(),
+        "descripcion": " ".join(texto.split()[:60]),
+        "requisitos_acceso": f"- Requisito {semilla % 7}: estar empadronado con una antigüedad mínima de un año.",
+        "cuantia": [{"concepto": f"Tramo {i + 1}", "valor": importe, "unidad": "por persona"} for i, importe in enumerate(importes)],
+        "importe_maximo": [{"concepto": "Máximo por solicitud", "cantidad": importes[-1]}] if importes else [],
+        "documentos_presentar": [{"clave": "DNI o NIE", "valor": "Copia"}, {"clave": f"Anexo {semilla % 3 + 1}", "valor": "Original"}],
+        "plazo_presentacion": "Un mes desde la publicación" if semilla % 2 else "",
+    })
+    return ficha
+
+class TransporteSimulado:
+    """Sustituye a la API: responde al instante (o tras `latencia`) con ficha_sintetica."""
+
+    def __init__(self, latencia: float = 0.0):
+        self.latencia = latencia
+
+    def completar(self, peticion: dict):
+        if self.latencia:
+            time.sleep(self.latencia)
+        texto = peticion["messages"][-1]["content"]
+        contenido = json.dumps(ficha_sintetica(texto), ensure_ascii=False)
+        return ChatCompletion.model_validate(construir_respuesta(peticion, contenido))
+
+def pico_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+def escribir_partes(carpeta: str, nombre_base: str, chunks: list[str]):
+    os.makedirs(carpeta, exist_ok=True)
+    for i, chunk in enumerate(chunks, start=1):
+        with open(os.path.join(carpeta, f"{nombre_base}_parte{i}_resumen.json"), "w", encoding="utf-8") as f:
+            json.dump(ficha_sintetica(chunk), f, ensure_ascii=False)
+
+# Cada etapa prepara sus entradas sin cronometrar y devuelve (segundos, unidades procesadas)
+def etapa_extraccion(rutas, carpeta, latencia):
+    _, segundos = cronometrar(extraer_textos_unificados, rutas)
+    return segundos, {}
+
+def etapa_chunking(rutas, carpeta, latencia):
+    texto = extraer_textos_unificados(rutas)
+    chunks, segundos = cronometrar(dividir_en_chunks, texto)
+    return segundos, {"chunks": len(chunks)}
+
+def etapa_fusion(rutas, carpeta, latencia):
+    chunks = dividir_en_chunks(extraer_textos_unificados(rutas))
+    escribir_partes(carpeta, "bench", chunks)
+    _, segundos = cronometrar(fusionar_jsons, "bench", carpeta)
+    return segundos, {"partes": len(chunks)}
+
+def json_fusionado(rutas, carpeta) -> dict:
+    etapa_fusion(rutas, carpeta, 0)
+    with open(os.path.join(carpeta, "bench_fusionado.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def etapa_limpieza(rutas, carpeta, latencia):
+    data = json_fusionado(rutas, carpeta)
+    _, segundos = cronometrar(sanear_json_final, data)
+    return segundos, {}
+
+def etapa_docx(rutas, carpeta, latencia):
+    ruta_limpio = os.path.join(carpeta, "bench_limpio.json")
+    with open(ruta_limpio, "w", encoding="utf-8") as f:
+        json.dump(sanear_json_final(json_fusionado(rutas, carpeta)), f, ensure_ascii=False)
+    _, segundos = cronometrar(generar_docx_desde_json, ruta_limpio, os.path.join(carpeta, "docx"))
+    return segundos, {}
+
+def etapa_pipeline(rutas, carpeta, latencia):
+    # Sin caché de respuestas, manifiesto previo ni almacén con convocatorias anteriores:
+    # cada ejecución recorre todas las etapas
+    resumidor.cache = None
+    almacen.RUTA_ALMACEN = os.path.join(carpeta, "almacen.sqlite3")
+    resumidor.configurar_transporte(TransporteSimulado(latencia))
+    carpetas = {nombre: os.path.join(carpeta, nombre) for nombre in ("txt", "json", "docx", "logs")}
+    resultado, segundos = cronometrar(procesar_convocatoria, rutas, "bench", carpetas)
+    if resultado.get("estado") != "ok":
+        raise RuntimeError(f"El proceso completo terminó con estado {resultado.get('estado')}")
+    return segundos, {"chunks": resultado["metricas"]["contadores"].get("chunks", 0)}
+
+ETAPAS = {
+    "extraccion": etapa_extraccion,
+    "chunking": etapa_chunking,
+    "fusion": etapa_fusion,
+    "limpieza": etapa_limpieza,
+    "docx": etapa_docx,
+    "pipeline": etapa_pipeline,
+}
+
+def medir(nombre: str, rutas: list[str], latencia: float, detallado: bool) -> dict:
+    with tempfile.TemporaryDirectory() as carpeta:
+        with open(os.devnull, "w") as nulo, (contextlib.nullcontext() if detallado else contextlib.redirect_stdout(nulo)):
+            segundos, unidades = ETAPAS[nombre](rutas, carpeta, latencia)
+    return {"segundos": round(segundos, 4), "rss_mb": pico_rss_mb(), "unidades": unidades}
+
+def _medir_en_hijo(conexion, *args):
+    try:
+        conexion.send(medir(*args))
+    except Exception as e:
+        conexion.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conexion.close()
+
+def medir_aislado(nombre: str, rutas: list[str], latencia: float, detallado: bool) -> dict:
+    # fork hereda los módulos ya importados, así que no se mide el coste de importar
+    try:
+        contexto = multiprocessing.get_context("fork")
+    except ValueError:
+        return medir(nombre, rutas, latencia, detallado)
+    receptor, emisor = contexto.Pipe(duplex=False)
+    proceso = contexto.Process(target=_medir_en_hijo, args=(emisor, nombre, rutas, latencia, detallado))
+    proceso.start()
+    emisor.close()
+    try:
+        resultado = receptor.recv()
+    except EOFError:
+        resultado = {"error": f"el proceso hijo terminó con código {proceso.exitcode}"}
+    proceso.join()
+    if "error" in resultado:
+        raise RuntimeError(f"Etapa {nombre}: {resultado['error']}")
+    return resultado
+
+def ejecutar_suite(paginas: list[int], etapas: list[str], repeticiones: int, carpeta_corpus: str,
+                   latencia: float = 0.0, detallado: bool = False) -> dict:
+    """
+    Devuelve {"<etapa>@<paginas>": {"segundos", "rss_mb", "paginas_por_segundo", ...}};
+    de varias repeticiones se queda con el tiempo mínimo y el pico de memoria máximo.
+    """
+    resultados = {}
+    for n in paginas:
+        print(f"\n📄 Corpus de {n} páginas...")
+        rutas = generar_corpus(os.path.join(carpeta_corpus, f"{n}p"), n)
+        for nombre in etapas:
+            medidas = [medir_aislado(nombre, rutas, latencia, detallado) for _ in range(repeticiones)]
+            segundos = min(m["segundos"] for m in medidas)
+            resultado = {"segundos": segundos, "rss_mb": max(m["rss_mb"] for m in medidas),
+                         "paginas_por_segundo": round(n / segundos, 1) if segundos else None}
+            for unidad, cantidad in medidas[0]["unidades"].items():
+                resultado[unidad] = cantidad
+                resultado[f"{unidad}_por_segundo"] = round(cantidad / segundos, 1) if segundos else None
+            resultados[f"{nombre}@{n}"] = resultado
+            print(f"   ⏱️ {nombre:<11} {segundos:8.3f}s  {resultado['paginas_por_segundo'] or 0:>8} págs/s  "
+                  f"RSS {resultado['rss_mb']:.0f} MB")
+    return resultados
+
+def comparar_con_lineas_base(resultados: dict, lineas_base: dict, tolerancia: float) -> list[str]:
+    regresiones = []
+    for clave, actual in resultados.items():
+        base = lineas_base.get(clave)
+        if not base:
+            continue
+        limite = base["segundos"] * (1 + tolerancia) + HOLGURA_SEGUNDOS
+        if actual["segundos"] > limite:
+            regresiones.append(f"{clave}: {actual['segundos']:.3f}s frente a {base['segundos']:.3f}s de la línea base")
+        limite_rss = base.get("rss_mb", 0) * (1 + tolerancia) + HOLGURA_RSS_MB
+        if base.get("rss_mb") and actual["rss_mb"] > limite_rss:
+            regresiones.append(f"{clave}: {actual['rss_mb']:.0f} MB frente a {base['rss_mb']:.0f} MB de la línea base")
+    return regresiones
+
+def cargar_lineas_base(ruta: str = RUTA_LINEAS_BASE) -> dict:
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def guardar_lineas_base(resultados: dict, ruta: str = RUTA_LINEAS_BASE):
+    # Se conservan las claves no medidas en esta ejecución (otros tamaños o etapas)
+    lineas_base = {**cargar_lineas_base(ruta), **{c: {"segundos": r["segundos"], "rss_mb": r["rss_mb"]}
+                                                  for c, r in resultados.items()}}
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(lineas_base.items())), f, indent=2, ensure_ascii=False)
+    print(f"💾 Líneas base guardadas en: {ruta}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", default=PAGINAS_POR_DEFECTO, help="Tamaños del corpus, p. ej. 10,100,1000")
+    parser.add_argument("--etapas", default=",".join(ETAPAS))
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Empeoramiento relativo admitido")
+    parser.add_argument("--latencia-llm", type=float, default=0.0, help="Latencia simulada por petición (s)")
+    parser.add_argument("--corpus", help="Carpeta donde generar (y conservar) el corpus")
+    parser.add_argument("--lineas-base", default=RUTA_LINEAS_BASE)
+    parser.add_argument("--guardar-linea-base", action="store_true")
+    parser.add_argument("--json", help="Guarda los resultados en este archivo")
+    parser.add_argument("--detallado", action="store_true", help="Muestra la salida de cada etapa")
+    args = parser.parse_args(argv)
+
+    etapas = [e.strip() for e in args.etapas.split(",") if e.strip()]
+    desconocidas = [e for e in etapas if e not in ETAPAS]
+    if desconocidas:
+        parser.error(f"Etapas desconocidas: {', '.join(desconocidas)} (disponibles: {', '.join(ETAPAS)})")
+    paginas = [int(p) for p in args.paginas.split(",")]
+
+    with tempfile.TemporaryDirectory() as temporal:
+        resultados = ejecutar_suite(paginas, etapas, args.repeticiones, args.corpus or temporal,
+                                    args.latencia_llm, args.detallado)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+    if args.guardar_linea_base:
+        guardar_lineas_base(resultados, args.lineas_base)
+        return 0
+
+    lineas_base = cargar_lineas_base(args.lineas_base)
+    if not lineas_base:
+        print(f"\n⚠️ Sin líneas base en {args.lineas_base}: genera una con --guardar-linea-base.")
+        return 0
+    regresiones = comparar_con_lineas_base(resultados, lineas_base, args.tolerancia)
+    if regresiones:
+        print("\n❌ Regresiones de rendimiento:")
+        for r in regresiones:
+            print(f"   - {r}")
+        return 1
+    print(f"\n✅ Sin regresiones (tolerancia {args.tolerancia:.0%}).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
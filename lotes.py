@@ -0,0 +1,134 @@
+"""
+Modo lote: procesa muchas convocatorias en una sola ejecución.
+
+Cada trabajo es una ayuda (uno o varios PDF/DOCX) y escribe en su propio espacio
+(salidas_json/<trabajo>/, salidas_docx/<trabajo>/, ...). Los trabajos se reparten
+entre `--trabajos` hilos y todas las llamadas al modelo comparten un tope global
+de `--peticiones` peticiones en vuelo.
+
+Uso:
+    python lotes.py <carpeta_con_subcarpetas_por_trabajo> [--trabajos 2] [--peticiones 8]
+    python lotes.py --manifiesto trabajos.json [--trabajos 2] [--peticiones 8]
+
+El manifiesto es una lista JSON de {"nombre": "...", "documentos": ["ruta1.pdf", ...]};
+las rutas relativas se resuelven respecto a la carpeta del manifiesto.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from main import BASE_DIR, carpetas_salida, listar_documentos, procesar_convocatoria
+from scripts.resumidor_ia import configurar_limite_peticiones, MAX_PETICIONES_GLOBALES
+
+def normalizar_nombre_trabajo(nombre: str) -> str:
+    return re.sub(r"[^\w\-]+", "_", nombre.strip()).strip("_") or "trabajo"
+
+def cargar_trabajos_desde_carpeta(carpeta: str) -> list[dict]:
+    trabajos = []
+    for nombre in sorted(os.listdir(carpeta)):
+        ruta = os.path.join(carpeta, nombre)
+        if not os.path.isdir(ruta):
+            continue
+        documentos = listar_documentos(ruta)
+        if documentos:
+            trabajos.append({"nombre": normalizar_nombre_trabajo(nombre), "documentos": documentos})
+        else:
+            print(f"⚠️ Trabajo '{nombre}' sin documentos .pdf o .docx, se omite.")
+    return trabajos
+
+def cargar_trabajos_desde_manifiesto(ruta_manifiesto: str) -> list[dict]:
+    with open(ruta_manifiesto, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("trabajos", [])
+
+    carpeta = os.path.dirname(os.path.abspath(ruta_manifiesto))
+    trabajos = []
+    for i, entrada in enumerate(data):
+        documentos = [d if os.path.isabs(d) else os.path.join(carpeta, d) for d in entrada.get("documentos", [])]
+        trabajos.append({
+            "nombre": normalizar_nombre_trabajo(entrada.get("nombre") or f"trabajo_{i+1}"),
+            "documentos": documentos,
+        })
+    return trabajos
+
+def ejecutar_trabajo(trabajo: dict, metricas=None) -> dict:
+    inicio = time.perf_counter()
+    print(f"🚀 Iniciando trabajo '{trabajo['nombre']}' ({len(trabajo['documentos'])} documentos)")
+    try:
+        resultado = procesar_convocatoria(trabajo["documentos"], "ficha_unificada", carpetas_salida(trabajo["nombre"]),
+                                          trabajo=trabajo["nombre"], metricas=metricas)
+    except Exception as e:
+        print(f"❌ Trabajo '{trabajo['nombre']}' fallido: {e}")
+        resultado = {"estado": "error", "detalle": str(e)}
+    resultado.update({
+        "nombre": trabajo["nombre"],
+        "documentos": [os.path.basename(d) for d in trabajo["documentos"]],
+        "duracion_s": round(time.perf_counter() - inicio, 2),
+    })
+    return resultado
+
+def ejecutar_lote(trabajos: list[dict], max_trabajos: int = 2) -> list[dict]:
+    resultados = {}
+    with ThreadPoolExecutor(max_workers=max(max_trabajos, 1)) as executor:
+        futuros = {executor.submit(ejecutar_trabajo, t): i for i, t in enumerate(trabajos)}
+        for futuro in as_completed(futuros):
+            resultado = futuro.result()
+            resultados[futuros[futuro]] = resultado
+            print(f"🏁 {resultado['nombre']}: {resultado['estado']} en {resultado['duracion_s']}s")
+    return [resultados[i] for i in sorted(resultados)]
+
+def guardar_informe(resultados: list[dict], duracion_total: float) -> str:
+    informe = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "duracion_total_s": round(duracion_total, 2),
+        "total": len(resultados),
+        "correctos": sum(1 for r in resultados if r["estado"] == "ok"),
+        "coste_usd": round(sum(r.get("metricas", {}).get("coste_usd", 0.0) for r in resultados), 6),
+        "trabajos": resultados,
+    }
+    ruta = os.path.join(BASE_DIR, "salidas_json", f"informe_lote_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    return ruta
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("carpeta", nargs="?", help="Carpeta con una subcarpeta de documentos por trabajo")
+    parser.add_argument("--manifiesto", help="Manifiesto JSON con la lista de trabajos")
+    parser.add_argument("--trabajos", type=int, default=2, help="Trabajos en paralelo")
+    parser.add_argument("--peticiones", type=int, default=MAX_PETICIONES_GLOBALES, help="Tope global de peticiones al modelo en vuelo")
+    args = parser.parse_args(argv)
+
+    if args.manifiesto:
+        trabajos = cargar_trabajos_desde_manifiesto(args.manifiesto)
+    elif args.carpeta:
+        trabajos = cargar_trabajos_desde_carpeta(args.carpeta)
+    else:
+        parser.error("Indica una carpeta de trabajos o --manifiesto")
+
+    if not trabajos:
+        print("⚠️ No hay trabajos que procesar.")
+        return 1
+
+    configurar_limite_peticiones(args.peticiones)
+    print(f"🟡 {len(trabajos)} trabajos, {args.trabajos} en paralelo, {args.peticiones} peticiones al modelo como máximo\n")
+
+    inicio = time.perf_counter()
+    resultados = ejecutar_lote(trabajos, args.trabajos)
+    ruta_informe = guardar_informe(resultados, time.perf_counter() - inicio)
+
+    print("\n📊 Resumen del lote:")
+    for r in resultados:
+        print(f"   {'✅' if r['estado'] == 'ok' else '❌'} {r['nombre']:<40} {r['estado']:<12} {r['duracion_s']:>8.2f}s")
+    print(f"\n🗂️ Informe guardado en: {ruta_informe}")
+    return 0 if all(r["estado"] == "ok" for r in resultados) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
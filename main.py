@@ -2,6 +2,7 @@
 import os
 import sys
 import json
+import sqlite3
 
 # Ruta base = carpeta donde está este main.py (es decir, /dev)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -9,14 +10,40 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Añadir la subcarpeta 'scripts' al path
 sys.path.append(os.path.join(BASE_DIR, 'scripts'))
 
-from scripts.extractor_texto import extraer_textos_unificados
-from scripts.resumidor_ia import resumir_desde_varios_archivos
-from scripts.fusionador import fusionar_jsons
-from scripts.generar_docx import generar_docx_desde_json
+# El .env se carga aquí, en el punto de entrada, para que sus FICHAS_* lleguen a la
+# configuración de todos los módulos; los scripts no lo cargan al importarse
+from dotenv import load_dotenv
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+from scripts.pipeline import ContextoPipeline
+from scripts.extractor_texto import configuracion_extraccion
+from scripts.resumidor_ia import resumir_contexto, resumir_en_streaming, chunks_contexto, clave_cache_chunk, campos_omitidos_chunk
+from scripts.lote_openai import resumir_contexto_en_lote
+from scripts.fusionador import FusionadorIncremental
 from scripts.limpiador_json import sanear_json_final  # nuevo import
+from scripts.manifiesto import Manifiesto, huella_dependencias, hash_texto
+from scripts.almacen import obtener_almacen
+from scripts.metricas import MetricasEjecucion
+
+# Modo streaming: extracción, troceado y llamadas al modelo solapados (no guarda el .txt)
+MODO_STREAMING = os.getenv("FICHAS_STREAMING", "").lower() in ("1", "true", "si")
+# Modo lote: todas las peticiones en un JSONL del Batch API (más barato, sin latencia garantizada)
+MODO_LOTE_OPENAI = os.getenv("FICHAS_LOTE_OPENAI", "").lower() in ("1", "true", "si")
+# Ignora el manifiesto de etapas y repite todo el proceso
+FORZAR_ETAPAS = os.getenv("FICHAS_FORZAR", "").lower() in ("1", "true", "si")
+
+def carpetas_salida(espacio: str = None) -> dict:
+    # Con `espacio`, cada trabajo escribe en su propia subcarpeta de salidas_*/logs
+    sub = [espacio] if espacio else []
+    return {
+        "txt": os.path.join(BASE_DIR, "salidas_txt", *sub),
+        "json": os.path.join(BASE_DIR, "salidas_json", *sub),
+        "docx": os.path.join(BASE_DIR, "salidas_docx", *sub),
+        "logs": os.path.join(BASE_DIR, "logs", *sub),
+    }
 
-def guardar_texto_como_txt(texto: str, nombre_base: str):
-    ruta_txt = os.path.join(BASE_DIR, "salidas_txt", f"{nombre_base}_extraido.txt")
+def guardar_texto_como_txt(texto: str, nombre_base: str, carpeta: str = None):
+    ruta_txt = os.path.join(carpeta or os.path.join(BASE_DIR, "salidas_txt"), f"{nombre_base}_extraido.txt")
     os.makedirs(os.path.dirname(ruta_txt), exist_ok=True)
     try:
         with open(ruta_txt, 'w', encoding='utf-8') as f:
@@ -25,8 +52,8 @@ def guardar_texto_como_txt(texto: str, nombre_base: str):
     except Exception as e:
         print(f"❌ Error al guardar el archivo .txt: {e}")
 
-def guardar_respuesta_bruta(respuesta: str, nombre_base: str):
-    ruta_log = os.path.join(BASE_DIR, "logs", f"{nombre_base}_respuesta_raw.txt")
+def guardar_respuesta_bruta(respuesta: str, nombre_base: str, carpeta: str = None):
+    ruta_log = os.path.join(carpeta or os.path.join(BASE_DIR, "logs"), f"{nombre_base}_respuesta_raw.txt")
     os.makedirs(os.path.dirname(ruta_log), exist_ok=True)
     try:
         with open(ruta_log, 'w', encoding='utf-8') as f:
@@ -35,8 +62,9 @@ def guardar_respuesta_bruta(respuesta: str, nombre_base: str):
     except Exception as e:
         print(f"❌ Error al guardar la respuesta bruta: {e}")
 
-def guardar_json_limpio(data: dict, nombre_base: str):
-    ruta_json = os.path.join(BASE_DIR, "salidas_json", f"{nombre_base}_limpio.json")
+def guardar_json_limpio(data: dict, nombre_base: str, carpeta: str = None):
+    ruta_json = os.path.join(carpeta or os.path.join(BASE_DIR, "salidas_json"), f"{nombre_base}_limpio.json")
+    os.makedirs(os.path.dirname(ruta_json), exist_ok=True)
     try:
         with open(ruta_json, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
@@ -44,61 +72,237 @@ def guardar_json_limpio(data: dict, nombre_base: str):
     except Exception as e:
         print(f"❌ Error al guardar el JSON limpio: {e}")
 
-def obtener_documentos_entrada() -> list[str]:
-    carpeta = os.path.join(BASE_DIR, "entradas", "documentos")
+def listar_documentos(carpeta: str) -> list[str]:
     extensiones_validas = [".pdf", ".docx"]
-
-    documentos = [
+    return [
         os.path.join(carpeta, f)
         for f in sorted(os.listdir(carpeta))
         if os.path.isfile(os.path.join(carpeta, f)) and os.path.splitext(f)[1].lower() in extensiones_validas
     ]
 
+def obtener_documentos_entrada() -> list[str]:
+    documentos = listar_documentos(os.path.join(BASE_DIR, "entradas", "documentos"))
+
     if not documentos:
         print("⚠️ No se encontraron documentos .pdf o .docx en la carpeta de entrada.")
 
     return documentos
 
-def main():
-    rutas_documentos = obtener_documentos_entrada()
-    nombre_base = "ficha_unificada"
+def usar_almacen(descripcion: str, funcion, *args, por_defecto=None):
+    # Un fallo del almacén (bloqueado, de solo lectura...) no detiene la convocatoria: solo se pierde la reutilización
+    try:
+        return funcion(*args)
+    except sqlite3.Error as e:
+        print(f"⚠️ Almacén de convocatorias no disponible al {descripcion}: {e}")
+        return por_defecto
 
-    if not rutas_documentos:
-        return
+def reutilizar_del_almacen(almacen, contexto: ContextoPipeline, huellas_chunks: list[str], reutilizados: dict,
+                           carpeta_json: str, metricas: MetricasEjecucion) -> dict:
+    """
+    Partes de chunks ya resumidos en otras convocatorias del almacén (reenvíos o
+    correcciones de una ya procesada). Se escriben como las partes del manifiesto.
+    """
+    for similar in almacen.buscar_similares(contexto.texto_unificado):
+        print(f"📚 Parecida a «{similar['nombre_base']}» ({similar['registrada']}, similitud {similar['similitud']})")
+    conocidas = {i: d for i, d in almacen.partes_conocidas(huellas_chunks).items() if i not in reutilizados}
+    for indice, data in conocidas.items():
+        with open(os.path.join(carpeta_json, f"{contexto.nombre_base}_parte{indice+1}_resumen.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    metricas.contar("chunks_almacen", len(conocidas))
+    if conocidas:
+        print(f"📚 {len(conocidas)}/{len(huellas_chunks)} chunks ya resumidos en el almacén de convocatorias.\n")
+    return conocidas
 
-    print("🟡 Documentos encontrados:")
-    for ruta in rutas_documentos:
-        print(f"   📄 {os.path.basename(ruta)}")
+def extraer_y_resumir(rutas_documentos: list[str], nombre_base: str, carpetas: dict, manifiesto: Manifiesto,
+                      fusionador: FusionadorIncremental, metricas: MetricasEjecucion, almacen=None):
     print("\n🟡 Extrayendo y unificando texto...\n")
 
-    texto_unificado = extraer_textos_unificados(rutas_documentos)
+    # Cada documento se extrae una sola vez; el contexto lleva texto y tokens a las etapas siguientes
+    contexto = ContextoPipeline(rutas_documentos, nombre_base, carpeta_json=carpetas["json"])
+    ruta_txt = os.path.join(carpetas["txt"], f"{nombre_base}_extraido.txt")
+    huella_extraccion = manifiesto.huella_archivos("extraccion", rutas_documentos,
+                                                  json.dumps(configuracion_extraccion(), sort_keys=True))
 
-    if not texto_unificado.strip():
-        print("❌ No se pudo extraer texto de los documentos.")
-        return
+    if manifiesto.vigente("extraccion", huella_extraccion):
+        print("⏭️ Documentos sin cambios: se reutiliza el texto extraído.\n")
+        with open(ruta_txt, "r", encoding="utf-8") as f:
+            contexto.usar_texto(f.read())
+    else:
+        with metricas.etapa("extraccion"):
+            texto_extraido = contexto.texto_unificado
+        metricas.contar("caracteres_repetidos_eliminados", sum(d.get("caracteres_repetidos", 0) for d in contexto.metadatos_documentos()))
+        if not texto_extraido.strip():
+            print("❌ No se pudo extraer texto de los documentos.")
+            return None
+        print("✅ Texto extraído con éxito. Guardando copia .txt...\n")
+        guardar_texto_como_txt(contexto.texto_unificado, nombre_base, carpetas["txt"])
+        manifiesto.registrar("extraccion", huella_extraccion, [ruta_txt])
 
-    print("✅ Texto extraído con éxito. Guardando copia .txt...\n")
-    guardar_texto_como_txt(texto_unificado, nombre_base)
+    # Fechas, importes y normas citadas se extraen localmente; los campos resueltos no se piden al modelo
+    with metricas.etapa("preextraccion"):
+        preextraidos = contexto.campos_preextraidos()
+        campos_omitidos = contexto.campos_resueltos()
+    fusionador.sembrar(preextraidos)
+    if preextraidos:
+        print(f"🔎 Preextraídos sin IA: {', '.join(preextraidos)}" + (f" (omitidos del prompt: {', '.join(campos_omitidos)})" if campos_omitidos else "") + "\n")
 
-    print("🤖 Generando resumen unificado con IA por chunks...\n")
-    resumen_json = resumir_desde_varios_archivos(rutas_documentos, nombre_base)
-    guardar_respuesta_bruta(resumen_json, nombre_base)
+    # Solo se envían al modelo los chunks nuevos o desplazados; el resto se reutiliza.
+    # Cada chunk pide únicamente los campos que su texto puede rellenar. La huella incluye
+    # el código y las plantillas del resumen: si cambian, ninguna parte anterior vale
+    with metricas.etapa("chunking"):
+        version_resumen = huella_dependencias("resumen")
+        huellas_chunks = [hash_texto(version_resumen + clave_cache_chunk(c, campos_omitidos_chunk(c, campos_omitidos) or ()))
+                          for c in chunks_contexto(contexto)]
+    reutilizados = manifiesto.reutilizar_partes(nombre_base, carpetas["json"], huellas_chunks)
+    metricas.contar("chunks", len(huellas_chunks))
+    metricas.contar("chunks_reutilizados", len(reutilizados))
+    if reutilizados:
+        print(f"⏭️ {len(reutilizados)}/{len(huellas_chunks)} chunks sin cambios reutilizados del manifiesto.\n")
+    if almacen is not None and not FORZAR_ETAPAS:
+        reutilizados.update(usar_almacen("buscar chunks ya resumidos", reutilizar_del_almacen, almacen, contexto, huellas_chunks,
+                                         reutilizados, carpetas["json"], metricas, por_defecto={}))
+    for indice, data in reutilizados.items():
+        fusionador.agregar(indice, data)
 
-    print("🧬 Fusionando chunks en JSON final...\n")
-    fusionar_jsons(nombre_base)
+    # Cada respuesta se fusiona en memoria en cuanto llega; las partes se guardan después en el almacén
+    partes = dict(reutilizados)
 
-    ruta_fusionado = os.path.join(BASE_DIR, "salidas_json", f"{nombre_base}_fusionado.json")
-    if os.path.exists(ruta_fusionado):
-        print("🧹 Limpiando JSON fusionado...\n")
-        with open(ruta_fusionado, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        data_limpia = sanear_json_final(data)
-        guardar_json_limpio(data_limpia, nombre_base)
+    def recibir_parte(indice, data):
+        partes[indice] = data
+        fusionador.agregar(indice, data)
+
+    with metricas.etapa("resumen"):
+        if MODO_LOTE_OPENAI:
+            print("🤖 Generando resumen unificado con IA mediante lote JSONL...\n")
+            resumen = resumir_contexto_en_lote(contexto, omitir=reutilizados, al_completar=recibir_parte,
+                                               campos_omitidos=campos_omitidos, metricas=metricas)
+        else:
+            print("🤖 Generando resumen unificado con IA por chunks...\n")
+            resumen = resumir_contexto(contexto, omitir=reutilizados, al_completar=recibir_parte,
+                                       campos_omitidos=campos_omitidos, metricas=metricas, al_campo=fusionador.agregar_campo,
+                                       al_descartar=fusionador.retirar)
+
+    manifiesto.registrar_partes(nombre_base, carpetas["json"], huellas_chunks, partes)
+    if almacen is not None:
+        usar_almacen("registrar la convocatoria", almacen.registrar_convocatoria, rutas_documentos, nombre_base,
+                     contexto.texto_unificado, {huellas_chunks[i]: (i, data) for i, data in partes.items()}, metricas.trabajo)
+    return resumen
+
+def procesar_convocatoria(rutas_documentos: list[str], nombre_base: str = "ficha_unificada", carpetas: dict = None,
+                          trabajo: str = None, metricas: MetricasEjecucion = None) -> dict:
+    """
+    Ejecuta todas las etapas para un conjunto de documentos de una misma ayuda y
+    devuelve el estado final: "ok", "sin_texto", "sin_fusion" o "error_docx".
+    Cada etapa se omite si el manifiesto indica que sus entradas no han cambiado.
+    Las métricas de la ejecución se guardan en logs/<nombre_base>_metricas.json
+    (y en FICHAS_METRICAS_PROMETHEUS_DIR si está definida); con `metricas`, el llamante
+    puede seguir el progreso mientras se ejecuta.
+    """
+    carpetas = carpetas or carpetas_salida()
+    metricas = metricas or MetricasEjecucion(trabajo or nombre_base)
+    try:
+        resultado = ejecutar_etapas(rutas_documentos, nombre_base, carpetas, metricas)
+    finally:
+        metricas.imprimir_resumen()
+        metricas.guardar_json(os.path.join(carpetas["logs"], f"{nombre_base}_metricas.json"))
+        metricas.guardar_prometheus()
+    resultado["metricas"] = metricas.resumen()
+    return resultado
 
-        print("📄 Generando documento Word...\n")
-        generar_docx_desde_json(os.path.join(BASE_DIR, "salidas_json", f"{nombre_base}_limpio.json"))
+def ejecutar_etapas(rutas_documentos: list[str], nombre_base: str, carpetas: dict, metricas: MetricasEjecucion) -> dict:
+    manifiesto = Manifiesto(os.path.join(carpetas["json"], f"{nombre_base}_manifiesto.json"), forzar=FORZAR_ETAPAS)
+    fusionador = FusionadorIncremental()
+    ruta_limpio = os.path.join(carpetas["json"], f"{nombre_base}_limpio.json")
+
+    # Los mismos documentos (aunque cambie su nombre) ya procesados con este código: se
+    # reutiliza su ficha sin extraer ni llamar al modelo
+    almacen = obtener_almacen()
+    previa = None
+    if almacen is not None and not FORZAR_ETAPAS:
+        previa = usar_almacen("buscar la convocatoria", almacen.buscar_exacta, rutas_documentos)
+    if previa is not None:
+        print(f"📚 Documentos idénticos a «{previa['nombre_base']}» ({previa['registrada']}): se reutiliza su ficha.\n")
+        metricas.contar("convocatorias_reutilizadas")
+        guardar_json_limpio(previa["ficha"], nombre_base, carpetas["json"])
+        return generar_word(nombre_base, carpetas, manifiesto, metricas)
+
+    if MODO_STREAMING:
+        print("\n🤖 Extrayendo y resumiendo en streaming por chunks...\n")
+        with metricas.etapa("resumen"):
+            resumen_json = resumir_en_streaming(rutas_documentos, nombre_base, carpeta_salida=carpetas["json"],
+                                                al_completar=fusionador.agregar, metricas=metricas,
+                                                al_campo=fusionador.agregar_campo, al_descartar=fusionador.retirar)
+    else:
+        resumen_json = extraer_y_resumir(rutas_documentos, nombre_base, carpetas, manifiesto, fusionador, metricas, almacen)
+        if resumen_json is None:
+            return {"estado": "sin_texto"}
+    if resumen_json:
+        guardar_respuesta_bruta(resumen_json, nombre_base, carpetas["logs"])
+
+    ruta_fusionado = os.path.join(carpetas["json"], f"{nombre_base}_fusionado.json")
+    huella_fusion = manifiesto.huella("fusion", json.dumps(fusionador.versiones_por_campo, sort_keys=True, ensure_ascii=False))
+    if manifiesto.vigente("fusion", huella_fusion):
+        print("⏭️ Partes sin cambios: se omite la fusión.\n")
+    elif fusionador.partes:
+        print("🧬 Guardando JSON fusionado...\n")
+        with metricas.etapa("fusion"):
+            fusionador.guardar(ruta_fusionado)
+        manifiesto.registrar("fusion", huella_fusion, [ruta_fusionado])
     else:
+        print("❌ No se recibió ninguna parte JSON a fusionar.")
+
+    if not os.path.exists(ruta_fusionado):
         print(f"❌ No se encontró el JSON fusionado en {ruta_fusionado}")
+        return {"estado": "sin_fusion"}
+
+    huella_limpieza = manifiesto.huella_archivos("limpieza", [ruta_fusionado])
+    if manifiesto.vigente("limpieza", huella_limpieza):
+        print("⏭️ JSON fusionado sin cambios: se omite la limpieza.\n")
+    else:
+        print("🧹 Limpiando JSON fusionado...\n")
+        with metricas.etapa("limpieza"):
+            with open(ruta_fusionado, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            data_limpia = sanear_json_final(data)
+            guardar_json_limpio(data_limpia, nombre_base, carpetas["json"])
+        manifiesto.registrar("limpieza", huella_limpieza, [ruta_limpio])
+
+    # El modo streaming no guarda el texto unificado: sus fichas no se registran
+    if almacen is not None and not MODO_STREAMING and os.path.exists(ruta_limpio):
+        with open(ruta_limpio, "r", encoding="utf-8") as f:
+            usar_almacen("registrar la ficha", almacen.registrar_ficha, rutas_documentos, json.load(f))
+
+    return generar_word(nombre_base, carpetas, manifiesto, metricas)
+
+def generar_word(nombre_base: str, carpetas: dict, manifiesto: Manifiesto, metricas: MetricasEjecucion) -> dict:
+    ruta_limpio = os.path.join(carpetas["json"], f"{nombre_base}_limpio.json")
+    ruta_docx = os.path.join(carpetas["docx"], f"{nombre_base}_limpio.docx")
+    huella_docx = manifiesto.huella_archivos("docx", [ruta_limpio])
+    if manifiesto.vigente("docx", huella_docx):
+        print("⏭️ JSON limpio sin cambios: se omite la generación del Word.\n")
+        return {"estado": "ok", "docx": ruta_docx}
+
+    print("📄 Generando documento Word...\n")
+    # python-docx solo se importa si el Word hay que regenerarlo
+    from scripts.generar_docx import generar_docx_desde_json
+    with metricas.etapa("docx"):
+        ruta_docx = generar_docx_desde_json(ruta_limpio, carpetas["docx"])
+    if ruta_docx:
+        manifiesto.registrar("docx", huella_docx, [ruta_docx])
+    return {"estado": "ok" if ruta_docx else "error_docx", "docx": ruta_docx}
+
+def main():
+    rutas_documentos = obtener_documentos_entrada()
+    nombre_base = "ficha_unificada"
+
+    if not rutas_documentos:
+        return
+
+    print("🟡 Documentos encontrados:")
+    for ruta in rutas_documentos:
+        print(f"   📄 {os.path.basename(ruta)}")
+
+    procesar_convocatoria(rutas_documentos, nombre_base)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,392 @@
+"""
+Almacén local (SQLite) de las convocatorias procesadas: texto extraído, huellas de los
+documentos, partes JSON por chunk y ficha final, con un índice de texto completo (FTS5).
+
+- Documentos idénticos (mismos bytes, aunque cambie el nombre) reutilizan la ficha.
+- Los chunks ya resumidos en cualquier convocatoria anterior (reenvíos, correcciones)
+  reutilizan su parte sin llamar al modelo.
+- Las convocatorias casi iguales se detectan con un bosquejo de tejas de palabras.
+
+Uso: python -m scripts.almacen buscar "natalidad Badajoz" [--limite 10]
+     python -m scripts.almacen importar [carpeta_json] [--txt carpeta_txt]
+     python -m scripts.almacen similares documento.pdf [...]
+     python -m scripts.almacen estadisticas
+"""
+import os
+import sys
+import json
+import heapq
+import sqlite3
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+
+from scripts.manifiesto import hash_archivo, hash_texto, huella_dependencias
+from scripts.similitud import palabras_normalizadas
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RUTA_ALMACEN = os.getenv("FICHAS_ALMACEN", os.path.join(BASE_DIR, "..", "almacen", "convocatorias.sqlite3"))
+ALMACEN_DESACTIVADO = os.getenv("FICHAS_ALMACEN_DESACTIVADO", "").lower() in ("1", "true", "si")
+# Similitud mínima (Jaccard estimado de tejas) para avisar de que una convocatoria ya se procesó
+UMBRAL_DOCUMENTO_SIMILAR = float(os.getenv("FICHAS_UMBRAL_DOCUMENTO_SIMILAR", "0.8"))
+
+# Bosquejo "bottom-k": los k hashes menores de las tejas de 5 palabras del texto
+TAMANO_BOSQUEJO = 128
+PALABRAS_POR_TEJA = 5
+# Límite de parámetros por consulta IN (SQLite admite 999 en versiones antiguas)
+TAMANO_CONSULTA = 500
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS convocatorias (
+    id INTEGER PRIMARY KEY,
+    nombre_base TEXT NOT NULL,
+    trabajo TEXT,
+    huella_documentos TEXT,
+    huella_texto TEXT,
+    version TEXT,
+    ficha TEXT,
+    registrada TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_convocatorias_documentos ON convocatorias(huella_documentos);
+CREATE INDEX IF NOT EXISTS idx_convocatorias_texto ON convocatorias(huella_texto);
+
+CREATE TABLE IF NOT EXISTS documentos (
+    convocatoria_id INTEGER NOT NULL,
+    huella TEXT NOT NULL,
+    nombre TEXT,
+    bytes INTEGER,
+    PRIMARY KEY (convocatoria_id, huella)
+);
+CREATE INDEX IF NOT EXISTS idx_documentos_huella ON documentos(huella);
+
+CREATE TABLE IF NOT EXISTS partes (
+    huella_chunk TEXT PRIMARY KEY,
+    convocatoria_id INTEGER,
+    indice INTEGER,
+    json TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS bosquejos (
+    valor INTEGER NOT NULL,
+    convocatoria_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bosquejos_valor ON bosquejos(valor);
+CREATE INDEX IF NOT EXISTS idx_bosquejos_convocatoria ON bosquejos(convocatoria_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS busqueda USING fts5(
+    nombre_base, denominacion, texto, ficha, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+def huella_documentos(rutas: list[str]) -> str:
+    # No depende del nombre ni del orden de los archivos, solo de su contenido
+    return hash_texto("\n".join(sorted(hash_archivo(r) for r in rutas)))
+
+def configuracion_pipeline() -> dict:
+    """Opciones de entorno que cambian la ficha generada a partir de los mismos documentos."""
+    import scripts.chunker as chunker
+    import scripts.enrutador as enrutador
+    import scripts.extractor_texto as extractor_texto
+    import scripts.resumidor_ia as resumidor
+    import scripts.similitud as similitud
+    return {
+        **extractor_texto.configuracion_extraccion(),
+        "modo_chunking": chunker.MODO_CHUNKING,
+        "enrutar_chunks": enrutador.ENRUTAR_CHUNKS,
+        "min_coincidencias": enrutador.MIN_COINCIDENCIAS,
+        "enrutar_modelo": resumidor.ENRUTAR_MODELO,
+        "modelo": resumidor.MODELO,
+        "modelo_ligero": resumidor.MODELO_LIGERO if resumidor.ENRUTAR_MODELO else None,
+        "max_tokens_ligero": resumidor.MAX_TOKENS_LIGERO if resumidor.ENRUTAR_MODELO else None,
+        "umbral_densidad": resumidor.UMBRAL_DENSIDAD if resumidor.ENRUTAR_MODELO else None,
+        "reglas_escalado": resumidor.REGLAS_ESCALADO if resumidor.ENRUTAR_MODELO else None,
+        "salida_estructurada": resumidor.SALIDA_ESTRUCTURADA,
+        "umbral_casi_duplicados": similitud.UMBRAL_CASI_DUPLICADOS,
+    }
+
+def version_pipeline() -> str:
+    # Una ficha solo se reutiliza si se generó con el mismo código de extracción, prompt,
+    # fusión y limpieza, y con las mismas opciones de extracción, troceado y enrutado
+    configuracion = json.dumps(configuracion_pipeline(), sort_keys=True)
+    return hash_texto(huella_dependencias("extraccion", "resumen", "fusion", "limpieza") + configuracion)
+
+def bosquejo(texto: str, tamano: int = TAMANO_BOSQUEJO) -> list[int]:
+    palabras = palabras_normalizadas(texto)
+    n = PALABRAS_POR_TEJA
+    tejas = {" ".join(palabras[i:i + n]) for i in range(max(len(palabras) - n + 1, 1))}
+    valores = {int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "big", signed=True) for t in tejas}
+    return heapq.nsmallest(tamano, valores)
+
+def similitud_bosquejos(a: list[int], b: list[int], tamano: int = TAMANO_BOSQUEJO) -> float:
+    """Jaccard estimado: proporción de los k menores hashes de la unión presentes en ambos."""
+    if not a or not b:
+        return 0.0
+    comunes = set(a) & set(b)
+    union = heapq.nsmallest(tamano, set(a) | set(b))
+    return round(sum(1 for v in union if v in comunes) / len(union), 3)
+
+def texto_ficha(ficha: dict) -> str:
+    # Los valores de la ficha, aplanados, para el índice de texto completo
+    valores = ficha.values() if isinstance(ficha, dict) else ficha if isinstance(ficha, list) else None
+    if valores is None:
+        return str(ficha or "").strip()
+    return "\n".join(t for t in map(texto_ficha, valores) if t)
+
+def en_bloques(valores: list, tamano: int = TAMANO_CONSULTA):
+    for i in range(0, len(valores), tamano):
+        yield valores[i:i + tamano]
+
+class AlmacenConvocatorias:
+    """
+    Una conexión por proceso compartida entre hilos (con cerrojo); en modo WAL varios
+    procesos pueden leer mientras otro escribe.
+    """
+
+    def __init__(self, ruta: str = RUTA_ALMACEN):
+        self.ruta = ruta
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False, timeout=30)
+        self.conexion.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self.conexion:
+            self.conexion.execute("PRAGMA journal_mode=WAL")
+            self.conexion.executescript(ESQUEMA)
+
+    def cerrar(self):
+        with self._lock:
+            self.conexion.close()
+
+    def buscar_exacta(self, rutas: list[str]):
+        """Ficha de una convocatoria anterior con exactamente los mismos documentos, o None."""
+        with self._lock:
+            fila = self.conexion.execute(
+                "SELECT id, nombre_base, registrada, ficha FROM convocatorias "
+                "WHERE huella_documentos = ? AND version = ? AND ficha IS NOT NULL ORDER BY id DESC LIMIT 1",
+                (huella_documentos(rutas), version_pipeline()),
+            ).fetchone()
+        if fila is None:
+            return None
+        return {"id": fila["id"], "nombre_base": fila["nombre_base"], "registrada": fila["registrada"],
+                "ficha": json.loads(fila["ficha"])}
+
+    def buscar_similares(self, texto: str, umbral: float = UMBRAL_DOCUMENTO_SIMILAR, limite: int = 5) -> list[dict]:
+        """
+        Convocatorias cuyo texto se parece al dado (Jaccard estimado >= umbral), de más a
+        menos parecida. Solo se comparan los bosquejos que comparten bastantes hashes.
+        """
+        propio = bosquejo(texto)
+        if not propio:
+            return []
+        minimo = max(1, int(len(propio) * umbral / 2))
+        with self._lock:
+            coincidencias = {}
+            for bloque in en_bloques(propio):
+                marcas = ",".join("?" * len(bloque))
+                for fila in self.conexion.execute(
+                    f"SELECT convocatoria_id, COUNT(*) FROM bosquejos WHERE valor IN ({marcas}) GROUP BY convocatoria_id",
+                    bloque,
+                ):
+                    coincidencias[fila[0]] = coincidencias.get(fila[0], 0) + fila[1]
+            candidatos = [c for c, n in coincidencias.items() if n >= minimo]
+            similares = []
+            for convocatoria_id in candidatos:
+                valores = [f[0] for f in self.conexion.execute(
+                    "SELECT valor FROM bosquejos WHERE convocatoria_id = ?", (convocatoria_id,))]
+                similitud = similitud_bosquejos(propio, valores)
+                if similitud >= umbral:
+                    fila = self.conexion.execute(
+                        "SELECT nombre_base, registrada FROM convocatorias WHERE id = ?", (convocatoria_id,)).fetchone()
+                    similares.append({"id": convocatoria_id, "nombre_base": fila["nombre_base"],
+                                      "registrada": fila["registrada"], "similitud": similitud})
+        return sorted(similares, key=lambda s: -s["similitud"])[:limite]
+
+    def partes_conocidas(self, huellas_chunks: list[str]) -> dict:
+        """{índice: dict} de los chunks cuya huella ya se resumió en alguna convocatoria."""
+        por_huella = {}
+        with self._lock:
+            unicas = list(dict.fromkeys(huellas_chunks))
+            for bloque in en_bloques(unicas):
+                marcas = ",".join("?" * len(bloque))
+                for fila in self.conexion.execute(
+                    f"SELECT huella_chunk, json FROM partes WHERE huella_chunk IN ({marcas})", bloque):
+                    por_huella[fila[0]] = fila[1]
+        return {i: json.loads(por_huella[h]) for i, h in enumerate(huellas_chunks) if h in por_huella}
+
+    def registrar_convocatoria(self, rutas: list[str], nombre_base: str, texto: str, partes: dict,
+                               trabajo: str = None) -> int:
+        """
+        Guarda documentos, texto, bosquejo y partes ({huella_chunk: (índice, dict)}). Una
+        ejecución anterior con los mismos documentos y versión se sustituye. La ficha se
+        añade después con registrar_ficha.
+        """
+        huella = huella_documentos(rutas)
+        version = version_pipeline()
+        valores_bosquejo = bosquejo(texto)
+        with self._lock, self.conexion:
+            for (anterior,) in self.conexion.execute(
+                    "SELECT id FROM convocatorias WHERE huella_documentos = ? AND version = ?", (huella, version)).fetchall():
+                self._eliminar(anterior)
+            cursor = self.conexion.execute(
+                "INSERT INTO convocatorias (nombre_base, trabajo, huella_documentos, huella_texto, version, registrada) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (nombre_base, trabajo, huella, hash_texto(texto), version, datetime.now().isoformat(timespec="seconds")),
+            )
+            convocatoria_id = cursor.lastrowid
+            self.conexion.executemany(
+                "INSERT OR IGNORE INTO documentos (convocatoria_id, huella, nombre, bytes) VALUES (?, ?, ?, ?)",
+                [(convocatoria_id, hash_archivo(r), os.path.basename(r), os.path.getsize(r)) for r in rutas],
+            )
+            self.conexion.executemany(
+                "INSERT OR REPLACE INTO partes (huella_chunk, convocatoria_id, indice, json) VALUES (?, ?, ?, ?)",
+                [(h, convocatoria_id, indice, json.dumps(data, ensure_ascii=False)) for h, (indice, data) in partes.items()],
+            )
+            self.conexion.executemany("INSERT INTO bosquejos (valor, convocatoria_id) VALUES (?, ?)",
+                                      [(v, convocatoria_id) for v in valores_bosquejo])
+            self.conexion.execute("INSERT INTO busqueda (rowid, nombre_base, denominacion, texto, ficha) VALUES (?, ?, '', ?, '')",
+                                  (convocatoria_id, nombre_base, texto))
+        return convocatoria_id
+
+    def registrar_ficha(self, rutas: list[str], ficha: dict):
+        # Se asocia a la última convocatoria registrada con estos documentos
+        with self._lock, self.conexion:
+            fila = self.conexion.execute(
+                "SELECT id FROM convocatorias WHERE huella_documentos = ? AND version = ? ORDER BY id DESC LIMIT 1",
+                (huella_documentos(rutas), version_pipeline()),
+            ).fetchone()
+            if fila is None:
+                return None
+            self.conexion.execute("UPDATE convocatorias SET ficha = ? WHERE id = ?",
+                                  (json.dumps(ficha, ensure_ascii=False), fila["id"]))
+            self.conexion.execute("UPDATE busqueda SET denominacion = ?, ficha = ? WHERE rowid = ?",
+                                  (str(ficha.get("denominacion_normativa_nombre_ayuda", "")), texto_ficha(ficha), fila["id"]))
+            return fila["id"]
+
+    def _eliminar(self, convocatoria_id: int):
+        # Las partes se conservan: siguen sirviendo a cualquier chunk con la misma huella
+        for tabla in ("documentos", "bosquejos"):
+            self.conexion.execute(f"DELETE FROM {tabla} WHERE convocatoria_id = ?", (convocatoria_id,))
+        self.conexion.execute("DELETE FROM busqueda WHERE rowid = ?", (convocatoria_id,))
+        self.conexion.execute("DELETE FROM convocatorias WHERE id = ?", (convocatoria_id,))
+
+    def buscar(self, consulta: str, limite: int = 10) -> list[dict]:
+        """Búsqueda de texto completo (sintaxis FTS5) en texto, denominación y ficha, por relevancia."""
+        with self._lock:
+            filas = self.conexion.execute(
+                "SELECT c.id, c.nombre_base, c.registrada, busqueda.denominacion, "
+                "snippet(busqueda, -1, '[', ']', '…', 12) AS fragmento, bm25(busqueda) AS puntuacion "
+                "FROM busqueda JOIN convocatorias c ON c.id = busqueda.rowid "
+                "WHERE busqueda MATCH ? ORDER BY puntuacion LIMIT ?",
+                (consulta, limite),
+            ).fetchall()
+        return [dict(f) for f in filas]
+
+    def importar_carpeta(self, carpeta_json: str, carpeta_txt: str = None) -> int:
+        """
+        Añade al índice las fichas *_limpio.json ya generadas (y su *_extraido.txt si
+        existe) que no estén registradas. Sin documentos de origen no sirven para
+        reutilizar, solo para buscar.
+        """
+        importadas = 0
+        for raiz, _, archivos in os.walk(carpeta_json):
+            for nombre in sorted(archivos):
+                if not nombre.endswith("_limpio.json"):
+                    continue
+                nombre_base = nombre[:-len("_limpio.json")]
+                ruta = os.path.join(raiz, nombre)
+                try:
+                    with open(ruta, "r", encoding="utf-8") as f:
+                        ficha = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ No se pudo leer {ruta}: {e}")
+                    continue
+                relativa = os.path.relpath(raiz, carpeta_json)
+                ruta_txt = os.path.join(carpeta_txt, relativa, f"{nombre_base}_extraido.txt") if carpeta_txt else ""
+                texto = ""
+                if ruta_txt and os.path.exists(ruta_txt):
+                    with open(ruta_txt, "r", encoding="utf-8") as f:
+                        texto = f.read()
+                huella = f"importada:{hash_texto(os.path.abspath(ruta))}"
+                with self._lock, self.conexion:
+                    if self.conexion.execute("SELECT 1 FROM convocatorias WHERE huella_documentos = ?", (huella,)).fetchone():
+                        continue
+                    cursor = self.conexion.execute(
+                        "INSERT INTO convocatorias (nombre_base, trabajo, huella_documentos, huella_texto, ficha, registrada) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (nombre_base, None if relativa == "." else relativa, huella, hash_texto(texto),
+                         json.dumps(ficha, ensure_ascii=False),
+                         datetime.fromtimestamp(os.path.getmtime(ruta)).isoformat(timespec="seconds")),
+                    )
+                    self.conexion.execute(
+                        "INSERT INTO busqueda (rowid, nombre_base, denominacion, texto, ficha) VALUES (?, ?, ?, ?, ?)",
+                        (cursor.lastrowid, nombre_base, str(ficha.get("denominacion_normativa_nombre_ayuda", "")),
+                         texto, texto_ficha(ficha)),
+                    )
+                    if texto:
+                        self.conexion.executemany("INSERT INTO bosquejos (valor, convocatoria_id) VALUES (?, ?)",
+                                                  [(v, cursor.lastrowid) for v in bosquejo(texto)])
+                importadas += 1
+        return importadas
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                tabla: self.conexion.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+                for tabla in ("convocatorias", "documentos", "partes")
+            }
+
+_almacen = None
+_lock_almacen = threading.Lock()
+
+def obtener_almacen():
+    """
+    Almacén compartido del proceso (se abre en el primer uso), o None si está desactivado
+    o no se puede abrir (SQLite sin FTS5, base bloqueada, carpeta de solo lectura...).
+    """
+    global _almacen
+    if ALMACEN_DESACTIVADO:
+        return None
+    with _lock_almacen:
+        if _almacen is None:
+            try:
+                _almacen = AlmacenConvocatorias(RUTA_ALMACEN)
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ No se pudo abrir el almacén de convocatorias ({RUTA_ALMACEN}): {e}. Se continúa sin él.")
+                return None
+        return _almacen
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--almacen", default=RUTA_ALMACEN)
+    ordenes = parser.add_subparsers(dest="orden", required=True)
+    buscar = ordenes.add_parser("buscar")
+    buscar.add_argument("consulta")
+    buscar.add_argument("--limite", type=int, default=10)
+    importar = ordenes.add_parser("importar")
+    importar.add_argument("carpeta", nargs="?", default=os.path.join(BASE_DIR, "..", "salidas_json"))
+    importar.add_argument("--txt", default=os.path.join(BASE_DIR, "..", "salidas_txt"))
+    similares = ordenes.add_parser("similares")
+    similares.add_argument("documentos", nargs="+")
+    ordenes.add_parser("estadisticas")
+    args = parser.parse_args(argv)
+
+    almacen = AlmacenConvocatorias(args.almacen)
+    if args.orden == "buscar":
+        for r in almacen.buscar(args.consulta, args.limite):
+            print(f"📄 {r['nombre_base']} ({r['registrada']}) {r['denominacion'][:80]}\n   {' '.join(r['fragmento'].split())}")
+    elif args.orden == "importar":
+        print(f"📚 {almacen.importar_carpeta(args.carpeta, args.txt)} fichas importadas en {args.almacen}")
+    elif args.orden == "similares":
+        from scripts.extractor_texto import extraer_textos_unificados
+        exacta = almacen.buscar_exacta(args.documentos)
+        if exacta:
+            print(f"🟰 Mismos documentos que {exacta['nombre_base']} ({exacta['registrada']})")
+        for s in almacen.buscar_similares(extraer_textos_unificados(args.documentos)):
+            print(f"≈ {s['nombre_base']} ({s['registrada']}): similitud {s['similitud']}")
+    else:
+        print(json.dumps(almacen.estadisticas(), indent=2))
+    almacen.cerrar()
+
+if __name__ == "__main__":
+    sys.exit(main())
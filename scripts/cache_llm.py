@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CARPETA_CACHE = os.getenv("FICHAS_CACHE_DIR", os.path.join(BASE_DIR, "..", "cache_llm"))
+EDAD_MAXIMA_DIAS = float(os.getenv("FICHAS_CACHE_EDAD_MAXIMA_DIAS", "30"))
+TAMANO_MAXIMO_MB = float(os.getenv("FICHAS_CACHE_TAMANO_MAXIMO_MB", "500"))
+
+def calcular_clave(*partes) -> str:
+    """
+    Hash SHA-256 de las partes que determinan la respuesta del modelo
+    (texto del chunk, prompt renderizado, modelo, temperatura...).
+    """
+    h = hashlib.sha256()
+    for parte in partes:
+        h.update(str(parte).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+class CacheRespuestas:
+    """
+    Caché en disco direccionada por contenido: una entrada JSON por clave,
+    con expulsión por antigüedad y por tamaño total (la menos usada primero).
+    """
+
+    def __init__(self, carpeta: str = CARPETA_CACHE, edad_maxima_dias: float = EDAD_MAXIMA_DIAS,
+                 tamano_maximo_mb: float = TAMANO_MAXIMO_MB):
+        self.carpeta = carpeta
+        self.edad_maxima = edad_maxima_dias * 86400
+        self.tamano_maximo = int(tamano_maximo_mb * 1024 * 1024)
+        self.aciertos = 0
+        self.fallos = 0
+        self.escrituras = 0
+        self.expulsiones = 0
+        self._lock = threading.Lock()
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.carpeta, clave[:2], f"{clave}.json")
+
+    def _contar(self, acierto: bool):
+        with self._lock:
+            if acierto:
+                self.aciertos += 1
+            else:
+                self.fallos += 1
+
+    def obtener(self, clave: str):
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            self._contar(False)
+            return None
+
+        if time.time() - entrada.get("creado", 0) > self.edad_maxima:
+            self._eliminar(ruta)
+            self._contar(False)
+            return None
+
+        # Actualizar mtime para que la expulsión por tamaño sea LRU
+        try:
+            os.utime(ruta)
+        except OSError:
+            pass
+        self._contar(True)
+        return entrada.get("respuesta")
+
+    def guardar(self, clave: str, respuesta: str, metadatos: dict = None):
+        ruta = self._ruta(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        entrada = {"creado": time.time(), "respuesta": respuesta, "metadatos": metadatos or {}}
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(entrada, f, ensure_ascii=False)
+            os.replace(temporal, ruta)
+            with self._lock:
+                self.escrituras += 1
+        except OSError as e:
+            print(f"⚠️ No se pudo escribir en la caché: {e}")
+
+    def _eliminar(self, ruta: str):
+        try:
+            os.remove(ruta)
+            with self._lock:
+                self.expulsiones += 1
+        except OSError:
+            pass
+
+    def purgar(self):
+        if not os.path.isdir(self.carpeta):
+            return
+        ahora = time.time()
+        entradas = []
+        for raiz, _, archivos in os.walk(self.carpeta):
+            for nombre in archivos:
+                if not nombre.endswith(".json"):
+                    continue
+                ruta = os.path.join(raiz, nombre)
+                try:
+                    info = os.stat(ruta)
+                except OSError:
+                    continue
+                # mtime = último uso; obtener() caduca además por fecha de creación
+                if ahora - info.st_mtime > self.edad_maxima:
+                    self._eliminar(ruta)
+                else:
+                    entradas.append((info.st_mtime, info.st_size, ruta))
+
+        total = sum(tamano for _, tamano, _ in entradas)
+        for _, tamano, ruta in sorted(entradas):
+            if total <= self.tamano_maximo:
+                break
+            self._eliminar(ruta)
+            total -= tamano
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "escrituras": self.escrituras,
+                "expulsiones": self.expulsiones,
+                "tasa_aciertos": round(self.aciertos / consultas, 2) if consultas else 0.0,
+            }
+
+    def resumen(self) -> str:
+        e = self.estadisticas()
+        return f"{e['aciertos']} aciertos, {e['fallos']} fallos, {e['expulsiones']} expulsiones"
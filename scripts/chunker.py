@@ -1,15 +1,47 @@
-import tiktoken
-from typing import List
+import os
+import re
+from functools import lru_cache
+from typing import List, Iterable, Iterator
 
+# "tokens": cortes cada max_tokens con solapamiento; "estructura": secciones legales completas.
+# "tokens" sigue por defecto: cambiarlo mueve los cortes y con ellos las claves de caché y manifiesto
+MODO_CHUNKING = os.getenv("FICHAS_MODO_CHUNKING", "tokens")
+
+_ORDINALES = (
+    r"primera|segunda|tercera|cuarta|quinta|sexta|s[eé]ptima|octava|novena|d[eé]cima|"
+    r"und[eé]cima|duod[eé]cima|decimo\w*|d[eé]cimo\w*|vig[eé]sim\w*"
+)
+
+# Encabezados que abren una sección en bases y convocatorias: artículos, bases, anexos,
+# capítulos, títulos, disposiciones y los separadores de documento del texto unificado.
+# Se exige mayúscula inicial para no cortar en citas como "artículo 2 del presente decreto".
+PATRON_SECCION = re.compile(
+    r"^[ \t]*(?:"
+    r"(?:Art[íi]culo|ART[ÍI]CULO)\s+\d+\s*[\.º:\-–]"
+    rf"|(?:Base|BASE)\s+(?:\d+|(?i:{_ORDINALES}))\b"
+    r"|(?:Anexo|ANEXO)(?:\s+[IVXLCDM\d]+)?\b"
+    r"|(?:Cap[íi]tulo|CAP[ÍI]TULO)\s+[IVXLCDM\d]+\b"
+    r"|(?:T[íi]tulo|T[ÍI]TULO)\s+[IVXLCDM\d]+\b"
+    r"|(?:Disposici[óo]n|DISPOSICI[ÓO]N)\s+(?i:adicional|transitoria|derogatoria|final)"
+    r"|--- DOCUMENTO \d+"
+    r")",
+    re.MULTILINE,
+)
+
+# Apartados numerados ("1.", "2.-", "a)") o párrafos separados por línea en blanco
+PATRON_APARTADO = re.compile(r"^[ \t]*(?:\d{1,2}\s*\.(?!\d)|[a-z]\))|\n(?=[ \t]*\n)", re.MULTILINE)
+
+@lru_cache(maxsize=None)
 def get_tokenizer(model="gpt-4o"):
+    # tiktoken se importa al primer uso: cargarlo cuesta más que muchos trabajos pequeños
+    import tiktoken
     try:
         return tiktoken.encoding_for_model(model)
     except KeyError:
         return tiktoken.get_encoding("cl100k_base")
 
-def dividir_en_chunks(texto: str, max_tokens: int = 3000, overlap: int = 200) -> List[str]:
-    tokenizer = get_tokenizer("gpt-4o")
-    tokens = tokenizer.encode(texto)
+def dividir_tokens_en_chunks(tokens: List[int], max_tokens: int = 3000, overlap: int = 200, tokenizer=None) -> List[str]:
+    tokenizer = tokenizer or get_tokenizer("gpt-4o")
     total_tokens = len(tokens)
 
     chunks = []
@@ -18,9 +50,85 @@ def dividir_en_chunks(texto: str, max_tokens: int = 3000, overlap: int = 200) ->
         sub_tokens = tokens[i:i + max_tokens]
         chunk_text = tokenizer.decode(sub_tokens)
         chunks.append(chunk_text.strip())
-        i += max_tokens - overlap  
+        i += max_tokens - overlap
 
     return chunks
 
+def dividir_en_chunks(texto: str, max_tokens: int = 3000, overlap: int = 200) -> List[str]:
+    tokenizer = get_tokenizer("gpt-4o")
+    tokens = tokenizer.encode(texto)
+    return dividir_tokens_en_chunks(tokens, max_tokens, overlap, tokenizer)
+
+def iterar_chunks(fragmentos: Iterable[str], max_tokens: int = 3000, overlap: int = 200) -> Iterator[str]:
+    """
+    Trocea un flujo de texto (p. ej. páginas) tokenizando cada fragmento según llega.
+    Solo se retiene el búfer del chunk en curso, así que la memoria no depende del
+    tamaño total de la entrada. Los chunks consecutivos comparten `overlap` tokens.
+    """
+    tokenizer = get_tokenizer("gpt-4o")
+    paso = max_tokens - overlap
+    buffer = []
+    emitidos = 0
+
+    for fragmento in fragmentos:
+        buffer.extend(tokenizer.encode(fragmento))
+        while len(buffer) >= max_tokens:
+            yield tokenizer.decode(buffer[:max_tokens]).strip()
+            emitidos += 1
+            del buffer[:paso]
+
+    # El resto solo se emite si aporta algo más que el solapamiento ya enviado
+    if buffer and (emitidos == 0 or len(buffer) > overlap):
+        yield tokenizer.decode(buffer).strip()
+
+def dividir_en_secciones(texto: str) -> List[str]:
+    inicios = [m.start() for m in PATRON_SECCION.finditer(texto)]
+    if not inicios or inicios[0] != 0:
+        inicios.insert(0, 0)
+    return [texto[a:b] for a, b in zip(inicios, inicios[1:] + [len(texto)])]
+
+def dividir_en_apartados(seccion: str) -> List[str]:
+    inicios = [m.start() for m in PATRON_APARTADO.finditer(seccion)]
+    if not inicios or inicios[0] != 0:
+        inicios.insert(0, 0)
+    return [seccion[a:b] for a, b in zip(inicios, inicios[1:] + [len(seccion)])]
+
+def dividir_por_estructura(texto: str, max_tokens: int = 3000, overlap: int = 200, llenado_minimo: float = 0.75) -> List[str]:
+    """
+    Agrupa secciones completas (Artículo, Base, ANEXO...) en chunks de hasta `max_tokens`.
+    Si una sección no cabe en el chunk en curso y este está por debajo de `llenado_minimo`,
+    la sección se reparte por apartados para aprovechar el hueco. Solo se corta a ciegas,
+    con solapamiento, un apartado que por sí solo supera el presupuesto.
+    """
+    tokenizer = get_tokenizer("gpt-4o")
+    chunks = []
+    actual = []
+    tokens_actual = 0
+
+    def cerrar():
+        nonlocal actual, tokens_actual
+        if actual:
+            chunks.append("".join(actual).strip())
+        actual, tokens_actual = [], 0
+
+    def anadir(pieza, tokens):
+        nonlocal tokens_actual
+        if tokens_actual + len(tokens) > max_tokens:
+            cerrar()
+        if len(tokens) > max_tokens:
+            chunks.extend(dividir_tokens_en_chunks(tokens, max_tokens, overlap, tokenizer))
+            return
+        actual.append(pieza)
+        tokens_actual += len(tokens)
 
+    for seccion in dividir_en_secciones(texto):
+        tokens = tokenizer.encode(seccion)
+        cabe = tokens_actual + len(tokens) <= max_tokens
+        if cabe or (len(tokens) <= max_tokens and tokens_actual >= llenado_minimo * max_tokens):
+            anadir(seccion, tokens)
+            continue
+        for apartado in dividir_en_apartados(seccion):
+            anadir(apartado, tokenizer.encode(apartado))
+    cerrar()
 
+    return [c for c in chunks if c]
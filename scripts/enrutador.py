@@ -0,0 +1,89 @@
+import os
+import re
+
+# Desactivar con FICHAS_ENRUTAR_CHUNKS=0 para enviar la plantilla completa a cada chunk
+ENRUTAR_CHUNKS = os.getenv("FICHAS_ENRUTAR_CHUNKS", "1").lower() in ("1", "true", "si")
+# Coincidencias mínimas de palabras clave para considerar que un chunk informa un campo
+MIN_COINCIDENCIAS = int(os.getenv("FICHAS_ENRUTADO_MIN_COINCIDENCIAS", "2"))
+
+# Vocabulario del núcleo de la ayuda: si un chunk no lo menciona ni informa ningún campo
+# concreto (páginas de firmas, formularios anexos...), no se envía al modelo
+_NUCLEO = r"ayudas?|subvenci[oó]n\w*|beneficiari[oa]s?|prestaci[oó]n\w*|convocatoria|finalidad|objeto"
+
+# Campos generales: se piden a cualquier chunk que hable de la ayuda
+CAMPOS_GENERALES = (
+    "denominacion_normativa_nombre_ayuda", "portales", "categoria", "tipo_ayuda", "descripcion",
+    "destinatarios", "usuario", "fecha", "frase_publicitaria",
+)
+
+_PLAZO = r"plazo|presentaci[oó]n de (?:las )?solicitudes|desde el|hasta el|a partir del|d[ií]as h[aá]biles"
+_NORMAS = r"\bley\b|decreto|orden|reglamento|normativa|bases reguladoras"
+
+# Campos concretos y las palabras clave que los delatan
+PALABRAS_CLAVE = {
+    "fecha_inicio": _PLAZO,
+    "fecha_fin": _PLAZO,
+    "plazo_presentacion": _PLAZO,
+    "fecha_publicacion": r"diario oficial|\bDOE\b|\bBOE\b|\bBOP\w*|\bBDNS\b|publicaci[oó]n|entrar[aá] en vigor",
+    "ambito_territorial": r"comunidad aut[oó]noma|[aá]mbito|territori\w*|residen\w*|empadronad\w*|municipi\w*|provincia",
+    "administracion": r"consejer[ií]a|ministerio|junta de|ayuntamiento|diputaci[oó]n|secretar[ií]a general|direcci[oó]n general|[oó]rgano",
+    "requisitos_acceso": r"requisitos?|condiciones|deber[aá]n? (?:cumplir|reunir)|empadronad\w*|residencia|incurs\w*",
+    "cuantia": r"cuant[ií]a|importes?|euros?|€|porcentaje|%|tramos?|abono|pago",
+    "importe_maximo": r"m[aá]xim[oa]|l[ií]mite|cr[eé]dito|presupuest\w*|aplicaci[oó]n presupuestaria",
+    "costes_no_subvencionables": r"no subvencionables?|gastos? excluid\w*|no ser[aá]n? subvencionables|excluid\w*",
+    "resolucion": r"resoluci[oó]n|resolver|silencio|notificaci[oó]n|notificar\w*|recurso",
+    "documentos_presentar": r"documentaci[oó]n|acompa[nñ]ad\w*|aportar|copia|certificad\w*|\bDNI\b|\bNIE\b|libro de familia|declaraci[oó]n responsable",
+    "normativa_reguladora": _NORMAS,
+    "referencia_legislativa": _NORMAS,
+    "lugares_presentacion": r"sede electr[oó]nica|registros?|oficinas?|presencial\w*|electr[oó]nicamente|https?://|red sara|ventanilla",
+    "criterios_concesion": r"criterios?|valoraci[oó]n|puntuaci[oó]n|concurrencia|prelaci[oó]n|baremo|orden de presentaci[oó]n",
+}
+
+PATRON_NUCLEO = re.compile(rf"\b(?:{_NUCLEO})\b", re.IGNORECASE)
+PATRONES_CAMPOS = {campo: re.compile(patron, re.IGNORECASE) for campo, patron in PALABRAS_CLAVE.items()}
+
+# Señales de información concreta y su peso para puntuar la densidad de un chunk
+_MESES = r"enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre"
+SENALES_DENSIDAD = {
+    "importes": (r"\d[\d.]*(?:,\d+)?\s*(?:€|euros?\b)", 3),
+    "porcentajes": (r"\d+(?:,\d+)?\s*(?:%|por ciento)", 2),
+    "fechas": (rf"\b\d{{1,2}} de (?:{_MESES})\b|\b\d{{1,2}}/\d{{1,2}}/\d{{2,4}}\b", 2),
+    "plazos": (r"\b\d+ d[ií]as\b|\b\d+ meses\b", 2),
+    "requisitos": (r"\brequisit\w*|deber[aá]n? (?:cumplir|reunir|acreditar)", 2),
+    "articulos": (r"\bart[ií]culo\s+\d+", 1),
+    "normas": (r"\b(?:ley|decreto|orden|real decreto)\s+\d+/\d{4}", 1),
+}
+PATRONES_DENSIDAD = {senal: (re.compile(patron, re.IGNORECASE), peso) for senal, (patron, peso) in SENALES_DENSIDAD.items()}
+
+def puntuar_densidad(texto: str) -> float:
+    """Puntos de información concreta (importes, fechas, requisitos...) por cada 1000 caracteres."""
+    if not texto:
+        return 0.0
+    puntos = sum(peso * len(patron.findall(texto)) for patron, peso in PATRONES_DENSIDAD.values())
+    return round(puntos * 1000 / len(texto), 2)
+
+def contar_coincidencias(texto: str) -> dict:
+    return {campo: len(patron.findall(texto)) for campo, patron in PATRONES_CAMPOS.items()}
+
+def campos_relevantes(texto: str, min_coincidencias: int = MIN_COINCIDENCIAS):
+    """
+    Campos de la plantilla que el chunk probablemente puede rellenar. Devuelve
+    None si el chunk no habla de la ayuda ni informa ningún campo concreto.
+    """
+    conteo = contar_coincidencias(texto)
+    concretos = [campo for campo in PALABRAS_CLAVE if conteo.get(campo, 0) >= min_coincidencias]
+    if PATRON_NUCLEO.search(texto):
+        return CAMPOS_GENERALES + tuple(concretos)
+    return tuple(concretos) or None
+
+def campos_no_relevantes(texto: str, plantilla_campos, min_coincidencias: int = MIN_COINCIDENCIAS):
+    """
+    Campos de `plantilla_campos` que no se piden al modelo para este chunk, o None
+    si el chunk debe descartarse. Sin enrutado no se omite ninguno.
+    """
+    if not ENRUTAR_CHUNKS:
+        return ()
+    relevantes = campos_relevantes(texto, min_coincidencias)
+    if relevantes is None:
+        return None
+    return tuple(c for c in plantilla_campos if c not in relevantes)
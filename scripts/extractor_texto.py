@@ -1,30 +1,90 @@
 import sys
 import os
-import fitz  # PyMuPDF
-import docx
+import re
+import math
+import threading
+import multiprocessing
+from itertools import chain, islice
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+if __name__ == "__main__":
+    # Ejecutado como script (n8n): la raíz del repositorio hace falta para importar scripts.*
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.chunker import PATRON_SECCION, PATRON_APARTADO
+
+# fitz (PyMuPDF) y docx se importan dentro de cada función: solo se cargan si hay
+# documentos que extraer, no al importar el módulo
+
+# Extracción en paralelo: procesos del pool y tamaño mínimo de cada bloque de páginas. El
+# pool es uno por proceso, compartido por todos los trabajos (lotes.py, servicio.py)
+MAX_PROCESOS_EXTRACCION = int(os.getenv("FICHAS_PROCESOS_EXTRACCION", str(min(os.cpu_count() or 1, 4))))
+PAGINAS_MINIMAS_POR_TAREA = 25
+
+# Cabeceras, pies, códigos CSV y números de página que los boletines repiten en cada página
+QUITAR_REPETIDAS = os.getenv("FICHAS_QUITAR_REPETIDAS", "1").lower() in ("1", "true", "si")
+# Solo se buscan entre las primeras y últimas líneas con texto de cada página
+LINEAS_BORDE = 4
+# Una línea es repetida si aparece en al menos esta fracción de las páginas (y en 3 como mínimo)
+FRACCION_PAGINAS_REPETIDA = 0.5
+MIN_PAGINAS_REPETIDA = 3
+# En streaming no se ven todas las páginas: las repetidas se detectan en las primeras de cada documento
+PAGINAS_MUESTRA_REPETIDAS = 10
+def configuracion_extraccion() -> dict:
+    """Opciones que cambian el texto extraído de los mismos documentos."""
+    return {
+        "quitar_repetidas": QUITAR_REPETIDAS,
+        "lineas_borde": LINEAS_BORDE,
+        "fraccion_paginas_repetida": FRACCION_PAGINAS_REPETIDA,
+        "min_paginas_repetida": MIN_PAGINAS_REPETIDA,
+    }
+
+# Los números cambian de una página a otra ("Página 3 de 16", "NÚMERO 145 ... 38621")
+PATRON_DIGITOS = re.compile(r"\d+")
+
+def extraer_paginas_pdf(ruta_pdf: str, inicio: int = 0, fin: int = None) -> list[str]:
+    # Abre el documento una sola vez y devuelve el texto de las páginas [inicio, fin)
+    import fitz  # PyMuPDF
+    with fitz.open(ruta_pdf) as doc:
+        fin = doc.page_count if fin is None else min(fin, doc.page_count)
+        return [doc[i].get_text() for i in range(inicio, fin)]
+
+def contar_paginas_pdf(ruta_pdf: str) -> int:
+    import fitz  # PyMuPDF
+    with fitz.open(ruta_pdf) as doc:
+        return doc.page_count
 
 def extraer_texto_pdf(ruta_pdf: str) -> str:
-    texto = ""
     try:
-        with fitz.open(ruta_pdf) as doc:
-            for pagina in doc:
-                texto += pagina.get_text()
-        return texto.strip()
+        return "".join(extraer_paginas_pdf(ruta_pdf)).strip()
     except Exception as e:
         print(f"[ERROR] Fallo al extraer texto del PDF: {e}")
         return ""
 
 def extraer_texto_docx(ruta_docx: str) -> str:
-    texto = ""
     try:
+        import docx
         doc = docx.Document(ruta_docx)
-        for parrafo in doc.paragraphs:
-            texto += parrafo.text + "\n"
-        return texto.strip()
+        return "\n".join(parrafo.text for parrafo in doc.paragraphs).strip()
     except Exception as e:
         print(f"[ERROR] Fallo al extraer texto del DOCX: {e}")
         return ""
 
+@dataclass
+class DocumentoExtraido:
+    ruta: str
+    texto: str
+    tipo: str
+    metadatos: dict = field(default_factory=dict)
+
+    @property
+    def nombre(self) -> str:
+        return os.path.basename(self.ruta)
+
 def detectar_tipo_archivo(ruta: str) -> str:
     ext = os.path.splitext(ruta)[1].lower()
     if ext == ".pdf":
@@ -41,22 +101,253 @@ def extraer_texto(ruta_archivo: str) -> str:
     elif tipo == "docx":
         return extraer_texto_docx(ruta_archivo)
 
-    
+
+def _extraer_tarea(tarea: tuple) -> list[str]:
+    # Se ejecuta en un proceso del pool: un bloque de páginas de un PDF o un DOCX completo
+    ruta, tipo, inicio, fin = tarea
+    try:
+        if tipo == "pdf":
+            return extraer_paginas_pdf(ruta, inicio, fin)
+        return [extraer_texto_docx(ruta)]
+    except Exception as e:
+        print(f"[ERROR] Fallo al extraer '{ruta}' (páginas {inicio}-{fin}): {e}")
+        return []
+
+_pools = {}
+_lock_pools = threading.Lock()
+
+def obtener_pool(max_procesos: int) -> ProcessPoolExecutor:
+    """
+    Pool de extracción compartido por los hilos del proceso: varios trabajos a la vez no
+    multiplican los procesos. Se crea con forkserver (spawn si no existe): un fork del
+    proceso con otros hilos en marcha (clientes HTTP, semáforos, SQLite) puede bloquear al hijo.
+    """
+    with _lock_pools:
+        if max_procesos not in _pools:
+            metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pools[max_procesos] = ProcessPoolExecutor(max_workers=max_procesos,
+                                                       mp_context=multiprocessing.get_context(metodo))
+        return _pools[max_procesos]
+
+def planificar_tareas_extraccion(lista_rutas: list[str], num_procesos: int) -> list[tuple]:
+    """
+    Divide el trabajo en tareas (posicion, (ruta, tipo, inicio, fin)). Los PDF se reparten
+    en rangos de páginas contiguos para que cada proceso abra el documento una sola vez.
+    """
+    tareas = []
+    for posicion, ruta in enumerate(lista_rutas):
+        try:
+            tipo = detectar_tipo_archivo(ruta)
+            if tipo == "pdf":
+                paginas = contar_paginas_pdf(ruta)
+                bloque = max(PAGINAS_MINIMAS_POR_TAREA, math.ceil(paginas / max(num_procesos, 1)))
+                for inicio in range(0, paginas, bloque):
+                    tareas.append((posicion, (ruta, tipo, inicio, min(inicio + bloque, paginas))))
+            else:
+                tareas.append((posicion, (ruta, tipo, 0, None)))
+        except Exception as e:
+            print(f"[ERROR] Fallo en '{ruta}': {e}")
+    return tareas
+
+def extraer_documentos(lista_rutas: list[str], max_procesos: int = MAX_PROCESOS_EXTRACCION) -> list[DocumentoExtraido]:
+    """
+    Extrae cada documento una sola vez y devuelve su texto junto con sus metadatos,
+    para que las etapas siguientes no tengan que volver a abrir los archivos.
+    Con más de un proceso, los archivos y los rangos de páginas de cada PDF se
+    extraen en paralelo y se reensamblan en orden.
+    """
+    tareas = planificar_tareas_extraccion(lista_rutas, max_procesos)
+    if max_procesos > 1 and len(tareas) > 1:
+        try:
+            resultados = list(obtener_pool(max_procesos).map(_extraer_tarea, [t for _, t in tareas]))
+        except BrokenProcessPool as e:
+            # P. ej. el proceso principal no se puede reimportar en los hijos (python -c, stdin)
+            print(f"⚠️ Pool de extracción roto ({e}): se extrae en este proceso.", file=sys.stderr)
+            with _lock_pools:
+                _pools.pop(max_procesos, None)
+            resultados = [_extraer_tarea(t) for _, t in tareas]
+    else:
+        resultados = [_extraer_tarea(t) for _, t in tareas]
+
+    paginas_por_documento = {}
+    for (posicion, (ruta, tipo, _, _)), paginas in zip(tareas, resultados):
+        paginas_por_documento.setdefault(posicion, (ruta, tipo, []))[2].extend(paginas)
+
+    posiciones = sorted(paginas_por_documento)
+    # Las cabeceras y pies repetidos solo existen por página, es decir, en los PDF
+    pdfs = [p for p in posiciones if paginas_por_documento[p][1] == "pdf"]
+    ahorro = {}
+    if QUITAR_REPETIDAS and pdfs:
+        limpias = limpiar_paginas_repetidas([paginas_por_documento[p][2] for p in pdfs])
+        for posicion, (paginas, metricas) in zip(pdfs, limpias):
+            ruta, tipo, _ = paginas_por_documento[posicion]
+            paginas_por_documento[posicion] = (ruta, tipo, paginas)
+            ahorro[posicion] = metricas
+            if metricas.get("lineas_repetidas"):
+                # Por stderr: en modo CLI / n8n la salida estándar es solo el texto extraído
+                print(f"🧹 {os.path.basename(ruta)}: {metricas['lineas_repetidas']} líneas de cabecera/pie repetidas "
+                      f"eliminadas ({metricas['caracteres_repetidos']} caracteres)", file=sys.stderr)
+
+    documentos = []
+    for posicion in posiciones:
+        ruta, tipo, paginas = paginas_por_documento[posicion]
+        texto = "".join(paginas).strip()
+        metadatos = {"posicion": posicion, "tamano_bytes": os.path.getsize(ruta), "caracteres": len(texto),
+                     **ahorro.get(posicion, {})}
+        if tipo == "pdf":
+            metadatos["num_paginas"] = len(paginas)
+        documentos.append(DocumentoExtraido(ruta=ruta, texto=texto, tipo=tipo, metadatos=metadatos))
+    return documentos
+
+def clave_linea(linea: str) -> str:
+    return PATRON_DIGITOS.sub("#", " ".join(linea.split()).lower())
+
+def indices_borde(lineas: list[str]) -> list[int]:
+    con_texto = [i for i, linea in enumerate(lineas) if linea.strip()]
+    return con_texto[:LINEAS_BORDE] + con_texto[LINEAS_BORDE:][-LINEAS_BORDE:]
+
+def es_estructural(linea: str) -> bool:
+    # Encabezados de artículo, anexo o apartado nunca se quitan: el troceado los necesita
+    return bool(PATRON_SECCION.match(linea) or PATRON_APARTADO.match(linea))
+
+def detectar_lineas_repetidas(paginas_por_documento: list[list[str]]) -> list[set]:
+    """
+    Para cada documento, las claves de línea (sin números ni espacios repetidos) que se
+    repiten en los bordes de sus páginas, o de las páginas de todos los documentos.
+    Un solo recorrido cuenta en cuántas páginas aparece cada clave.
+    """
+    contadores = []
+    total = Counter()
+    for paginas in paginas_por_documento:
+        contador = Counter()
+        for pagina in paginas:
+            lineas = pagina.split("\n")
+            contador.update({clave_linea(lineas[i]) for i in indices_borde(lineas) if not es_estructural(lineas[i])})
+        contadores.append(contador)
+        total.update(contador)
+
+    minimo_total = max(MIN_PAGINAS_REPETIDA, FRACCION_PAGINAS_REPETIDA * sum(len(p) for p in paginas_por_documento))
+    repetidas = []
+    for paginas, contador in zip(paginas_por_documento, contadores):
+        minimo = max(MIN_PAGINAS_REPETIDA, FRACCION_PAGINAS_REPETIDA * len(paginas))
+        repetidas.append({clave for clave, n in contador.items() if n >= minimo or total[clave] >= minimo_total})
+    return repetidas
+
+def quitar_lineas_repetidas(paginas: list[str], repetidas: set, vistas: set = None) -> tuple[list[str], list[str]]:
+    """
+    Quita de los bordes de cada página las líneas repetidas, salvo su primera aparición
+    (la cabecera de la primera página suele traer el boletín y la fecha de publicación).
+    Devuelve las páginas limpias y las líneas quitadas. Con `vistas` se continúa un
+    documento del que ya se limpiaron las páginas anteriores.
+    """
+    vistas = set() if vistas is None else vistas
+    quitadas = []
+    limpias = []
+    for pagina in paginas:
+        lineas = pagina.split("\n")
+        descartar = set()
+        for i in indices_borde(lineas):
+            clave = clave_linea(lineas[i])
+            if clave in repetidas:
+                if clave in vistas:
+                    descartar.add(i)
+                vistas.add(clave)
+        quitadas.extend(lineas[i] for i in sorted(descartar))
+        limpias.append("\n".join(l for i, l in enumerate(lineas) if i not in descartar))
+    return limpias, quitadas
+
+def limpiar_paginas_repetidas(paginas_por_documento: list[list[str]]) -> list[tuple[list[str], dict]]:
+    """
+    Páginas sin cabeceras ni pies repetidos y, por documento, cuántas líneas y caracteres
+    se ahorran (en caracteres: contar tokens obligaría a cargar el tokenizador al extraer).
+    """
+    resultado = []
+    for paginas, repetidas in zip(paginas_por_documento, detectar_lineas_repetidas(paginas_por_documento)):
+        if not repetidas:
+            resultado.append((paginas, {}))
+            continue
+        limpias, quitadas = quitar_lineas_repetidas(paginas, repetidas)
+        resultado.append((limpias, {
+            "lineas_repetidas": len(quitadas),
+            "caracteres_repetidos": sum(len(linea) + 1 for linea in quitadas),
+        }))
+    return resultado
+
+def unir_textos_documentos(documentos: list[DocumentoExtraido]) -> str:
+    """
+    Concatena los textos con separadores identificativos por documento. La numeración
+    sigue la posición del documento en la lista original de rutas.
+    """
+    textos = []
+    for i, documento in enumerate(documentos):
+        if documento.texto.strip():
+            numero = documento.metadatos.get("posicion", i) + 1
+            textos.append(f"--- DOCUMENTO {numero} ({documento.nombre}) ---\n{documento.texto.strip()}")
+    return "\n\n".join(textos)
+
 def extraer_textos_unificados(lista_rutas: list[str]) -> str:
     """
     Dado una lista de rutas a archivos .pdf o .docx, extrae el texto de todos en orden
     y los concatena con separadores identificativos por documento.
     """
-    textos = []
-    for i, ruta in enumerate(lista_rutas):
+    return unir_textos_documentos(extraer_documentos(lista_rutas))
+
+def iterar_paginas_documento(ruta: str, tipo: str) -> Iterator[str]:
+    if tipo == "pdf":
+        import fitz  # PyMuPDF
+        with fitz.open(ruta) as doc:
+            for pagina in doc:
+                yield pagina.get_text()
+    else:
+        yield extraer_texto_docx(ruta)
+
+def limpiar_paginas_en_streaming(paginas: Iterator[str], nombre: str) -> Iterator[str]:
+    """
+    Como limpiar_paginas_repetidas para un documento leído página a página: las líneas
+    repetidas se detectan en sus primeras PAGINAS_MUESTRA_REPETIDAS páginas (las únicas
+    que se retienen) y se quitan de todas.
+    """
+    muestra = list(islice(paginas, PAGINAS_MUESTRA_REPETIDAS))
+    repetidas = detectar_lineas_repetidas([muestra])[0]
+    if not repetidas:
+        yield from chain(muestra, paginas)
+        return
+    vistas = set()
+    quitadas = []
+    for pagina in chain(muestra, paginas):
+        limpias, lineas = quitar_lineas_repetidas([pagina], repetidas, vistas)
+        quitadas.extend(lineas)
+        yield limpias[0]
+    if quitadas:
+        print(f"🧹 {nombre}: {len(quitadas)} líneas de cabecera/pie repetidas eliminadas "
+              f"({sum(len(linea) + 1 for linea in quitadas)} caracteres)", file=sys.stderr)
+
+def iterar_paginas(lista_rutas: list[str]) -> Iterator[str]:
+    """
+    Versión en streaming de `extraer_textos_unificados`: genera el texto página a página
+    (con la misma cabecera por documento, solo si tiene texto) sin mantener en memoria
+    más que unas pocas páginas.
+    """
+    primero = True
+    for posicion, ruta in enumerate(lista_rutas):
         try:
-            texto = extraer_texto(ruta)
-            if texto.strip():
-                nombre_archivo = os.path.basename(ruta)
-                textos.append(f"--- DOCUMENTO {i+1} ({nombre_archivo}) ---\n{texto.strip()}")
+            tipo = detectar_tipo_archivo(ruta)
+            paginas = iterar_paginas_documento(ruta, tipo)
+            if tipo == "pdf" and QUITAR_REPETIDAS:
+                paginas = limpiar_paginas_en_streaming(paginas, os.path.basename(ruta))
+            separador = "" if primero else "\n\n"
+            cabecera = f"{separador}--- DOCUMENTO {posicion+1} ({os.path.basename(ruta)}) ---\n"
+            for pagina in paginas:
+                if cabecera is not None:
+                    # Igual que unir_textos_documentos: un documento sin texto no lleva cabecera
+                    if not pagina.strip():
+                        continue
+                    yield cabecera
+                    cabecera = None
+                    primero = False
+                yield pagina
         except Exception as e:
             print(f"[ERROR] Fallo en '{ruta}': {e}")
-    return "\n\n".join(textos)
 
 # Modo CLI / n8n
 if __name__ == "__main__":
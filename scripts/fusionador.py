@@ -1,10 +1,23 @@
 
 import os
+import re
+import copy
 import json
-from validador import evaluar_json_por_reglas, esta_vacio
+import threading
+from scripts.validador import evaluar_json_por_reglas, esta_vacio
+from scripts.similitud import deduplicar_casi_iguales
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Listas de dicts: campo identificador, campos cuyo texto se compara por similitud y campo
+# que además debe coincidir para unirlas por similitud (p. ej. conceptos parecidos con
+# distinto importe no se unen)
+DEDUPLICACION_LISTAS = {
+    "cuantia": ("concepto", ("concepto",), "valor"),
+    "importe_maximo": ("concepto", ("concepto",), "cantidad"),
+    "documentos_presentar": ("clave", ("clave", "valor"), None),
+}
+
 def cargar_plantilla_vacia():
     with open(os.path.join(BASE_DIR, "..", "entradas", "plantilla.json"), "r", encoding="utf-8") as f:
         return json.load(f)
@@ -24,16 +37,23 @@ def fusionar_lista_simple(versiones):
         resultado.update([normalizar_str(i) for i in lista if i and isinstance(i, str)])
     return sorted(resultado)
 
-def fusionar_lista_dict(versiones, clave):
-    vistos = set()
-    resultado = []
-    for lista in versiones:
-        for item in lista:
-            id_val = normalizar_str(item.get(clave, ""))
-            if id_val and id_val not in vistos and not esta_vacio(item):
-                resultado.append(item)
-                vistos.add(id_val)
-    return resultado
+def normalizar_importe(valor):
+    return "".join(str(valor).lower().split())
+
+def fusionar_lista_dict(versiones, clave, campos_texto=None, campo_exacto=None):
+    # Un elemento por grupo de casi duplicados (mismo identificador o texto muy parecido),
+    # quedándose con el más completo
+    items = [
+        item for lista in versiones for item in lista
+        if isinstance(item, dict) and normalizar_str(item.get(clave, "")) and not esta_vacio(item)
+    ]
+    campos_texto = campos_texto or (clave,)
+    return deduplicar_casi_iguales(
+        items,
+        texto=lambda item: " ".join(str(item.get(c, "")) for c in campos_texto),
+        exacto=(lambda item: normalizar_importe(item.get(campo_exacto, ""))) if campo_exacto else None,
+        identidad=lambda item: normalizar_str(item.get(clave, "")),
+    )
 
 def fusionar_referencia_legislativa(versiones):
     lineas = set()
@@ -51,8 +71,8 @@ def fusionar_campo(clave, versiones):
         return fusionar_texto_mejorado(versiones)
     if clave in ["portales", "categoria", "tipo_ayuda"]:
         return fusionar_lista_simple(versiones)
-    if clave in ["cuantia", "importe_maximo", "documentos_presentar"]:
-        return fusionar_lista_dict(versiones, "concepto" if clave != "documentos_presentar" else "clave")
+    if clave in DEDUPLICACION_LISTAS:
+        return fusionar_lista_dict(versiones, *DEDUPLICACION_LISTAS[clave])
     if clave == "referencia_legislativa":
         return fusionar_referencia_legislativa(versiones)
     if clave == "lugares_presentacion":
@@ -66,28 +86,94 @@ def fusionar_campo(clave, versiones):
         return final
     return fusionar_texto_mejorado(versiones)
 
-def fusionar_jsons(nombre_base):
-    carpeta = os.path.join(BASE_DIR, "..", "salidas_json")
-    archivos = [os.path.join(carpeta, f) for f in os.listdir(carpeta) if f.startswith(nombre_base + "_parte") and f.endswith(".json")]
-    if not archivos:
-        print("❌ No se encontraron partes JSON a fusionar.")
-        return
+class FusionadorIncremental:
+    """
+    Fusión en memoria: recibe el dict de cada chunk según llega, lo valida con
+    evaluar_json_por_reglas y acumula por campo las versiones válidas. Solo los campos
+    que han cambiado se vuelven a fusionar, y en cualquier momento se puede obtener
+    una ficha provisional. Las versiones se ordenan por índice de chunk, así que el
+    resultado no depende del orden de llegada.
+    """
 
-    json_final = cargar_plantilla_vacia()
-    versiones_por_campo = {clave: [] for clave in json_final.keys()}
+    def __init__(self, plantilla=None):
+        self.plantilla = plantilla if plantilla is not None else cargar_plantilla_vacia()
+        self.versiones_por_campo = {clave: {} for clave in self.plantilla}
+        self.fusionados = {}
+        self.pendientes = set(self.plantilla)
+        self.partes = 0
+        self._lock = threading.Lock()
 
-    for archivo in archivos:
-        with open(archivo, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    def agregar(self, indice, data):
+        # La parte completa sustituye a lo entregado campo a campo para ese chunk, que pudo
+        # venir de un intento fallido anterior
+        self.retirar(indice)
+        self._acumular(indice, data, es_parte=True)
+
+    def agregar_campo(self, indice, clave, valor):
+        # Campo suelto de una respuesta en streaming: la parte completa llega después con agregar
+        self._acumular(indice, {clave: valor}, es_parte=False)
+
+    def retirar(self, indice):
+        # Descarta las versiones de un chunk, p. ej. los campos adelantados de una respuesta que acabó fallando
+        with self._lock:
+            for clave, por_indice in self.versiones_por_campo.items():
+                if por_indice.pop(indice, None) is not None:
+                    self.pendientes.add(clave)
+
+    def sembrar(self, data, indice=-1):
+        # Valores obtenidos sin el modelo (p. ej. preextraídos): se fusionan como una
+        # versión más, pero no cuentan como parte recibida
+        self._acumular(indice, data, es_parte=False)
+
+    def _acumular(self, indice, data, es_parte):
+        if not isinstance(data, dict):
+            return
         validacion = evaluar_json_por_reglas(data)
-        for clave, valor in data.items():
-            if not esta_vacio(valor) and validacion.get(clave, {}).get("valido", True):
-                versiones_por_campo[clave].append(valor)
+        with self._lock:
+            if es_parte:
+                self.partes += 1
+            for clave, valor in data.items():
+                if not esta_vacio(valor) and validacion.get(clave, {}).get("valido", True):
+                    self.versiones_por_campo.setdefault(clave, {})[indice] = valor
+                    self.pendientes.add(clave)
+
+    def resultado(self):
+        with self._lock:
+            for clave in self.pendientes:
+                por_indice = self.versiones_por_campo.get(clave, {})
+                self.fusionados[clave] = fusionar_campo(clave, [por_indice[i] for i in sorted(por_indice)])
+            self.pendientes.clear()
+            json_final = copy.deepcopy(self.plantilla)
+            json_final.update(copy.deepcopy(self.fusionados))
+            return json_final
+
+    def guardar(self, ruta_salida):
+        os.makedirs(os.path.dirname(ruta_salida), exist_ok=True)
+        with open(ruta_salida, "w", encoding="utf-8") as f:
+            json.dump(self.resultado(), f, indent=2, ensure_ascii=False)
+        print(f"✅ JSON fusionado guardado en: {ruta_salida}")
+
+def listar_partes(nombre_base, carpeta, num_partes=None):
+    # Solo las partes de este nombre_base, ordenadas por número; con num_partes se ignoran
+    # las que sobren de ejecuciones anteriores con más chunks
+    patron = re.compile(rf"^{re.escape(nombre_base)}_parte(\d+)_resumen\.json$")
+    partes = []
+    for nombre in os.listdir(carpeta):
+        coincidencia = patron.match(nombre)
+        if coincidencia and (num_partes is None or int(coincidencia.group(1)) <= num_partes):
+            partes.append((int(coincidencia.group(1)), os.path.join(carpeta, nombre)))
+    return sorted(partes)
 
-    for clave, versiones in versiones_por_campo.items():
-        json_final[clave] = fusionar_campo(clave, versiones)
+def fusionar_jsons(nombre_base, carpeta=None, num_partes=None):
+    carpeta = carpeta or os.path.join(BASE_DIR, "..", "salidas_json")
+    partes = listar_partes(nombre_base, carpeta, num_partes) if os.path.isdir(carpeta) else []
+    if not partes:
+        print("❌ No se encontraron partes JSON a fusionar.")
+        return
+
+    fusionador = FusionadorIncremental()
+    for numero, archivo in partes:
+        with open(archivo, "r", encoding="utf-8") as f:
+            fusionador.agregar(numero - 1, json.load(f))
 
-    ruta_salida = os.path.join(carpeta, f"{nombre_base}_fusionado.json")
-    with open(ruta_salida, "w", encoding="utf-8") as f:
-        json.dump(json_final, f, indent=2, ensure_ascii=False)
-    print(f"✅ JSON fusionado guardado en: {ruta_salida}")
+    fusionador.guardar(os.path.join(carpeta, f"{nombre_base}_fusionado.json"))
@@ -1,9 +1,26 @@
 
 import os
 import json
+import glob
+import time
+import zipfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from docx import Document
 from docx.shared import Pt
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.oxml.ns import qn
+
+# Plantilla .docx con los estilos de la casa (membrete, fuentes, márgenes); sin definir,
+# la de python-docx. Su cuerpo se vacía: solo se conservan estilos, cabeceras y pies
+PLANTILLA_DOCX = os.getenv("FICHAS_PLANTILLA_DOCX", "")
+
+# Render en lote: procesos del pool y fichas por tarea enviada a cada proceso
+MAX_PROCESOS_DOCX = int(os.getenv("FICHAS_PROCESOS_DOCX", str(os.cpu_count() or 1)))
+FICHAS_POR_TAREA = 25
+
+_local = threading.local()
 
 def formatear_titulo(doc: Document, texto: str, nivel=2):
     p = doc.add_paragraph()
@@ -43,22 +60,25 @@ def formatear_importe_maximo(doc: Document, items: list):
         if concepto and cantidad:
             doc.add_paragraph(f"- {concepto} - {cantidad}")
 
-def generar_docx_desde_json(json_path: str, output_dir: str = "salidas_docx"):
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    nombre_base = os.path.splitext(os.path.basename(json_path))[0]
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, f"{nombre_base}.docx")
-
-    if os.path.exists(output_path):
-        try:
-            os.remove(output_path)
-        except PermissionError:
-            print(f"❌ No se puede sobrescribir {output_path}. Asegúrate de cerrar el archivo en Word.")
-            return
-
-    doc = Document()
+def vaciar_cuerpo(doc: Document) -> Document:
+    # Todo menos la configuración de sección (márgenes, cabecera y pie)
+    cuerpo = doc.element.body
+    for elemento in list(cuerpo):
+        if elemento.tag != qn("w:sectPr"):
+            cuerpo.remove(elemento)
+    return doc
+
+def documento_en_blanco():
+    """
+    Documento de la plantilla con el cuerpo vacío. La plantilla se abre una vez por hilo
+    y se reutiliza: abrirla y parsear sus estilos cuesta tanto como renderizar una ficha.
+    """
+    doc = getattr(_local, "documento", None)
+    if doc is None:
+        doc = _local.documento = Document(PLANTILLA_DOCX or None)
+    return vaciar_cuerpo(doc)
+
+def renderizar_ficha(doc: Document, data: dict):
     doc.add_heading("FICHA DE AYUDA UNIFICADA", level=1)
 
     for clave, valor in data.items():
@@ -95,5 +115,134 @@ def generar_docx_desde_json(json_path: str, output_dir: str = "salidas_docx"):
                     formatear_titulo(doc, subclave.capitalize())
                     formatear_lista_guiones(doc, subvalores)
 
-    doc.save(output_path)
-    print(f"📄 Documento Word generado en: {output_path}")
+def guardar_atomico(doc: Document, output_path: str) -> bool:
+    # Se escribe aparte y se renombra: nunca queda un .docx a medias
+    temporal = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    doc.save(temporal)
+    try:
+        os.replace(temporal, output_path)
+    except PermissionError:
+        os.remove(temporal)
+        print(f"❌ No se puede sobrescribir {output_path}. Asegúrate de cerrar el archivo en Word.")
+        return False
+    return True
+
+def generar_docx_desde_dict(data: dict, nombre_base: str, output_dir: str = "salidas_docx", avisar: bool = True):
+    # `nombre_base` puede incluir subcarpetas ("trabajo/ficha_unificada_limpio")
+    output_path = os.path.join(output_dir, f"{nombre_base}.docx")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    doc = documento_en_blanco()
+    renderizar_ficha(doc, data)
+    if not guardar_atomico(doc, output_path):
+        return None
+    if avisar:
+        print(f"📄 Documento Word generado en: {output_path}")
+    return output_path
+
+def generar_docx_desde_json(json_path: str, output_dir: str = "salidas_docx"):
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return generar_docx_desde_dict(data, os.path.splitext(os.path.basename(json_path))[0], output_dir)
+
+def _renderizar_tarea(fichas: list, output_dir: str) -> list[dict]:
+    resultados = []
+    for nombre_base, data in fichas:
+        try:
+            ruta = generar_docx_desde_dict(data, nombre_base, output_dir, avisar=False)
+            resultados.append({"nombre": nombre_base, "docx": ruta, "error": None if ruta else "archivo bloqueado"})
+        except Exception as e:
+            resultados.append({"nombre": nombre_base, "docx": None, "error": str(e)})
+    return resultados
+
+def generar_docx_combinado(fichas: list, ruta_salida: str) -> str:
+    """Todas las fichas en un solo .docx, una por página."""
+    doc = vaciar_cuerpo(Document(PLANTILLA_DOCX or None))
+    seccion = doc.element.body.find(qn("w:sectPr"))
+    for i, (_, data) in enumerate(fichas):
+        # Cada ficha se renderiza en la plantilla reutilizada y sus párrafos se trasladan en
+        # bloque: añadirlos uno a uno al documento grande es cuadrático en python-docx
+        pagina = documento_en_blanco()
+        if i:
+            pagina.add_page_break()
+        renderizar_ficha(pagina, data)
+        for elemento in list(pagina.element.body):
+            if elemento.tag != qn("w:sectPr"):
+                seccion.addprevious(elemento)
+    os.makedirs(os.path.dirname(os.path.abspath(ruta_salida)), exist_ok=True)
+    return ruta_salida if guardar_atomico(doc, ruta_salida) else None
+
+def empaquetar_zip(rutas: dict, ruta_zip: str) -> str:
+    """`rutas` es {nombre dentro del ZIP: ruta del .docx}; los .docx ya van comprimidos."""
+    os.makedirs(os.path.dirname(os.path.abspath(ruta_zip)), exist_ok=True)
+    temporal = f"{ruta_zip}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(temporal, "w", zipfile.ZIP_STORED) as paquete:
+        for nombre, ruta in rutas.items():
+            paquete.write(ruta, nombre)
+    os.replace(temporal, ruta_zip)
+    return ruta_zip
+
+def generar_docx_lote(fichas: list, output_dir: str = "salidas_docx", procesos: int = MAX_PROCESOS_DOCX,
+                      ruta_zip: str = None, ruta_combinado: str = None) -> list[dict]:
+    """
+    Renderiza muchas fichas (lista de (nombre_base, dict)) repartidas en bloques entre
+    `procesos` procesos, cada uno con su plantilla ya cargada. Devuelve, en el mismo
+    orden, {"nombre", "docx", "error"} por ficha. Opcionalmente empaqueta los .docx en
+    `ruta_zip` y/o genera un único documento con todas en `ruta_combinado`.
+    """
+    fichas = list(fichas)
+    bloques = [fichas[i:i + FICHAS_POR_TAREA] for i in range(0, len(fichas), FICHAS_POR_TAREA)]
+    if procesos <= 1 or len(bloques) <= 1:
+        resultados = [r for bloque in bloques for r in _renderizar_tarea(bloque, output_dir)]
+    else:
+        # Con forkserver (spawn si no existe), como el pool de extracción: servicio.py y lotes.py
+        # renderizan desde procesos con otros hilos en marcha, y un fork puede bloquear al hijo
+        metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        with ProcessPoolExecutor(max_workers=min(procesos, len(bloques)),
+                                 mp_context=multiprocessing.get_context(metodo)) as executor:
+            futuros = [executor.submit(_renderizar_tarea, bloque, output_dir) for bloque in bloques]
+            resultados = [r for futuro in futuros for r in futuro.result()]
+
+    if ruta_zip:
+        generados = {f"{r['nombre']}.docx": r["docx"] for r in resultados if r["docx"]}
+        print(f"🗜️ ZIP con {len(generados)} documentos en: {empaquetar_zip(generados, ruta_zip)}")
+    if ruta_combinado and generar_docx_combinado(fichas, ruta_combinado):
+        print(f"📄 Documento combinado en: {ruta_combinado}")
+    return resultados
+
+def cargar_fichas(carpeta: str, patron: str = "*_limpio.json") -> list:
+    # Nombre relativo a `carpeta`, para que cada trabajo conserve su subcarpeta en la salida
+    fichas = []
+    for ruta in sorted(glob.glob(os.path.join(carpeta, "**", patron), recursive=True)):
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ No se pudo leer {ruta}: {e}")
+            continue
+        if isinstance(data, dict):
+            fichas.append((os.path.splitext(os.path.relpath(ruta, carpeta))[0], data))
+    return fichas
+
+# Modo CLI / n8n: reexportar a Word todo el archivo de fichas (p. ej. tras cambiar el formato)
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Genera en lote los .docx de todas las fichas JSON de una carpeta.")
+    parser.add_argument("carpeta")
+    parser.add_argument("--salida", default="salidas_docx")
+    parser.add_argument("--patron", default="*_limpio.json")
+    parser.add_argument("--procesos", type=int, default=MAX_PROCESOS_DOCX)
+    parser.add_argument("--zip", help="Empaqueta además todos los .docx en este ZIP")
+    parser.add_argument("--combinado", help="Genera además un único .docx con todas las fichas")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    fichas = cargar_fichas(args.carpeta, args.patron)
+    resultados = generar_docx_lote(fichas, args.salida, args.procesos, args.zip, args.combinado)
+    errores = [r for r in resultados if r["error"]]
+    duracion = time.perf_counter() - inicio
+    print(f"📄 {len(resultados) - len(errores)}/{len(resultados)} documentos generados en {duracion:.1f}s "
+          f"({len(resultados) / duracion if duracion else 0:.0f} fichas/s)")
+    for r in errores:
+        print(f"   ❌ {r['nombre']}: {r['error']}")
@@ -0,0 +1,78 @@
+import json
+
+class AnalizadorJSONIncremental:
+    """
+    Lee un objeto JSON que llega a trozos (respuesta en streaming) y entrega cada campo de
+    primer nivel en cuanto se cierra su valor, con `al_campo(clave, valor)`. Un solo
+    recorrido por carácter; se ignora lo que haya antes de la primera "{" (p. ej. ```json)
+    y después de la "}" final. Si la respuesta se corta o un campo está mal formado, los
+    campos ya cerrados se conservan en `campos`.
+    """
+
+    def __init__(self, al_campo=None):
+        self.al_campo = al_campo
+        self.campos = {}
+        self.errores = 0
+        self.completo = False
+        self._iniciado = False
+        self._profundidad = 0
+        self._en_cadena = False
+        self._escape = False
+        self._miembro = []
+
+    def alimentar(self, fragmento: str):
+        if self.completo:
+            return
+        inicio = 0
+        for i, c in enumerate(fragmento):
+            if not self._iniciado:
+                if c == "{":
+                    self._iniciado = True
+                    self._profundidad = 1
+                    inicio = i + 1
+                continue
+            if self._en_cadena:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._en_cadena = False
+            elif c == '"':
+                self._en_cadena = True
+            elif c in "{[":
+                self._profundidad += 1
+            elif c in "}]":
+                self._profundidad -= 1
+                if self._profundidad == 0:
+                    self._miembro.append(fragmento[inicio:i])
+                    self._cerrar_miembro()
+                    self.completo = True
+                    return
+            elif c == "," and self._profundidad == 1:
+                self._miembro.append(fragmento[inicio:i])
+                self._cerrar_miembro()
+                inicio = i + 1
+        if self._iniciado:
+            self._miembro.append(fragmento[inicio:])
+
+    def _cerrar_miembro(self):
+        texto = "".join(self._miembro).strip()
+        self._miembro = []
+        if not texto:
+            return
+        try:
+            miembro = json.loads("{" + texto + "}")
+        except ValueError:
+            self.errores += 1
+            return
+        for clave, valor in miembro.items():
+            self.campos[clave] = valor
+            if self.al_campo is not None:
+                self.al_campo(clave, valor)
+
+    def tiene_todos(self, campos) -> bool:
+        return all(c in self.campos for c in campos)
+
+    def texto(self) -> str:
+        return json.dumps(self.campos, ensure_ascii=False)
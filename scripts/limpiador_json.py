@@ -1,5 +1,6 @@
 
 import re
+from scripts.similitud import deduplicar_casi_iguales
 
 def normalizar_concepto(texto):
     texto = texto.lower()
@@ -8,22 +9,21 @@ def normalizar_concepto(texto):
     return re.sub(r"\s+", " ", texto).strip()
 
 def limpiar_cuantia(json_data):
-    vistos = set()
-    nuevas_cuantias = []
-    for item in json_data.get("cuantia", []):
-        concepto_norm = normalizar_concepto(item.get("concepto", ""))
-        valor = item.get("valor", "").strip()
-        unidad = item.get("unidad", "").strip()
-        if not concepto_norm or not valor:
-            continue
-        clave = f"{concepto_norm}:{valor}"
-        if clave not in vistos:
-            nuevas_cuantias.append(item)
-            vistos.add(clave)
-    json_data["cuantia"] = nuevas_cuantias
+    # Con el mismo importe, conceptos iguales o redactados casi igual se quedan en uno
+    validas = [
+        item for item in json_data.get("cuantia") or []
+        if normalizar_concepto(item.get("concepto", "")) and item.get("valor", "").strip()
+    ]
+    json_data["cuantia"] = deduplicar_casi_iguales(
+        validas,
+        texto=lambda item: item.get("concepto", ""),
+        exacto=lambda item: item.get("valor", "").strip(),
+        identidad=lambda item: f"{normalizar_concepto(item.get('concepto', ''))}:{item.get('valor', '').strip()}",
+    )
 
 def corregir_lugares_presentacion(json_data):
-    if "lugares_presentacion" not in json_data:
+    # Con el enrutado de chunks un campo puede no pedirse nunca: la fusión lo deja a None
+    if not isinstance(json_data.get("lugares_presentacion"), dict):
         json_data["lugares_presentacion"] = {"presencial": [], "online": []}
 
     presencial = json_data["lugares_presentacion"].get("presencial", [])
@@ -0,0 +1,256 @@
+import os
+import re
+import json
+import time
+import uuid
+from scripts.prompt_ia import construir_mensajes, cargar_plantilla_json
+from scripts.pipeline import ContextoPipeline
+import scripts.resumidor_ia as resumidor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CARPETA_LOTES = os.path.join(BASE_DIR, "..", "lotes_openai")
+INTERVALO_CONSULTA = float(os.getenv("FICHAS_LOTE_INTERVALO", "30"))
+ESTADOS_FINALES = {"completed", "failed", "expired", "cancelled"}
+
+def construir_peticion_lote(texto_chunk: str, custom_id: str, campos_omitidos: tuple = ()) -> dict:
+    # Mismo cuerpo que envía generar_resumen_con_openai, en el formato del Batch API, con el
+    # modelo que elige el enrutado por densidad (el mismo que entra en la clave de caché)
+    modelo, max_tokens, _ = resumidor.elegir_modelo(texto_chunk)
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": resumidor.construir_peticion(construir_mensajes(texto_chunk, campos_omitidos), campos_omitidos,
+                                             modelo, max_tokens),
+    }
+
+class TransporteLoteOpenAI:
+    """Envía el JSONL al Batch API de OpenAI (files + batches)."""
+
+    def __init__(self, client=None):
+        self.client = client or resumidor.obtener_cliente()
+
+    def enviar(self, ruta_jsonl: str) -> str:
+        with open(ruta_jsonl, "rb") as f:
+            fichero = self.client.files.create(file=f, purpose="batch")
+        lote = self.client.batches.create(
+            input_file_id=fichero.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return lote.id
+
+    def consultar(self, id_lote: str) -> dict:
+        lote = self.client.batches.retrieve(id_lote)
+        return {"estado": lote.status, "id_salida": lote.output_file_id, "id_errores": lote.error_file_id}
+
+    def descargar(self, id_fichero: str) -> str:
+        return self.client.files.content(id_fichero).text
+
+def responder_plantilla_vacia(cuerpo: dict) -> str:
+    return json.dumps(cargar_plantilla_json(), ensure_ascii=False)
+
+class TransporteLoteLocal:
+    """
+    Sustituto local del Batch API: guarda cada lote en disco y recorre los estados
+    validating → in_progress → completed a medida que se consulta. Las respuestas
+    las produce `responder(cuerpo) -> str`, sin red.
+    """
+
+    def __init__(self, carpeta: str = None, responder=responder_plantilla_vacia, consultas_hasta_completar: int = 2):
+        self.carpeta = carpeta or os.path.join(CARPETA_LOTES, "local")
+        self.responder = responder
+        self.consultas_hasta_completar = consultas_hasta_completar
+
+    def _ruta(self, id_lote: str, nombre: str) -> str:
+        return os.path.join(self.carpeta, id_lote, nombre)
+
+    def _leer_estado(self, id_lote: str) -> dict:
+        with open(self._ruta(id_lote, "estado.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _escribir_estado(self, id_lote: str, estado: dict):
+        with open(self._ruta(id_lote, "estado.json"), "w", encoding="utf-8") as f:
+            json.dump(estado, f, indent=2)
+
+    def enviar(self, ruta_jsonl: str) -> str:
+        id_lote = f"batch_local_{uuid.uuid4().hex[:12]}"
+        os.makedirs(os.path.join(self.carpeta, id_lote), exist_ok=True)
+        with open(ruta_jsonl, "r", encoding="utf-8") as origen, open(self._ruta(id_lote, "entrada.jsonl"), "w", encoding="utf-8") as destino:
+            destino.write(origen.read())
+        self._escribir_estado(id_lote, {"estado": "validating", "consultas": 0, "id_salida": None, "id_errores": None})
+        return id_lote
+
+    def _procesar(self, id_lote: str):
+        salidas, errores = [], []
+        with open(self._ruta(id_lote, "entrada.jsonl"), "r", encoding="utf-8") as f:
+            for linea in f:
+                if not linea.strip():
+                    continue
+                peticion = json.loads(linea)
+                try:
+                    contenido = self.responder(peticion["body"])
+                    salidas.append({
+                        "id": f"req_{uuid.uuid4().hex[:12]}",
+                        "custom_id": peticion["custom_id"],
+                        "response": {"status_code": 200, "body": {"choices": [{"message": {"role": "assistant", "content": contenido}}]}},
+                        "error": None,
+                    })
+                except Exception as e:
+                    errores.append({"custom_id": peticion["custom_id"], "response": None, "error": {"message": str(e)}})
+
+        for nombre, lineas in (("salida.jsonl", salidas), ("errores.jsonl", errores)):
+            with open(self._ruta(id_lote, nombre), "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(l, ensure_ascii=False) + "\n" for l in lineas)
+        return f"{id_lote}/salida.jsonl", (f"{id_lote}/errores.jsonl" if errores else None)
+
+    def consultar(self, id_lote: str) -> dict:
+        estado = self._leer_estado(id_lote)
+        if estado["estado"] not in ESTADOS_FINALES:
+            estado["consultas"] += 1
+            if estado["consultas"] >= self.consultas_hasta_completar:
+                estado["id_salida"], estado["id_errores"] = self._procesar(id_lote)
+                estado["estado"] = "completed"
+            else:
+                estado["estado"] = "in_progress"
+            self._escribir_estado(id_lote, estado)
+        return {"estado": estado["estado"], "id_salida": estado["id_salida"], "id_errores": estado["id_errores"]}
+
+    def descargar(self, id_fichero: str) -> str:
+        with open(os.path.join(self.carpeta, id_fichero), "r", encoding="utf-8") as f:
+            return f.read()
+
+def obtener_transporte_lote():
+    if os.getenv("FICHAS_LOTE_TRANSPORTE", "openai").lower() == "local":
+        return TransporteLoteLocal()
+    return TransporteLoteOpenAI()
+
+def generar_jsonl_lote(chunks: list[str], nombre_base: str, ruta_jsonl: str, carpeta_salida: str = None, al_completar=None,
+                       campos_omitidos: tuple = (), metricas=None) -> dict:
+    """
+    Escribe una petición por chunk en `ruta_jsonl` (custom_id = <nombre_base>_parteN).
+    Los chunks con respuesta en caché no se envían: su parte se escribe directamente.
+    Devuelve, por custom_id de las peticiones incluidas en el lote, su clave de caché,
+    cuerpo, campos omitidos y densidad (None si no se enruta por modelo).
+    """
+    os.makedirs(os.path.dirname(ruta_jsonl), exist_ok=True)
+    incluidas = {}
+    with open(ruta_jsonl, "w", encoding="utf-8") as f:
+        for i, chunk in enumerate(chunks):
+            if not chunk.strip():
+                continue
+            custom_id = f"{nombre_base}_parte{i+1}"
+            omitidos = resumidor.campos_omitidos_chunk(chunk, campos_omitidos)
+            if omitidos is None:
+                print(f"⏭️ {custom_id}: sin campos relevantes, no se incluye en el lote")
+                if metricas is not None:
+                    metricas.contar("chunks_descartados")
+                continue
+            clave = resumidor.clave_cache_chunk(chunk, omitidos)
+            modelo, _, densidad = resumidor.elegir_modelo(chunk)
+            if resumidor.cache is not None:
+                cacheado = resumidor.cache.obtener(clave)
+                if cacheado is not None:
+                    data = resumidor.guardar_json_generado(cacheado, custom_id, carpeta_salida)
+                    if metricas is not None:
+                        metricas.registrar_peticion(custom_id, modelo, cache=True)
+                    if al_completar is not None and data is not None:
+                        al_completar(i, data)
+                    continue
+            peticion = construir_peticion_lote(chunk, custom_id, omitidos)
+            f.write(json.dumps(peticion, ensure_ascii=False) + "\n")
+            incluidas[custom_id] = {"clave": clave, "peticion": peticion["body"], "omitidos": omitidos, "densidad": densidad}
+    return incluidas
+
+def esperar_lote(transporte, id_lote: str, intervalo: float = INTERVALO_CONSULTA, timeout: float = None) -> dict:
+    inicio = time.monotonic()
+    while True:
+        estado = transporte.consultar(id_lote)
+        print(f"⏳ Lote {id_lote}: {estado['estado']}")
+        if estado["estado"] in ESTADOS_FINALES:
+            return estado
+        if timeout is not None and time.monotonic() - inicio > timeout:
+            raise TimeoutError(f"El lote {id_lote} no terminó en {timeout}s")
+        time.sleep(intervalo)
+
+def demultiplexar_resultados(contenido_jsonl: str, incluidas: dict, carpeta_salida: str = None, al_completar=None,
+                             metricas=None) -> dict:
+    """
+    Reparte las respuestas del lote en los `_parteN_resumen.json` de siempre
+    (y en la caché), de modo que fusionar_jsons las recoja sin cambios. Las del
+    modelo ligero que el validador rechaza se repiten con MODELO fuera del lote.
+    """
+    resultados = {}
+    for linea in contenido_jsonl.splitlines():
+        if not linea.strip():
+            continue
+        registro = json.loads(linea)
+        custom_id = registro.get("custom_id")
+        respuesta = registro.get("response") or {}
+        if registro.get("error") or respuesta.get("status_code") != 200:
+            print(f"❌ {custom_id}: la petición del lote falló ({registro.get('error') or respuesta.get('status_code')})")
+            if metricas is not None:
+                metricas.contar("errores")
+            continue
+        # Las peticiones del lote no tienen latencia individual: solo tokens y coste (con descuento)
+        incluida = incluidas[custom_id]
+        modelo = incluida["peticion"]["model"]
+        if metricas is not None:
+            metricas.registrar_peticion(custom_id, modelo, respuesta=respuesta["body"], lote=True)
+        contenido = respuesta["body"]["choices"][0]["message"]["content"].strip()
+        cacheable = True
+        escalado = False
+        motivos = resumidor.motivos_escalado(contenido) if modelo != resumidor.MODELO else []
+        if motivos:
+            print(f"⬆️ {custom_id}: {modelo} no supera {', '.join(motivos)}; se repite con {resumidor.MODELO} fuera del lote")
+            escalado = True
+            peticion = {**incluida["peticion"], "model": resumidor.MODELO, "max_tokens": resumidor.MAX_TOKENS_RESPUESTA}
+            contenido, cacheable = resumidor.pedir_respuesta(peticion, custom_id, incluida["omitidos"], metricas)
+        if incluida["densidad"] is not None and metricas is not None:
+            metricas.registrar_enrutado(custom_id, incluida["densidad"], modelo, resumidor.MODELO, escalado)
+        if not contenido:
+            continue
+        resultados[custom_id] = contenido
+        data = resumidor.guardar_json_generado(contenido, custom_id, carpeta_salida)
+        if data is None:
+            continue
+        if resumidor.cache is not None and cacheable:
+            resumidor.cache.guardar(incluida["clave"], contenido,
+                                    {"modelo": resumidor.MODELO if escalado else modelo, "parte": custom_id, "lote": True})
+        numero = re.search(r"_parte(\d+)$", custom_id)
+        if al_completar is not None and numero:
+            al_completar(int(numero.group(1)) - 1, data)
+    return resultados
+
+def resumir_en_lote(chunks: list[str], nombre_base: str, transporte=None, carpeta_salida: str = None,
+                    intervalo: float = INTERVALO_CONSULTA, timeout: float = None, al_completar=None,
+                    campos_omitidos: tuple = (), metricas=None) -> str:
+    transporte = transporte or obtener_transporte_lote()
+    ruta_jsonl = os.path.join(CARPETA_LOTES, f"{nombre_base}_{time.strftime('%Y%m%d_%H%M%S')}.jsonl")
+    incluidas = generar_jsonl_lote(chunks, nombre_base, ruta_jsonl, carpeta_salida, al_completar, campos_omitidos, metricas)
+
+    if not incluidas:
+        print("♻️ Todas las partes estaban en caché; no se envía lote.")
+        return ""
+
+    print(f"📤 Enviando lote con {len(incluidas)} peticiones ({ruta_jsonl})...")
+    id_lote = transporte.enviar(ruta_jsonl)
+    estado = esperar_lote(transporte, id_lote, intervalo, timeout)
+
+    if estado.get("id_errores"):
+        print(f"⚠️ El lote {id_lote} devolvió errores en {estado['id_errores']}")
+    if estado["estado"] != "completed" or not estado.get("id_salida"):
+        print(f"❌ El lote {id_lote} terminó en estado '{estado['estado']}'")
+        return ""
+
+    resultados = demultiplexar_resultados(transporte.descargar(estado["id_salida"]), incluidas, carpeta_salida, al_completar,
+                                          metricas)
+    print(f"📥 Lote {id_lote}: {len(resultados)}/{len(incluidas)} partes recibidas")
+    return "\n\n".join(resultados[c] for c in incluidas if c in resultados)
+
+def resumir_contexto_en_lote(contexto: ContextoPipeline, transporte=None, omitir: set = None, al_completar=None,
+                             campos_omitidos: tuple = (), metricas=None) -> str:
+    chunks = [c if i not in (omitir or set()) else "" for i, c in enumerate(resumidor.chunks_contexto(contexto))]
+    return resumir_en_lote(chunks, contexto.nombre_base, transporte, contexto.carpeta_json, al_completar=al_completar,
+                           campos_omitidos=campos_omitidos, metricas=metricas)
@@ -0,0 +1,147 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.normpath(os.path.join(BASE_DIR, ".."))
+
+# Código y plantillas de los que depende cada etapa: si cambian, la etapa se repite
+DEPENDENCIAS_ETAPA = {
+    # El chunker decide qué líneas son estructurales (no se quitan como cabecera repetida)
+    "extraccion": ["scripts/extractor_texto.py", "scripts/chunker.py"],
+    # El validador decide cuándo se escala del modelo ligero al principal
+    "resumen": [
+        "scripts/resumidor_ia.py", "scripts/chunker.py", "scripts/prompt_ia.py",
+        "scripts/preextractor.py", "scripts/enrutador.py", "scripts/json_incremental.py", "scripts/validador.py",
+        "entradas/instrucciones.json", "entradas/plantilla.json", "entradas/tipos_ayuda.json",
+    ],
+    "fusion": ["scripts/fusionador.py", "scripts/validador.py", "scripts/preextractor.py", "scripts/similitud.py", "entradas/plantilla.json", "entradas/tipos_ayuda.json"],
+    "limpieza": ["scripts/limpiador_json.py", "scripts/similitud.py"],
+    "docx": ["scripts/generar_docx.py"],
+}
+
+def hash_bytes(contenido: bytes) -> str:
+    return hashlib.sha256(contenido).hexdigest()
+
+def hash_archivo(ruta: str) -> str:
+    h = hashlib.sha256()
+    try:
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloque)
+    except OSError:
+        return ""
+    return h.hexdigest()
+
+def hash_texto(texto: str) -> str:
+    return hash_bytes(texto.encode("utf-8"))
+
+def huella_dependencias(*etapas) -> str:
+    # Código y plantillas de las etapas indicadas: cambia si cambia cualquiera de ellos
+    h = hashlib.sha256()
+    for etapa in etapas:
+        for ruta in DEPENDENCIAS_ETAPA.get(etapa, []):
+            h.update(ruta.encode("utf-8"))
+            h.update(hash_archivo(os.path.join(RAIZ, ruta)).encode("utf-8"))
+    return h.hexdigest()
+
+class Manifiesto:
+    """
+    Registro por trabajo de los hashes de entrada y salida de cada etapa. Una etapa
+    está vigente si sus entradas (incluido el código del que depende) no han cambiado
+    y sus salidas siguen en disco tal y como se escribieron.
+    """
+
+    def __init__(self, ruta: str, forzar: bool = False):
+        self.ruta = ruta
+        self.forzar = forzar
+        self.datos = {"etapas": {}, "partes": {}}
+        if os.path.exists(ruta):
+            try:
+                with open(ruta, "r", encoding="utf-8") as f:
+                    self.datos = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Manifiesto ilegible, se regenerará: {e}")
+
+    def huella(self, etapa: str, *entradas) -> str:
+        h = hashlib.sha256()
+        for ruta in DEPENDENCIAS_ETAPA.get(etapa, []):
+            h.update(ruta.encode("utf-8"))
+            h.update(hash_archivo(os.path.join(RAIZ, ruta)).encode("utf-8"))
+        for entrada in entradas:
+            h.update(b"\x00")
+            h.update(str(entrada).encode("utf-8"))
+        return h.hexdigest()
+
+    def huella_archivos(self, etapa: str, rutas: list[str], *entradas) -> str:
+        return self.huella(etapa, *(f"{os.path.basename(r)}:{hash_archivo(r)}" for r in rutas), *entradas)
+
+    def vigente(self, etapa: str, huella_entradas: str) -> bool:
+        registro = self.datos["etapas"].get(etapa)
+        if self.forzar or not registro or registro.get("entradas") != huella_entradas:
+            return False
+        return all(hash_archivo(ruta) == h for ruta, h in registro.get("salidas", {}).items())
+
+    def registrar(self, etapa: str, huella_entradas: str, salidas: list[str]):
+        self.datos["etapas"][etapa] = {
+            "entradas": huella_entradas,
+            "salidas": {ruta: hash_archivo(ruta) for ruta in salidas if os.path.exists(ruta)},
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+        }
+        self.guardar()
+
+    def reutilizar_partes(self, nombre_base: str, carpeta: str, huellas_chunks: list[str]) -> dict:
+        """
+        Compara las huellas de los chunks actuales con las de la ejecución anterior.
+        Las partes cuyo chunk ya se resumió (aunque haya cambiado de posición) se
+        reescriben desde la respuesta previa; las partes sobrantes se eliminan.
+        Devuelve {índice: dict} de los chunks que no necesitan llamada al modelo.
+        """
+        anteriores = {}
+        if not self.forzar:
+            # Las respuestas guardadas en el manifiesto no dependen de FICHAS_GUARDAR_PARTES;
+            # los manifiestos antiguos solo tienen los archivos de cada parte
+            anteriores.update(self.datos.get("respuestas", {}))
+            for nombre, huella in self.datos.get("partes", {}).items():
+                ruta = os.path.join(carpeta, nombre)
+                try:
+                    with open(ruta, "r", encoding="utf-8") as f:
+                        anteriores.setdefault(huella, json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        os.makedirs(carpeta, exist_ok=True)
+        reutilizados = {}
+        for indice, huella in enumerate(huellas_chunks):
+            if huella in anteriores:
+                ruta = os.path.join(carpeta, f"{nombre_base}_parte{indice+1}_resumen.json")
+                with open(ruta, "w", encoding="utf-8") as f:
+                    json.dump(anteriores[huella], f, indent=2, ensure_ascii=False)
+                reutilizados[indice] = anteriores[huella]
+
+        # Las partes que se van a regenerar o que ya no corresponden a ningún chunk se borran,
+        # para que un chunk fallido no deje en su lugar la respuesta de otra ejecución
+        nombres_reutilizados = {f"{nombre_base}_parte{i+1}_resumen.json" for i in reutilizados}
+        if os.path.isdir(carpeta):
+            for nombre in os.listdir(carpeta):
+                if nombre.startswith(f"{nombre_base}_parte") and nombre.endswith("_resumen.json") and nombre not in nombres_reutilizados:
+                    os.remove(os.path.join(carpeta, nombre))
+        return reutilizados
+
+    def registrar_partes(self, nombre_base: str, carpeta: str, huellas_chunks: list[str], respuestas: dict = None):
+        """Registra las partes en disco y, si se dan, las respuestas {índice: dict} de cada chunk."""
+        partes = {}
+        for indice, huella in enumerate(huellas_chunks):
+            nombre = f"{nombre_base}_parte{indice+1}_resumen.json"
+            if os.path.exists(os.path.join(carpeta, nombre)):
+                partes[nombre] = huella
+        self.datos["partes"] = partes
+        if respuestas is not None:
+            self.datos["respuestas"] = {huellas_chunks[i]: data for i, data in sorted(respuestas.items())}
+        self.guardar()
+
+    def guardar(self):
+        os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+        with open(self.ruta, "w", encoding="utf-8") as f:
+            json.dump(self.datos, f, indent=2, ensure_ascii=False)
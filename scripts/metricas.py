@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Carpeta del textfile collector de node_exporter; sin definir no se escribe el .prom
+CARPETA_PROMETHEUS = os.getenv("FICHAS_METRICAS_PROMETHEUS_DIR", "")
+
+# Precio en USD por millón de tokens (entrada, entrada servida desde la caché del proveedor, salida)
+PRECIOS_MODELOS = {
+    "gpt-4o": {"entrada": 2.50, "entrada_cache": 1.25, "salida": 10.00},
+    "gpt-4o-mini": {"entrada": 0.15, "entrada_cache": 0.075, "salida": 0.60},
+}
+# El Batch API factura la mitad
+DESCUENTO_LOTE = 0.5
+
+# Límites superiores (segundos) de los cubos del histograma de latencia por petición
+CUBOS_LATENCIA = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+def _leer(objeto, clave):
+    return objeto.get(clave) if isinstance(objeto, dict) else getattr(objeto, clave, None)
+
+def uso_desde_respuesta(respuesta) -> dict:
+    """
+    Tokens de `response.usage`, tanto del objeto del cliente como del dict
+    que devuelve el Batch API.
+    """
+    uso = _leer(respuesta, "usage")
+    if uso is None:
+        return {}
+    detalles = _leer(uso, "prompt_tokens_details")
+    return {
+        "prompt_tokens": _leer(uso, "prompt_tokens") or 0,
+        "completion_tokens": _leer(uso, "completion_tokens") or 0,
+        "cached_tokens": (_leer(detalles, "cached_tokens") if detalles is not None else 0) or 0,
+    }
+
+def precios_modelo(modelo: str):
+    # Las respuestas traen el nombre con fecha (gpt-4o-2024-08-06): vale el prefijo conocido más largo
+    if modelo in PRECIOS_MODELOS:
+        return PRECIOS_MODELOS[modelo]
+    prefijos = [m for m in PRECIOS_MODELOS if (modelo or "").startswith(f"{m}-")]
+    return PRECIOS_MODELOS[max(prefijos, key=len)] if prefijos else None
+
+def calcular_coste(modelo: str, uso: dict, lote: bool = False) -> float:
+    precios = precios_modelo(modelo)
+    if not precios or not uso:
+        return 0.0
+    cacheados = uso.get("cached_tokens", 0)
+    coste = (
+        (uso.get("prompt_tokens", 0) - cacheados) * precios["entrada"]
+        + cacheados * precios["entrada_cache"]
+        + uso.get("completion_tokens", 0) * precios["salida"]
+    ) / 1_000_000
+    return coste * DESCUENTO_LOTE if lote else coste
+
+def percentil(valores: list[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+class MetricasEjecucion:
+    """
+    Métricas de una ejecución (una ficha): duración de cada etapa, latencia y tokens
+    de cada petición al modelo, coste, reintentos y aciertos de caché. Es segura entre
+    hilos, así que los workers de resumir_chunks escriben en la misma instancia.
+    """
+
+    def __init__(self, trabajo: str = "ficha"):
+        self.trabajo = trabajo
+        self.inicio = datetime.now().isoformat(timespec="seconds")
+        self._reloj_inicio = time.perf_counter()
+        self.etapas = {}
+        self.peticiones = []
+        self.contadores = {}
+        self.enrutado = []
+        self.etapa_actual = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def etapa(self, nombre: str):
+        inicio = time.perf_counter()
+        self.etapa_actual = nombre
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.etapas[nombre] = round(self.etapas.get(nombre, 0.0) + time.perf_counter() - inicio, 3)
+
+    def contar(self, nombre: str, cantidad: int = 1):
+        with self._lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + cantidad
+
+    def registrar_peticion(self, parte: str, modelo: str, latencia: float = None, respuesta=None,
+                           cache: bool = False, lote: bool = False):
+        uso = uso_desde_respuesta(respuesta) if respuesta is not None else {}
+        registro = {
+            "parte": parte,
+            "modelo": modelo,
+            "cache": cache,
+            "lote": lote,
+            "latencia": round(latencia, 3) if latencia is not None else None,
+            **uso,
+            "coste_usd": round(calcular_coste(modelo, uso, lote), 6),
+        }
+        with self._lock:
+            self.peticiones.append(registro)
+
+    def registrar_enrutado(self, parte: str, densidad: float, modelo: str, principal: str, escalado: bool = False):
+        # `modelo` es el elegido por densidad y `principal` el que se habría usado sin enrutar
+        with self._lock:
+            self.enrutado.append({"parte": parte, "densidad": densidad, "modelo": modelo,
+                                  "principal": principal, "escalado": escalado})
+
+    def resumen_enrutado(self, peticiones: list[dict], enrutado: list[dict]) -> dict:
+        """
+        Chunks por modelo, escalados y latencia media de cada modelo en la ejecución. El
+        ahorro estimado es lo que habrían tardado con el modelo principal los chunks que
+        resolvió el ligero, menos lo que tardaron (y los intentos escalados).
+        """
+        latencias = {}
+        for p in peticiones:
+            if p["latencia"] is not None and not p["cache"]:
+                latencias.setdefault(p["modelo"], []).append(p["latencia"])
+        medias = {modelo: round(sum(ls) / len(ls), 3) for modelo, ls in latencias.items()}
+        por_modelo = {}
+        for e in enrutado:
+            por_modelo[e["modelo"]] = por_modelo.get(e["modelo"], 0) + 1
+        resumen = {"chunks_por_modelo": por_modelo, "escalados": sum(1 for e in enrutado if e["escalado"]),
+                   "latencia_media": medias}
+        ligeros = [e for e in enrutado if e["modelo"] != e["principal"]]
+        if ligeros and all(e["principal"] in medias and e["modelo"] in medias for e in ligeros):
+            resumen["segundos_ahorrados_estimados"] = round(sum(
+                -medias[e["modelo"]] if e["escalado"] else medias[e["principal"]] - medias[e["modelo"]]
+                for e in ligeros
+            ), 3)
+        return resumen
+
+    def progreso(self) -> dict:
+        """Etapa en curso y chunks resueltos (reutilizados o ya respondidos) de los previstos."""
+        with self._lock:
+            partes = {p["parte"] for p in self.peticiones}
+            contadores = dict(self.contadores)
+        resueltos = len(partes) + contadores.get("chunks_reutilizados", 0) + contadores.get("chunks_almacen", 0)
+        return {
+            "etapa": self.etapa_actual,
+            "chunks": contadores.get("chunks"),
+            "chunks_resueltos": resueltos,
+            "segundos": round(time.perf_counter() - self._reloj_inicio, 3),
+        }
+
+    def resumen(self) -> dict:
+        with self._lock:
+            peticiones = list(self.peticiones)
+            contadores = dict(self.contadores)
+            etapas = dict(self.etapas)
+            enrutado = list(self.enrutado)
+        latencias = [p["latencia"] for p in peticiones if p["latencia"] is not None]
+        extra = {"enrutado": self.resumen_enrutado(peticiones, enrutado)} if enrutado else {}
+        return {
+            "trabajo": self.trabajo,
+            "inicio": self.inicio,
+            "etapas_segundos": etapas,
+            "total_segundos": round(time.perf_counter() - self._reloj_inicio, 3),
+            "peticiones": len([p for p in peticiones if not p["cache"]]),
+            "aciertos_cache": len([p for p in peticiones if p["cache"]]),
+            "prompt_tokens": sum(p.get("prompt_tokens", 0) for p in peticiones),
+            "completion_tokens": sum(p.get("completion_tokens", 0) for p in peticiones),
+            "cached_tokens": sum(p.get("cached_tokens", 0) for p in peticiones),
+            "coste_usd": round(sum(p["coste_usd"] for p in peticiones), 6),
+            "latencia_p50": percentil(latencias, 0.5),
+            "latencia_p95": percentil(latencias, 0.95),
+            "latencia_max": max(latencias, default=0.0),
+            "contadores": contadores,
+            **extra,
+        }
+
+    def guardar_json(self, ruta: str) -> str:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with self._lock:
+            peticiones = list(self.peticiones)
+            enrutado = {"detalle_enrutado": list(self.enrutado)} if self.enrutado else {}
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump({**self.resumen(), "detalle_peticiones": peticiones, **enrutado}, f, indent=2, ensure_ascii=False)
+        print(f"📊 Métricas guardadas en: {ruta}")
+        return ruta
+
+    def texto_prometheus(self) -> str:
+        r = self.resumen()
+        etiqueta = f'trabajo="{self.trabajo}"'
+        lineas = [
+            "# HELP fichas_etapa_segundos Duración de cada etapa de la última ejecución.",
+            "# TYPE fichas_etapa_segundos gauge",
+        ]
+        lineas += [f'fichas_etapa_segundos{{{etiqueta},etapa="{e}"}} {s}' for e, s in r["etapas_segundos"].items()]
+
+        lineas += ["# HELP fichas_tokens Tokens consumidos en la última ejecución.", "# TYPE fichas_tokens gauge"]
+        for tipo in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+            lineas.append(f'fichas_tokens{{{etiqueta},tipo="{tipo.replace("_tokens", "")}"}} {r[tipo]}')
+
+        lineas += [
+            "# HELP fichas_coste_usd Coste estimado de la última ejecución.", "# TYPE fichas_coste_usd gauge",
+            f"fichas_coste_usd{{{etiqueta}}} {r['coste_usd']}",
+            "# HELP fichas_peticiones Peticiones al modelo y respuestas servidas desde la caché.",
+            "# TYPE fichas_peticiones gauge",
+            f'fichas_peticiones{{{etiqueta},origen="modelo"}} {r["peticiones"]}',
+            f'fichas_peticiones{{{etiqueta},origen="cache"}} {r["aciertos_cache"]}',
+            "# HELP fichas_eventos Reintentos, errores y chunks descartados o reutilizados.",
+            "# TYPE fichas_eventos gauge",
+        ]
+        lineas += [f'fichas_eventos{{{etiqueta},evento="{n}"}} {v}' for n, v in sorted(r["contadores"].items())]
+
+        with self._lock:
+            latencias = [p["latencia"] for p in self.peticiones if p["latencia"] is not None]
+        lineas += [
+            "# HELP fichas_peticion_latencia_segundos Latencia de cada petición al modelo.",
+            "# TYPE fichas_peticion_latencia_segundos histogram",
+        ]
+        for limite in CUBOS_LATENCIA:
+            lineas.append(f'fichas_peticion_latencia_segundos_bucket{{{etiqueta},le="{limite}"}} {sum(1 for l in latencias if l <= limite)}')
+        lineas += [
+            f'fichas_peticion_latencia_segundos_bucket{{{etiqueta},le="+Inf"}} {len(latencias)}',
+            f"fichas_peticion_latencia_segundos_sum{{{etiqueta}}} {round(sum(latencias), 3)}",
+            f"fichas_peticion_latencia_segundos_count{{{etiqueta}}} {len(latencias)}",
+        ]
+        return "\n".join(lineas) + "\n"
+
+    def guardar_prometheus(self, carpeta: str = CARPETA_PROMETHEUS):
+        if not carpeta:
+            return None
+        # El collector lee cualquier .prom de la carpeta: se escribe aparte y se renombra
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, f"fichas_{self.trabajo}.prom")
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(self.texto_prometheus())
+        os.replace(temporal, ruta)
+        return ruta
+
+    def imprimir_resumen(self):
+        r = self.resumen()
+        etapas = ", ".join(f"{e} {s:.1f}s" for e, s in r["etapas_segundos"].items())
+        print(f"📊 {etapas} | {r['peticiones']} peticiones, {r['aciertos_cache']} en caché, "
+              f"{r['prompt_tokens']}+{r['completion_tokens']} tokens, ~{r['coste_usd']:.4f} USD, "
+              f"p95 {r['latencia_p95']:.1f}s")
+        if "enrutado" in r:
+            e = r["enrutado"]
+            modelos = ", ".join(f"{m} {n}" for m, n in e["chunks_por_modelo"].items())
+            ahorro = f", ~{e['segundos_ahorrados_estimados']:.1f}s ahorrados" if "segundos_ahorrados_estimados" in e else ""
+            print(f"🧭 Enrutado: {modelos}, {e['escalados']} escalados{ahorro}")
@@ -0,0 +1,68 @@
+from dataclasses import dataclass, field
+from scripts.chunker import get_tokenizer, dividir_tokens_en_chunks, dividir_por_estructura, MODO_CHUNKING
+from scripts.extractor_texto import DocumentoExtraido, extraer_documentos, unir_textos_documentos
+from scripts.preextractor import preextraer, campos_preextraidos, campos_resueltos
+
+@dataclass
+class ContextoPipeline:
+    """
+    Estado compartido entre etapas de una ejecución: cada documento se extrae
+    una sola vez y el texto, los tokens y los chunks se calculan bajo demanda
+    y se reutilizan en las etapas siguientes.
+    """
+    rutas: list[str]
+    nombre_base: str = "ficha"
+    carpeta_json: str = None
+    documentos: list[DocumentoExtraido] = None
+    _texto_unificado: str = field(default=None, repr=False)
+    _tokens: list[int] = field(default=None, repr=False)
+    _chunks: dict = field(default_factory=dict, repr=False)
+    _preextraccion: dict = field(default=None, repr=False)
+
+    def extraer(self) -> list[DocumentoExtraido]:
+        if self.documentos is None:
+            self.documentos = extraer_documentos(self.rutas)
+        return self.documentos
+
+    def usar_texto(self, texto_unificado: str):
+        # Reutiliza un texto ya extraído (p. ej. la copia .txt de una ejecución anterior)
+        self._texto_unificado = texto_unificado
+        self._tokens = None
+        self._chunks = {}
+        self._preextraccion = None
+
+    @property
+    def texto_unificado(self) -> str:
+        if self._texto_unificado is None:
+            self._texto_unificado = unir_textos_documentos(self.extraer())
+        return self._texto_unificado
+
+    @property
+    def tokens(self) -> list[int]:
+        if self._tokens is None:
+            self._tokens = get_tokenizer("gpt-4o").encode(self.texto_unificado)
+        return self._tokens
+
+    def chunks(self, max_tokens: int = 3000, overlap: int = 200, modo: str = MODO_CHUNKING) -> list[str]:
+        clave = (max_tokens, overlap, modo)
+        if clave not in self._chunks:
+            if modo == "estructura":
+                self._chunks[clave] = dividir_por_estructura(self.texto_unificado, max_tokens, overlap)
+            else:
+                self._chunks[clave] = dividir_tokens_en_chunks(self.tokens, max_tokens, overlap)
+        return self._chunks[clave]
+
+    @property
+    def preextraccion(self) -> dict:
+        if self._preextraccion is None:
+            self._preextraccion = preextraer(self.texto_unificado)
+        return self._preextraccion
+
+    def campos_preextraidos(self) -> dict:
+        return campos_preextraidos(self.preextraccion)
+
+    def campos_resueltos(self) -> tuple:
+        return campos_resueltos(self.preextraccion)
+
+    def metadatos_documentos(self) -> list[dict]:
+        return [{"nombre": d.nombre, "tipo": d.tipo, **d.metadatos} for d in self.extraer()]
@@ -0,0 +1,138 @@
+import re
+
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
+    "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+_MES = "(?i:" + "|".join(MESES) + ")"
+_FECHA = rf"\d{{1,2}}\s+de\s+{_MES}\s+del?\s+\d{{4}}|\d{{1,2}}/\d{{1,2}}/\d{{4}}"
+
+# Cantidades como las de validador.PATRON_EUROS ("1.500 €", "300,50€") y también "3.000 euros".
+# Aquí se exige el agrupamiento de miles completo para capturar la cantidad entera, no solo su cola
+_CANTIDAD = r"\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+(?:,\d{1,2})?"
+
+# Normas citadas: tipo + número/año (o fecha, en las órdenes) + título hasta el final de la frase.
+# Los títulos "por el que..." llegan hasta el punto; los nominales ("General de Subvenciones")
+# hasta la siguiente coma, para no arrastrar el resto de la frase que los cita.
+_NORMA = (
+    r"(?:Real\s+Decreto(?:-[Ll]ey|\s+[Ll]egislativo)?|Decreto(?:-[Ll]ey|\s+[Ll]egislativo)?|Ley(?:\s+Org[áa]nica)?"
+    r"|Reglamento\s+\((?:UE|CE)\)(?:\s+n\.?\s?º)?)\s+\d+/\d{4}"
+    r"|Orden\s+[A-Z]{2,}(?:/[A-Z]+)?/\d+/\d{4}"
+    rf"|Orden\s+de\s+\d{{1,2}}\s+de\s+{_MES}\s+de\s+\d{{4}}"
+)
+# El título se corta antes de las coletillas con que el texto sigue la frase (", que...",
+# "y en el artículo...", "establece que...") o de la siguiente norma citada. Los títulos
+# nominales admiten menos: ni "que" ni "en el/la", que en ellos ya no forman parte del nombre
+_COLETILLAS = (
+    r",\s+que|,?\s+y\s+(?:en|por)\s|,?\s+y\s+(?:el|la)\s+(?:Real\s+)?(?:Decreto|Ley|Orden)|\s+art[íi]culo"
+    r"|,?\s+y\s+\d|(?<!se)\s+(?:establece|dispone|señala|indica|prevé|regula)\s"
+)
+_FIN_TITULO = rf"(?!{_COLETILLAS})"
+_FIN_TITULO_NOMINAL = rf"(?!{_COLETILLAS}|\s+(?:que|en\s+(?:el|la|su)|y\s+(?:(?:Real\s+)?Decreto|Ley|Orden))\b)"
+_TITULO_NORMA = (
+    rf"(?:,\s+de\s+\d{{1,2}}\s+de\s+{_MES}(?:\s+de\s+\d{{4}})?)?"
+    rf"(?:,?\s+(?:por\s+(?:el|la)\s+que\s+(?:{_FIN_TITULO}[^.;]){{0,300}}"
+    rf"|(?:del?\s+)?[A-ZÁÉÍÓÚ](?:{_FIN_TITULO_NOMINAL}[^,.;()]){{0,150}}))?"
+)
+_BOLETIN = r"DOE|BOE|BOP\w*|BOJA|BOCM|BORM|BOA|BOCYL|BOC|DOGV|DOCM|DOGC|DOG|BOIB|BON|BOPA"
+
+# Un único patrón compilado: el texto se recorre una sola vez y cada coincidencia se
+# clasifica por el grupo que la ha producido
+PATRON_PREEXTRACCION = re.compile(
+    rf"(?P<boletin>\b(?:{_BOLETIN})\s+(?:n[úu]m\.?|n\.?\s?º|número)\s*\d+\s*,\s*de\s+(?P<fecha_boletin>{_FECHA}))"
+    rf"|(?P<referencia>\b(?:{_NORMA}){_TITULO_NORMA})"
+    rf"|(?P<plazo>\b(?:desde\s+el|del|entre\s+el)\s+(?P<fecha_inicio>{_FECHA})\s+(?:hasta\s+el|al|y\s+el)\s+(?P<fecha_fin>{_FECHA}))"
+    rf"|(?P<importe>(?<![\d.,])(?:{_CANTIDAD})\s*(?:€|(?i:euros?)\b))"
+)
+PATRON_CANTIDAD = re.compile(_CANTIDAD)
+PATRON_CLAVE_NORMA = re.compile(rf"^(?:{_NORMA})")
+PATRON_PLAZO = re.compile(r"(?i:plazo|solicitud)")
+PATRON_CORTE_CONTEXTO = re.compile(r"[.;:]\s|€|(?i:euros?)\b")
+PATRON_MAXIMO = re.compile(r"(?i:m[áa]xim[oa]|l[íi]mite|hasta\s+(?:un\s+)?(?:importe|cuant[íi]a))")
+
+# Ventana de texto previa a una fecha o importe en la que se busca el contexto que la califica
+VENTANA_CONTEXTO = 150
+# Con menos normas no se da por resuelta la referencia (el validador exige lista multilínea)
+MIN_REFERENCIAS_RESUELTAS = 2
+
+def normalizar_espacios(texto: str) -> str:
+    return re.sub(r"\s+", " ", texto).strip()
+
+def normalizar_fecha(fecha: str) -> str:
+    # "15 de julio de 2025" -> "15/07/2025"
+    partes = normalizar_espacios(fecha).lower().split()
+    if len(partes) >= 5 and partes[2] in MESES:
+        return f"{int(partes[0]):02d}/{MESES[partes[2]]:02d}/{partes[-1]}"
+    dia, mes, anio = fecha.strip().split("/")
+    return f"{int(dia):02d}/{int(mes):02d}/{anio}"
+
+def formatear_referencia(cita: str) -> str:
+    linea = normalizar_espacios(cita).rstrip(" ,")
+    return f"- {linea}."
+
+def preextraer(texto: str) -> dict:
+    """
+    Recorre el texto una vez con PATRON_PREEXTRACCION y devuelve los candidatos
+    deterministas: normas citadas, fecha de publicación en boletín, plazo de
+    solicitud e importes en euros (con el importe máximo si el contexto lo indica).
+    """
+    referencias = {}
+    publicaciones = []
+    plazos = []
+    importes = []
+    maximos = []
+
+    for m in PATRON_PREEXTRACCION.finditer(texto):
+        grupo = m.lastgroup
+        contexto = texto[max(0, m.start() - VENTANA_CONTEXTO):m.start()]
+        if grupo == "boletin":
+            publicaciones.append(normalizar_fecha(m.group("fecha_boletin")))
+        elif grupo == "referencia":
+            # Una línea por norma: si se cita varias veces, se queda la cita más completa
+            cita = normalizar_espacios(m.group("referencia"))
+            clave = normalizar_espacios(PATRON_CLAVE_NORMA.match(cita).group(0)).lower()
+            if len(cita) > len(referencias.get(clave, "")):
+                referencias[clave] = cita
+        elif grupo == "plazo":
+            if PATRON_PLAZO.search(contexto):
+                plazos.append((normalizar_fecha(m.group("fecha_inicio")), normalizar_fecha(m.group("fecha_fin"))))
+        else:
+            importe = normalizar_espacios(m.group("importe"))
+            valor = PATRON_CANTIDAD.match(importe).group(0)
+            importes.append(valor)
+            # Solo cuenta el "máximo" de la misma frase y posterior al importe anterior
+            if PATRON_MAXIMO.search(PATRON_CORTE_CONTEXTO.split(contexto)[-1]):
+                maximos.append(valor)
+
+    return {
+        "referencias": [formatear_referencia(c) for c in referencias.values()],
+        "fechas_publicacion": list(dict.fromkeys(publicaciones)),
+        "plazos": list(dict.fromkeys(plazos)),
+        "importes": list(dict.fromkeys(importes)),
+        "importes_maximos": list(dict.fromkeys(maximos)),
+    }
+
+def campos_preextraidos(preextraccion: dict) -> dict:
+    """
+    Convierte los candidatos en valores con el formato de la plantilla. Solo se
+    rellenan los campos sin ambigüedad: un único plazo, una única fecha de boletín...
+    """
+    campos = {}
+    if preextraccion["referencias"]:
+        campos["referencia_legislativa"] = "\n".join(preextraccion["referencias"])
+    if len(preextraccion["fechas_publicacion"]) == 1:
+        campos["fecha_publicacion"] = preextraccion["fechas_publicacion"][0]
+    if len(preextraccion["plazos"]) == 1:
+        campos["fecha_inicio"], campos["fecha_fin"] = preextraccion["plazos"][0]
+    if len(preextraccion["importes_maximos"]) == 1:
+        campos["importe_maximo"] = [{"concepto": "Importe máximo", "cantidad": f"{preextraccion['importes_maximos'][0]} €"}]
+    return campos
+
+def campos_resueltos(preextraccion: dict) -> tuple:
+    """
+    Campos que se dan por completos y se omiten del prompt. El resto de campos
+    preextraídos solo siembran la fusión: el modelo los sigue rellenando.
+    """
+    if len(preextraccion["referencias"]) >= MIN_REFERENCIAS_RESUELTAS:
+        return ("referencia_legislativa",)
+    return ()
@@ -0,0 +1,158 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+from scripts.chunker import get_tokenizer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Ventana de contexto por modelo y margen de seguridad al calcular el tamaño de chunk
+CONTEXTO_MODELOS = {"gpt-4o": 128000, "gpt-4o-mini": 128000}
+CONTEXTO_POR_DEFECTO = 128000
+MARGEN_TOKENS = 512
+MIN_TOKENS_CHUNK = 500
+
+@lru_cache(maxsize=None)
+def leer_entrada(nombre: str) -> str:
+    # Cada archivo de entradas/ se lee una vez por proceso; quien lo parsea recibe su propia copia
+    with open(os.path.join(BASE_DIR, "..", "entradas", nombre), "r", encoding="utf-8") as f:
+        return f.read()
+
+def cargar_plantilla_json():
+    return json.loads(leer_entrada("plantilla.json"))
+
+@lru_cache(maxsize=None)
+def campos_plantilla() -> tuple:
+    return tuple(cargar_plantilla_json())
+
+def cargar_instrucciones_texto():
+    return leer_entrada("instrucciones.json")
+
+def cargar_lista_tipo_ayuda():
+    data = json.loads(leer_entrada("tipos_ayuda.json"))
+    return "\n- " + "\n- ".join(data.get("tipos_de_ayuda", []))
+
+@lru_cache(maxsize=None)
+def construir_prefijo_prompt() -> str:
+    """
+    Parte estática del prompt (directrices, instrucciones, tipos de ayuda y plantilla).
+    Se renderiza una vez por proceso y va siempre delante del texto del chunk, de modo
+    que el proveedor pueda reutilizar su caché automática de prefijos.
+    """
+    instrucciones = cargar_instrucciones_texto()
+    plantilla = cargar_plantilla_json()
+    tipos_ayuda_str = cargar_lista_tipo_ayuda()
+
+    return f"""
+Eres un asistente legal experto en ayudas públicas. Tu tarea es analizar el texto legal proporcionado y devolver un resumen estructurado en formato JSON, siguiendo fielmente la plantilla y todas las reglas del proyecto Fichas Miguel.
+
+ DIRECTRICES CLAVE (cumple todas):
+
+1. **denominacion_normativa_nombre_ayuda**:
+   - Resume el título oficial.
+   - Incluye el año de la convocatoria si aparece.
+   - Si es plurianual, refleja el año correspondiente.
+
+2. **tipo_ayuda**: solo puede contener términos exactos de esta lista cerrada:
+{tipos_ayuda_str}
+
+3. **descripcion**:
+   - Desarrolla una descripción exhaustiva y clara.
+   - Detalla modalidades, servicios cubiertos, requisitos y finalidad.
+   - Indica incompatibilidades solo si aparecen literalmente en el texto.
+   - No repitas información que ya se indica en cuantía, requisitos o documentación.
+   - No incluyas valores económicos aquí.
+
+4. **cuantia**:
+   - Incluir solo cantidades que el beneficiario percibe o paga finalmente.
+   - Refleja tramos, descuentos aplicados o aportaciones finales.
+   - No inventes ni adaptes valores.
+   - Si hay tablas o escalas, conviértelas en una lista clara.
+
+5. **referencia_legislativa**:
+   - Incluye todas las normas mencionadas, sin omitir ninguna disposición legal.
+   - Una por línea, completas y literales.
+
+6. **lugares_presentacion.online**:
+   - Si hay sede electrónica concreta, inclúyela primero.
+   - Luego añade siempre esta frase: "También puede presentarse a través de la Red SARA (Sistema de Aplicaciones y Redes para las Administraciones), una plataforma estatal segura que permite enviar solicitudes electrónicas a cualquier administración pública, usando certificado digital o sistema Cl@ve."
+
+📎 Instrucciones completas del proyecto:
+{instrucciones}
+
+ Plantilla JSON a completar:
+{json.dumps(plantilla, indent=2, ensure_ascii=False)}
+
+ Devuelve únicamente el JSON final, sin encabezados, sin explicaciones ni comentarios.
+"""
+
+def construir_mensaje_chunk(texto_extraido: str, campos_omitidos: tuple = ()) -> str:
+    # Los campos que no se piden (resueltos localmente o que el chunk no trata) van aquí y no
+    # en el prefijo, que se mantiene idéntico; se enumera la lista más corta de las dos
+    omitir = ""
+    if campos_omitidos:
+        solicitados = [c for c in campos_plantilla() if c not in campos_omitidos]
+        if len(solicitados) < len(campos_omitidos):
+            omitir = f"\n Devuelve solo estos campos de la plantilla (el resto no se necesita): {', '.join(solicitados)}.\n"
+        else:
+            omitir = f"\n No incluyas en el JSON estos campos, ya se han extraído del texto o no aparecen en él: {', '.join(campos_omitidos)}.\n"
+    return f"""
+ Texto legal a analizar:
+---
+{texto_extraido}
+---
+{omitir}"""
+
+def construir_mensajes(texto_extraido: str, campos_omitidos: tuple = ()) -> list[dict]:
+    return [
+        {"role": "system", "content": construir_prefijo_prompt()},
+        {"role": "user", "content": construir_mensaje_chunk(texto_extraido, campos_omitidos)},
+    ]
+
+def esquema_valor(ejemplo) -> dict:
+    # Tipo JSON Schema de un valor de la plantilla: textos, listas de textos u objetos
+    if isinstance(ejemplo, dict):
+        return {
+            "type": "object",
+            "properties": {clave: esquema_valor(valor) for clave, valor in ejemplo.items()},
+            "required": list(ejemplo),
+            "additionalProperties": False,
+        }
+    if isinstance(ejemplo, list):
+        return {"type": "array", "items": esquema_valor(ejemplo[0] if ejemplo else "")}
+    return {"type": "string"}
+
+@lru_cache(maxsize=None)
+def formato_respuesta(campos_omitidos: tuple = ()) -> dict:
+    """
+    `response_format` de salida estructurada: el modelo solo puede devolver un objeto con
+    los campos pedidos, en el orden de la plantilla y con sus tipos, así que la respuesta
+    siempre es JSON válido.
+    """
+    plantilla = cargar_plantilla_json()
+    esquema = esquema_valor({c: v for c, v in plantilla.items() if c not in campos_omitidos})
+    return {"type": "json_schema", "json_schema": {"name": "ficha", "strict": True, "schema": esquema}}
+
+@lru_cache(maxsize=None)
+def huella_prefijo() -> str:
+    return hashlib.sha256(construir_prefijo_prompt().encode("utf-8")).hexdigest()
+
+@lru_cache(maxsize=None)
+def contar_tokens_prefijo(modelo: str = "gpt-4o") -> int:
+    tokenizer = get_tokenizer(modelo)
+    return len(tokenizer.encode(construir_prefijo_prompt())) + len(tokenizer.encode(construir_mensaje_chunk("")))
+
+def calcular_max_tokens_chunk(modelo: str = "gpt-4o", max_tokens_respuesta: int = 4096, max_tokens_chunk: int = 3000) -> int:
+    """
+    Tamaño de chunk que mantiene prompt + chunk + respuesta dentro de la ventana del modelo.
+    Lanza ValueError si ni siquiera cabe un chunk de MIN_TOKENS_CHUNK: es mejor fallar
+    antes de enviar nada que mandar peticiones que el modelo rechazará.
+    """
+    limite = CONTEXTO_MODELOS.get(modelo, CONTEXTO_POR_DEFECTO)
+    disponible = limite - contar_tokens_prefijo(modelo) - max_tokens_respuesta - MARGEN_TOKENS
+    if disponible < MIN_TOKENS_CHUNK:
+        raise ValueError(f"El prompt ({contar_tokens_prefijo(modelo)} tokens) y la respuesta ({max_tokens_respuesta}) "
+                         f"no dejan sitio en la ventana de {modelo} ({limite}) para un chunk de {MIN_TOKENS_CHUNK} tokens")
+    if disponible < max_tokens_chunk:
+        print(f"⚠️ El prompt ocupa {contar_tokens_prefijo(modelo)} tokens: chunks reducidos a {disponible} tokens")
+    return min(max_tokens_chunk, disponible)
@@ -1,142 +1,483 @@
 import os
 import json
 import re
-from openai import OpenAI
-from dotenv import load_dotenv
-from scripts.chunker import dividir_en_chunks
-from scripts.extractor_texto import extraer_texto, extraer_textos_unificados
-
-# Inicialización
-load_dotenv()
-client = OpenAI()
+import random
+import time
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from scripts.chunker import dividir_en_chunks, iterar_chunks
+from scripts.extractor_texto import extraer_texto, extraer_textos_unificados, iterar_paginas
+from scripts.cache_llm import CacheRespuestas, calcular_clave
+from scripts.pipeline import ContextoPipeline
+from scripts.transporte_llm import obtener_transporte_llm
+from scripts.enrutador import campos_no_relevantes, puntuar_densidad
+from scripts.validador import campos_rechazados
+from scripts.json_incremental import AnalizadorJSONIncremental
+from scripts.prompt_ia import (
+    cargar_plantilla_json, cargar_instrucciones_texto, cargar_lista_tipo_ayuda,
+    construir_mensajes, huella_prefijo, calcular_max_tokens_chunk, campos_plantilla, formato_respuesta,
+)
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def cargar_plantilla_json():
-    with open(os.path.join(BASE_DIR, "..", "entradas", "plantilla.json"), "r", encoding="utf-8") as f:
-        return json.load(f)
+# El cliente y el transporte se crean en la primera petición: importar este módulo no
+# carga openai ni exige OPENAI_API_KEY (p. ej. si todos los chunks salen de la caché)
+_cliente = None
+_lock_cliente = threading.Lock()
+# En vivo, grabando o reproduciendo grabaciones según FICHAS_TRANSPORTE_LLM
+transporte = None
+_lock_transporte = threading.Lock()
 
-def cargar_instrucciones_texto():
-    with open(os.path.join(BASE_DIR, "..", "entradas", "instrucciones.json"), "r", encoding="utf-8") as f:
-        return f.read()
+# Concurrencia y reintentos de las llamadas al modelo
+MAX_CONCURRENCIA = int(os.getenv("FICHAS_MAX_CONCURRENCIA", "4"))
+MAX_REINTENTOS = int(os.getenv("FICHAS_MAX_REINTENTOS", "5"))
+ESPERA_BASE_REINTENTO = 1.0
+ESPERA_MAXIMA_REINTENTO = 30.0
+CODIGOS_REINTENTABLES = {408, 409, 429}
 
-def cargar_lista_tipo_ayuda():
-    with open(os.path.join(BASE_DIR, "..", "entradas", "tipos_ayuda.json"), "r", encoding="utf-8") as f:
-        data = json.load(f)
-        return "\n- " + "\n- ".join(data.get("tipos_de_ayuda", []))
+# Tope global de peticiones simultáneas al modelo, compartido por todos los trabajos del proceso
+MAX_PETICIONES_GLOBALES = int(os.getenv("FICHAS_MAX_PETICIONES_GLOBALES", "8"))
+limite_peticiones = threading.BoundedSemaphore(MAX_PETICIONES_GLOBALES)
 
-def guardar_json_generado(contenido_json: str, nombre_base: str):
-    carpeta = os.path.join(BASE_DIR, "..", "salidas_json")
-    os.makedirs(carpeta, exist_ok=True)
-    ruta = os.path.join(carpeta, f"{nombre_base}_resumen.json")
+# Parámetros del modelo (forman parte de la clave de caché)
+MODELO = "gpt-4o"
+TEMPERATURA = 0.3
+MAX_TOKENS_RESPUESTA = 4096
 
-    try:
-        contenido_json = contenido_json.strip()
+# Enrutado de modelo (FICHAS_ENRUTAR_MODELO=1): los chunks con poca información concreta
+# (importes, fechas, requisitos... por cada 1000 caracteres) van a un modelo más pequeño y
+# con menos tokens de respuesta; si el validador rechaza lo que devuelve, se repite con MODELO
+ENRUTAR_MODELO = os.getenv("FICHAS_ENRUTAR_MODELO", "").lower() in ("1", "true", "si")
+MODELO_LIGERO = os.getenv("FICHAS_MODELO_LIGERO", "gpt-4o-mini")
+MAX_TOKENS_LIGERO = int(os.getenv("FICHAS_MAX_TOKENS_LIGERO", "1024"))
+UMBRAL_DENSIDAD = float(os.getenv("FICHAS_UMBRAL_DENSIDAD", "1.0"))
+# Reglas del validador que provocan el escalado: las de formato y corrección. Las de
+# completitud (descripción de 50 palabras, 2 documentos...) las incumple cualquier chunk
+# con poca información, también con el modelo grande
+REGLAS_ESCALADO = tuple(
+    r.strip() for r in os.getenv(
+        "FICHAS_REGLAS_ESCALADO", "tipo_ayuda,cuantia,lugares_presentacion.online,usuario,frase_publicitaria"
+    ).split(",") if r.strip()
+)
+
+# Salida estructurada (json_schema estricto con los campos pedidos): la respuesta siempre
+# es JSON válido. Cambia la respuesta, así que forma parte de la clave de caché
+SALIDA_ESTRUCTURADA = os.getenv("FICHAS_SALIDA_ESTRUCTURADA", "").lower() in ("1", "true", "si")
+
+# Respuestas en streaming: cada campo pasa a la fusión en cuanto se cierra y la petición se
+# corta cuando ya han llegado todos los campos pedidos (el resto de la plantilla no se lee)
+STREAMING_RESPUESTAS = os.getenv("FICHAS_STREAMING_RESPUESTAS", "").lower() in ("1", "true", "si")
+
+# Las partes _parteN_resumen.json son una copia de depuración: la fusión recibe los dicts en memoria
+GUARDAR_PARTES = os.getenv("FICHAS_GUARDAR_PARTES", "1").lower() in ("1", "true", "si")
+
+# Caché persistente de respuestas por chunk (FICHAS_CACHE_DESACTIVADA=1 para omitirla)
+cache = None if os.getenv("FICHAS_CACHE_DESACTIVADA", "").lower() in ("1", "true", "si") else CacheRespuestas()
 
-        # Eliminar formato Markdown tipo ```json ... ```
-        if contenido_json.startswith("```json") or contenido_json.startswith("```"):
-            contenido_json = re.sub(r"^```(?:json)?\s*|```$", "", contenido_json.strip(), flags=re.DOTALL).strip()
+def parsear_json_generado(contenido_json: str) -> dict:
+    contenido_json = contenido_json.strip()
 
-        json_data = json.loads(contenido_json)
+    # Eliminar formato Markdown tipo ```json ... ```
+    if contenido_json.startswith("```json") or contenido_json.startswith("```"):
+        contenido_json = re.sub(r"^```(?:json)?\s*|```$", "", contenido_json.strip(), flags=re.DOTALL).strip()
 
+    return json.loads(contenido_json)
+
+def guardar_json_generado(contenido_json: str, nombre_base: str, carpeta: str = None):
+    carpeta = carpeta or os.path.join(BASE_DIR, "..", "salidas_json")
+    ruta = os.path.join(carpeta, f"{nombre_base}_resumen.json")
+
+    try:
+        json_data = parsear_json_generado(contenido_json)
+        if not GUARDAR_PARTES:
+            return json_data
+
+        os.makedirs(carpeta, exist_ok=True)
         with open(ruta, "w", encoding="utf-8") as f:
             json.dump(json_data, f, indent=2, ensure_ascii=False)
 
         print(f"💾 Resumen guardado en: {ruta}")
+        return json_data
     except Exception as e:
         print(f"❌ No se pudo guardar el JSON: {e}")
+        return None
 
-def generar_resumen_con_openai(texto_extraido: str, nombre_archivo_salida: str = "ficha") -> str:
-    instrucciones = cargar_instrucciones_texto()
-    plantilla = cargar_plantilla_json()
-    tipos_ayuda_str = cargar_lista_tipo_ayuda()
+def configurar_limite_peticiones(maximo: int):
+    global limite_peticiones
+    limite_peticiones = threading.BoundedSemaphore(max(maximo, 1))
 
-    prompt = f"""
-Eres un asistente legal experto en ayudas públicas. Tu tarea es analizar el texto legal proporcionado y devolver un resumen estructurado en formato JSON, siguiendo fielmente la plantilla y todas las reglas del proyecto Fichas Miguel.
+def obtener_cliente():
+    global _cliente
+    with _lock_cliente:
+        if _cliente is None:
+            from dotenv import load_dotenv
+            from openai import OpenAI
+            load_dotenv()
+            # Los reintentos los gestiona llamar_con_reintentos (con jitter), no el cliente
+            _cliente = OpenAI(max_retries=0)
+        return _cliente
 
- DIRECTRICES CLAVE (cumple todas):
+def obtener_transporte():
+    global transporte
+    with _lock_transporte:
+        if transporte is None:
+            transporte = obtener_transporte_llm(obtener_cliente)
+        return transporte
 
-1. **denominacion_normativa_nombre_ayuda**:
-   - Resume el título oficial.
-   - Incluye el año de la convocatoria si aparece.
-   - Si es plurianual, refleja el año correspondiente.
+def configurar_transporte(nuevo_transporte):
+    # P. ej. un TransporteOpenAI con un cliente apuntado a scripts/servidor_simulado.py
+    global transporte
+    transporte = nuevo_transporte
 
-2. **tipo_ayuda**: solo puede contener términos exactos de esta lista cerrada:
-{tipos_ayuda_str}
+def es_error_reintentable(error: Exception) -> bool:
+    codigo = getattr(error, "status_code", None)
+    if codigo is not None:
+        return codigo in CODIGOS_REINTENTABLES or codigo >= 500
+    # Cortes de conexión y timeouts del cliente no traen código HTTP
+    return error.__class__.__name__ in ("APIConnectionError", "APITimeoutError")
 
-3. **descripcion**:
-   - Desarrolla una descripción exhaustiva y clara.
-   - Detalla modalidades, servicios cubiertos, requisitos y finalidad.
-   - Indica incompatibilidades solo si aparecen literalmente en el texto.
-   - No repitas información que ya se indica en cuantía, requisitos o documentación.
-   - No incluyas valores económicos aquí.
+def calcular_espera(intento: int, error: Exception = None) -> float:
+    respuesta = getattr(error, "response", None)
+    retry_after = respuesta.headers.get("retry-after") if respuesta is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), ESPERA_MAXIMA_REINTENTO)
+        except ValueError:
+            pass
+    # Backoff exponencial con "full jitter" para no sincronizar a los hilos
+    return random.uniform(0, min(ESPERA_MAXIMA_REINTENTO, ESPERA_BASE_REINTENTO * 2 ** intento))
 
-4. **cuantia**:
-   - Incluir solo cantidades que el beneficiario percibe o paga finalmente.
-   - Refleja tramos, descuentos aplicados o aportaciones finales.
-   - No inventes ni adaptes valores.
-   - Si hay tablas o escalas, conviértelas en una lista clara.
+def llamar_con_reintentos(funcion, descripcion: str = "Petición", max_reintentos: int = MAX_REINTENTOS, metricas=None):
+    for intento in range(max_reintentos + 1):
+        try:
+            return funcion()
+        except Exception as e:
+            if intento >= max_reintentos or not es_error_reintentable(e):
+                raise
+            if metricas is not None:
+                metricas.contar("reintentos")
+            espera = calcular_espera(intento, e)
+            print(f"🔁 {descripcion}: error reintentable ({e}). Reintento {intento+1}/{max_reintentos} en {espera:.1f}s...")
+            time.sleep(espera)
 
-5. **referencia_legislativa**:
-   - Incluye todas las normas mencionadas, sin omitir ninguna disposición legal.
-   - Una por línea, completas y literales.
+def elegir_modelo(texto_extraido: str) -> tuple[str, int, float]:
+    """Modelo, tope de tokens de respuesta y densidad del chunk (None si no se enruta)."""
+    if not ENRUTAR_MODELO:
+        return MODELO, MAX_TOKENS_RESPUESTA, None
+    densidad = puntuar_densidad(texto_extraido)
+    if densidad < UMBRAL_DENSIDAD:
+        return MODELO_LIGERO, MAX_TOKENS_LIGERO, densidad
+    return MODELO, MAX_TOKENS_RESPUESTA, densidad
 
-6. **lugares_presentacion.online**:
-   - Si hay sede electrónica concreta, inclúyela primero.
-   - Luego añade siempre esta frase: "También puede presentarse a través de la Red SARA (Sistema de Aplicaciones y Redes para las Administraciones), una plataforma estatal segura que permite enviar solicitudes electrónicas a cualquier administración pública, usando certificado digital o sistema Cl@ve."
+def clave_cache_chunk(texto_extraido: str, campos_omitidos: tuple = ()) -> str:
+    # Sin campos omitidos la clave es la misma que antes de existir el preextractor. Con
+    # enrutado, la del modelo elegido: la respuesta guardada es la final (escalada o no)
+    estructurada = ("json_schema",) if SALIDA_ESTRUCTURADA else ()
+    return calcular_clave(texto_extraido, huella_prefijo(), elegir_modelo(texto_extraido)[0], TEMPERATURA,
+                          *campos_omitidos, *estructurada)
 
-📎 Instrucciones completas del proyecto:
-{instrucciones}
+def construir_peticion(mensajes: list[dict], campos_omitidos: tuple = (), modelo: str = MODELO,
+                       max_tokens: int = MAX_TOKENS_RESPUESTA) -> dict:
+    peticion = {
+        "model": modelo,
+        "messages": mensajes,
+        "temperature": TEMPERATURA,
+        "max_tokens": max_tokens,
+    }
+    if SALIDA_ESTRUCTURADA:
+        peticion["response_format"] = formato_respuesta(tuple(campos_omitidos or ()))
+    return peticion
 
- Texto legal a analizar:
----
-{texto_extraido}
----
+def leer_respuesta_en_streaming(peticion: dict, analizador: AnalizadorJSONIncremental, solicitados: tuple):
+    """
+    Pasa la respuesta al `analizador` según llega. Si se piden solo algunos campos, la
+    petición se corta en cuanto han llegado todos: lo que quede son campos no pedidos
+    (el modelo suele repetir la plantilla entera). Devuelve el fragmento con el uso de
+    tokens (None si se cortó antes) y si se cortó.
+    """
+    transporte = obtener_transporte()
+    if not hasattr(transporte, "transmitir"):
+        # Grabar, reproducir y transportes de prueba: la respuesta completa como un solo fragmento
+        respuesta = transporte.completar(peticion)
+        analizador.alimentar(respuesta.choices[0].message.content or "")
+        return respuesta, False
 
- Plantilla JSON a completar:
-{json.dumps(plantilla, indent=2, ensure_ascii=False)}
+    cortar_al_tener_todos = len(solicitados) < len(campos_plantilla())
+    flujo = transporte.transmitir(peticion)
+    con_uso = None
+    try:
+        for fragmento in flujo:
+            if getattr(fragmento, "usage", None) is not None:
+                con_uso = fragmento
+            for opcion in fragmento.choices:
+                if opcion.delta.content:
+                    analizador.alimentar(opcion.delta.content)
+            if not analizador.completo and cortar_al_tener_todos and analizador.tiene_todos(solicitados):
+                return con_uso, True
+    finally:
+        flujo.close()
+    return con_uso, False
 
- Devuelve únicamente el JSON final, sin encabezados, sin explicaciones ni comentarios.
-"""
+def campos_omitidos_chunk(texto_extraido: str, campos_omitidos: tuple = ()):
+    """
+    Campos que no se piden para este chunk: los ya resueltos más los que el enrutador
+    considera ajenos a su texto. Devuelve None si no queda ningún campo que pedir.
+    """
+    no_relevantes = campos_no_relevantes(texto_extraido, campos_plantilla())
+    if no_relevantes is None:
+        return None
+    omitidos = set(campos_omitidos) | set(no_relevantes)
+    if all(c in omitidos for c in campos_plantilla()):
+        return None
+    return tuple(c for c in campos_plantilla() if c in omitidos)
+
+def pedir_respuesta(peticion: dict, nombre_archivo_salida: str, campos_omitidos: tuple = (), metricas=None,
+                    al_campo=None) -> tuple[str, bool]:
+    """
+    Envía la petición (con reintentos) y devuelve el texto de la respuesta, "" si falla,
+    y si puede cachearse: una respuesta en streaming incompleta se usa pero no se cachea.
+    """
+    if STREAMING_RESPUESTAS:
+        return pedir_respuesta_en_streaming(peticion, nombre_archivo_salida, campos_omitidos, metricas, al_campo)
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=4096
-        )
-        resultado = response.choices[0].message.content.strip()
-        guardar_json_generado(resultado, nombre_archivo_salida)
-        return resultado
+        latencias = []
+
+        def llamar():
+            # El semáforo limita las peticiones en vuelo de todos los trabajos del proceso;
+            # la latencia se mide ya dentro, sin la espera por un hueco
+            with limite_peticiones:
+                inicio = time.perf_counter()
+                try:
+                    return obtener_transporte().completar(peticion)
+                finally:
+                    latencias.append(time.perf_counter() - inicio)
+
+        response = llamar_con_reintentos(llamar, descripcion=nombre_archivo_salida, metricas=metricas)
+        if metricas is not None:
+            metricas.registrar_peticion(nombre_archivo_salida, peticion["model"], latencias[-1], response)
+        return response.choices[0].message.content.strip(), True
+    except Exception as e:
+        print(f"[ERROR] Error al llamar a OpenAI: {e}")
+        if metricas is not None:
+            metricas.contar("errores")
+        return "", False
+
+def pedir_respuesta_en_streaming(peticion: dict, nombre_archivo_salida: str, campos_omitidos: tuple = (), metricas=None,
+                                 al_campo=None) -> tuple[str, bool]:
+    """
+    Como pedir_respuesta, pero leyendo la respuesta por fragmentos: cada campo se entrega
+    con `al_campo(clave, valor)` al cerrarse. Si la respuesta llega cortada o con algún
+    campo mal formado se conservan los campos completos en lugar de perder el chunk.
+    """
+    solicitados = tuple(c for c in campos_plantilla() if c not in (campos_omitidos or ()))
+    try:
+        latencias = []
+        analizadores = []
+
+        def llamar():
+            # Cada intento empieza con su propio analizador; lo que adelantó un intento fallido
+            # lo sustituye la parte final o lo retira al_descartar
+            analizador = AnalizadorJSONIncremental(al_campo)
+            analizadores.append(analizador)
+            with limite_peticiones:
+                inicio = time.perf_counter()
+                try:
+                    return leer_respuesta_en_streaming(peticion, analizador, solicitados)
+                finally:
+                    latencias.append(time.perf_counter() - inicio)
+
+        response, cortada = llamar_con_reintentos(llamar, descripcion=nombre_archivo_salida, metricas=metricas)
+        analizador = analizadores[-1]
+        if metricas is not None:
+            metricas.registrar_peticion(nombre_archivo_salida, peticion["model"], latencias[-1], response)
+            if cortada:
+                metricas.contar("respuestas_cortadas")
+        if not analizador.campos:
+            raise ValueError("la respuesta no contiene ningún campo JSON completo")
+
+        completa = (analizador.completo or cortada) and not analizador.errores
+        if not completa:
+            # Respuesta truncada o con campos ilegibles: se usa lo recuperado, pero no se cachea
+            print(f"⚠️ {nombre_archivo_salida}: respuesta incompleta, se conservan {len(analizador.campos)} campos")
+            if metricas is not None:
+                metricas.contar("respuestas_parciales")
+        return analizador.texto(), completa
     except Exception as e:
         print(f"[ERROR] Error al llamar a OpenAI: {e}")
+        if metricas is not None:
+            metricas.contar("errores")
+        return "", False
+
+def motivos_escalado(resultado: str) -> list[str]:
+    # Sin JSON legible o con campos que el validador rechaza, la respuesta del modelo ligero no vale
+    try:
+        data = parsear_json_generado(resultado)
+    except ValueError:
+        return ["JSON no válido"]
+    return campos_rechazados(data, REGLAS_ESCALADO) if isinstance(data, dict) else ["JSON no válido"]
+
+def generar_resumen_con_openai(texto_extraido: str, nombre_archivo_salida: str = "ficha", carpeta_salida: str = None,
+                               campos_omitidos: tuple = (), metricas=None, al_campo=None) -> str:
+    campos_omitidos = campos_omitidos_chunk(texto_extraido, campos_omitidos)
+    if campos_omitidos is None:
+        print(f"⏭️ {nombre_archivo_salida}: sin campos relevantes (firmas, formularios...), no se envía al modelo")
+        if metricas is not None:
+            metricas.contar("chunks_descartados")
         return ""
 
-def resumir_desde_archivo(path_txt: str) -> str:
-    nombre_base = os.path.splitext(os.path.basename(path_txt))[0]
-    with open(path_txt, "r", encoding="utf-8") as f:
-        texto = f.read()
+    # El prefijo estático se renderiza una vez por proceso; solo el chunk varía
+    mensajes = construir_mensajes(texto_extraido, campos_omitidos)
+
+    clave_cache = clave_cache_chunk(texto_extraido, campos_omitidos)
+    if cache is not None:
+        resultado = cache.obtener(clave_cache)
+        if resultado is not None:
+            print(f"♻️ Respuesta en caché para {nombre_archivo_salida}")
+            guardar_json_generado(resultado, nombre_archivo_salida, carpeta_salida)
+            if metricas is not None:
+                metricas.registrar_peticion(nombre_archivo_salida, elegir_modelo(texto_extraido)[0], cache=True)
+            return resultado
 
-    chunks = dividir_en_chunks(texto)
-    resumenes = []
+    modelo, max_tokens, densidad = elegir_modelo(texto_extraido)
+    escalado = False
+    if modelo == MODELO:
+        resultado, cacheable = pedir_respuesta(construir_peticion(mensajes, campos_omitidos), nombre_archivo_salida,
+                                               campos_omitidos, metricas, al_campo)
+    else:
+        # Los campos del modelo ligero no se adelantan a la fusión: aún puede escalarse
+        print(f"🪶 {nombre_archivo_salida}: densidad {densidad} < {UMBRAL_DENSIDAD}, se usa {modelo}")
+        resultado, cacheable = pedir_respuesta(construir_peticion(mensajes, campos_omitidos, modelo, max_tokens),
+                                               nombre_archivo_salida, campos_omitidos, metricas)
+        motivos = motivos_escalado(resultado)
+        if motivos:
+            print(f"⬆️ {nombre_archivo_salida}: {modelo} no supera {', '.join(motivos)}; se repite con {MODELO}")
+            escalado = True
+            resultado, cacheable = pedir_respuesta(construir_peticion(mensajes, campos_omitidos), nombre_archivo_salida,
+                                                   campos_omitidos, metricas, al_campo)
+    if densidad is not None and metricas is not None:
+        metricas.registrar_enrutado(nombre_archivo_salida, densidad, modelo, MODELO, escalado)
+    if not resultado:
+        return ""
 
-    for i, chunk in enumerate(chunks):
+    # Solo se cachean respuestas que son JSON válido
+    if guardar_json_generado(resultado, nombre_archivo_salida, carpeta_salida) is not None and cacheable and cache is not None:
+        cache.guardar(clave_cache, resultado, {"modelo": MODELO if escalado else modelo, "parte": nombre_archivo_salida})
+    return resultado
+
+def notificar_resultado(al_completar, indice: int, resultado: str, al_descartar=None):
+    """
+    Entrega el dict de la respuesta (p. ej. a un FusionadorIncremental) en cuanto llega.
+    Si el chunk no deja una parte válida, `al_descartar(indice)` retira los campos que
+    sus intentos en streaming ya habían adelantado con `al_campo`.
+    """
+    try:
+        if resultado:
+            if al_completar is not None:
+                al_completar(indice, parsear_json_generado(resultado))
+            return
+    except ValueError:
+        pass
+    if al_descartar is not None:
+        al_descartar(indice)
+
+def resumir_chunks(chunks: list[str], nombre_base: str, max_concurrencia: int = MAX_CONCURRENCIA, etiqueta: str = "",
+                   carpeta_salida: str = None, al_completar=None, campos_omitidos: tuple = (), metricas=None,
+                   al_campo=None, al_descartar=None) -> list[str]:
+    """
+    Envía los chunks al modelo manteniendo hasta `max_concurrencia` peticiones en vuelo.
+    Devuelve las respuestas en el orden de los chunks y cada una se guarda como
+    `<nombre_base>_parteN_resumen.json`, igual que en el modo secuencial. Si se indica
+    `al_completar(indice, dict)`, se invoca con cada respuesta según va llegando.
+    Los `campos_omitidos` (ya preextraídos) no se piden al modelo. Con `metricas`
+    (MetricasEjecucion) se registran latencia, tokens, reintentos y aciertos de caché.
+    Con respuestas en streaming, `al_campo(indice, clave, valor)` recibe cada campo al cerrarse
+    y `al_descartar(indice)` se invoca si el chunk termina sin parte válida.
+    """
+    total = len(chunks)
+
+    def procesar(indice: int) -> str:
+        chunk = chunks[indice]
         if not chunk.strip():
-            continue
-        print(f"🧩 Procesando chunk {i+1}/{len(chunks)}...")
-        resumen = generar_resumen_con_openai(chunk, f"{nombre_base}_parte{i+1}")
-        resumenes.append(resumen)
+            return ""
+        print(f"🧩 Procesando chunk {indice+1}/{total}{etiqueta}...")
+        resultado = generar_resumen_con_openai(chunk, f"{nombre_base}_parte{indice+1}", carpeta_salida, campos_omitidos, metricas,
+                                               partial(al_campo, indice) if al_campo else None)
+        notificar_resultado(al_completar, indice, resultado, al_descartar if al_campo else None)
+        return resultado
 
-    return "\n\n".join(resumenes)
+    if max_concurrencia <= 1 or total <= 1:
+        resumenes = [procesar(i) for i in range(total)]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_concurrencia, total)) as executor:
+            resumenes = list(executor.map(procesar, range(total)))
 
-def resumir_desde_varios_archivos(lista_rutas: list[str], nombre_base: str = "ficha") -> str:
-    texto_completo = extraer_textos_unificados(lista_rutas)
-    chunks = dividir_en_chunks(texto_completo)
-    resumenes = []
+    if cache is not None:
+        print(f"📦 Caché LLM: {cache.resumen()}")
+        cache.purgar()
+    return resumenes
 
-    for i, chunk in enumerate(chunks):
-        print(f"🧩 Procesando chunk {i+1}/{len(chunks)} (multiarchivo)...")
-        resumen = generar_resumen_con_openai(chunk, f"{nombre_base}_parte{i+1}")
-        resumenes.append(resumen)
+def resumir_en_streaming(lista_rutas: list[str], nombre_base: str = "ficha", max_concurrencia: int = MAX_CONCURRENCIA,
+                         carpeta_salida: str = None, al_completar=None, metricas=None, al_campo=None,
+                         al_descartar=None) -> str:
+    """
+    Solapa extracción, tokenización y llamadas al modelo: cada chunk se envía en cuanto
+    se completa, sin esperar a leer el resto de páginas. Como mucho hay
+    `2 * max_concurrencia` chunks pendientes, así que la memoria se mantiene acotada.
+    """
+    resumenes = {}
+    pendientes = {}
 
+    def procesar(indice: int, chunk: str) -> str:
+        resultado = generar_resumen_con_openai(chunk, f"{nombre_base}_parte{indice+1}", carpeta_salida, metricas=metricas,
+                                               al_campo=partial(al_campo, indice) if al_campo else None)
+        notificar_resultado(al_completar, indice, resultado, al_descartar if al_campo else None)
+        return resultado
+
+    def recoger(futuros):
+        for futuro in futuros:
+            resumenes[pendientes.pop(futuro)] = futuro.result()
+
+    with ThreadPoolExecutor(max_workers=max(max_concurrencia, 1)) as executor:
+        for indice, chunk in enumerate(iterar_chunks(iterar_paginas(lista_rutas), calcular_max_tokens_chunk(MODELO, MAX_TOKENS_RESPUESTA))):
+            if not chunk.strip():
+                continue
+            if len(pendientes) >= 2 * max(max_concurrencia, 1):
+                hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                recoger(hechos)
+            print(f"🧩 Procesando chunk {indice+1} (streaming)...")
+            futuro = executor.submit(procesar, indice, chunk)
+            pendientes[futuro] = indice
+        recoger(list(pendientes))
+
+    if cache is not None:
+        print(f"📦 Caché LLM: {cache.resumen()}")
+        cache.purgar()
+    return "\n\n".join(resumenes[i] for i in sorted(resumenes))
+
+def resumir_desde_archivo(path_txt: str, max_concurrencia: int = MAX_CONCURRENCIA) -> str:
+    nombre_base = os.path.splitext(os.path.basename(path_txt))[0]
+    with open(path_txt, "r", encoding="utf-8") as f:
+        texto = f.read()
+
+    chunks = dividir_en_chunks(texto, calcular_max_tokens_chunk(MODELO, MAX_TOKENS_RESPUESTA))
+    resumenes = resumir_chunks(chunks, nombre_base, max_concurrencia)
+    return "\n\n".join(r for r in resumenes if r)
+
+def chunks_contexto(contexto: ContextoPipeline) -> list[str]:
+    return contexto.chunks(calcular_max_tokens_chunk(MODELO, MAX_TOKENS_RESPUESTA))
+
+def resumir_contexto(contexto: ContextoPipeline, max_concurrencia: int = MAX_CONCURRENCIA, omitir: set = None,
+                     al_completar=None, campos_omitidos: tuple = (), metricas=None, al_campo=None,
+                     al_descartar=None) -> str:
+    # Los índices de `omitir` ya tienen su parte en disco (p. ej. reutilizada del manifiesto)
+    chunks = [c if i not in (omitir or set()) else "" for i, c in enumerate(chunks_contexto(contexto))]
+    resumenes = resumir_chunks(chunks, contexto.nombre_base, max_concurrencia, etiqueta=" (multiarchivo)",
+                               carpeta_salida=contexto.carpeta_json, al_completar=al_completar,
+                               campos_omitidos=campos_omitidos, metricas=metricas, al_campo=al_campo,
+                               al_descartar=al_descartar)
     return "\n\n".join(resumenes)
+
+def resumir_desde_varios_archivos(lista_rutas: list[str], nombre_base: str = "ficha", max_concurrencia: int = MAX_CONCURRENCIA) -> str:
+    return resumir_contexto(ContextoPipeline(lista_rutas, nombre_base), max_concurrencia)
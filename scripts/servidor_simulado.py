@@ -0,0 +1,197 @@
+"""
+Servidor local compatible con POST /v1/chat/completions para pruebas de carga sin red
+ni coste. Simula latencia, errores 5xx y respuestas 429 (por probabilidad o por exceso
+de peticiones simultáneas, con cabecera Retry-After). Con "stream": true responde por
+eventos SSE, como la API real.
+
+Uso: python -m scripts.servidor_simulado [--puerto 8011] [--latencia 1.0] [--variacion 0.5]
+        [--errores 0.05] [--limite 0.05] [--max-concurrencia 8] [--retry-after 1]
+
+y después: OPENAI_BASE_URL=http://127.0.0.1:8011/v1 OPENAI_API_KEY=simulado python main.py
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from scripts.prompt_ia import cargar_plantilla_json
+
+def responder_plantilla_vacia(cuerpo: dict) -> str:
+    return json.dumps(cargar_plantilla_json(), ensure_ascii=False)
+
+class SimuladorOpenAI:
+    """Configuración y contadores del servidor; se comparte entre los hilos que atienden."""
+
+    def __init__(self, latencia: float = 1.0, variacion: float = 0.5, tasa_errores: float = 0.0,
+                 tasa_limite: float = 0.0, max_concurrencia: int = 0, retry_after: float = 1.0,
+                 responder=responder_plantilla_vacia, semilla: int = None):
+        self.latencia = latencia
+        self.variacion = variacion
+        self.tasa_errores = tasa_errores
+        self.tasa_limite = tasa_limite
+        self.max_concurrencia = max_concurrencia
+        self.retry_after = retry_after
+        self.responder = responder
+        self.azar = random.Random(semilla)
+        self.en_vuelo = 0
+        self.max_en_vuelo = 0
+        self.contadores = {"peticiones": 0, "ok": 0, "limitadas": 0, "errores": 0}
+        self._lock = threading.Lock()
+
+    def contar(self, nombre: str):
+        with self._lock:
+            self.contadores[nombre] += 1
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {**self.contadores, "max_en_vuelo": self.max_en_vuelo}
+
+    def decidir(self) -> str:
+        # "limitada", "error" u "ok"; el exceso de concurrencia se comprueba al entrar
+        with self._lock:
+            self.contadores["peticiones"] += 1
+            if self.max_concurrencia and self.en_vuelo >= self.max_concurrencia:
+                return "limitada"
+            sorteo = self.azar.random()
+            if sorteo < self.tasa_limite:
+                return "limitada"
+            if sorteo < self.tasa_limite + self.tasa_errores:
+                return "error"
+            self.en_vuelo += 1
+            self.max_en_vuelo = max(self.max_en_vuelo, self.en_vuelo)
+            return "ok"
+
+    def espera(self) -> float:
+        with self._lock:
+            return max(0.0, self.latencia + self.azar.uniform(-self.variacion, self.variacion))
+
+    def liberar(self):
+        with self._lock:
+            self.en_vuelo -= 1
+
+def construir_respuesta(cuerpo: dict, contenido: str) -> dict:
+    # Estimación de tokens a 4 caracteres por token: suficiente para probar métricas y costes
+    tokens_prompt = len(json.dumps(cuerpo.get("messages", []), ensure_ascii=False)) // 4
+    tokens_respuesta = len(contenido) // 4
+    return {
+        "id": f"chatcmpl-simulado-{random.getrandbits(48):012x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": cuerpo.get("model", "gpt-4o"),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": contenido}}],
+        "usage": {"prompt_tokens": tokens_prompt, "completion_tokens": tokens_respuesta,
+                  "total_tokens": tokens_prompt + tokens_respuesta},
+    }
+
+# Caracteres por fragmento al responder en streaming
+CARACTERES_POR_FRAGMENTO = 16
+
+def construir_fragmentos(cuerpo: dict, contenido: str) -> list[dict]:
+    # Los chat.completion.chunk que enviaría la API: contenido a trozos, cierre y, si se pide, uso
+    completa = construir_respuesta(cuerpo, contenido)
+    base = {"id": completa["id"], "object": "chat.completion.chunk", "created": completa["created"], "model": completa["model"]}
+    fragmentos = [
+        {**base, "choices": [{"index": 0, "delta": {"content": contenido[i:i + CARACTERES_POR_FRAGMENTO]}, "finish_reason": None}]}
+        for i in range(0, len(contenido), CARACTERES_POR_FRAGMENTO)
+    ]
+    fragmentos.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+    if (cuerpo.get("stream_options") or {}).get("include_usage"):
+        fragmentos.append({**base, "choices": [], "usage": completa["usage"]})
+    return fragmentos
+
+class ManejadorSimulado(BaseHTTPRequestHandler):
+    simulador: SimuladorOpenAI = None
+
+    def log_message(self, formato, *args):
+        pass
+
+    def enviar_json(self, codigo: int, cuerpo: dict, cabeceras: dict = None):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def enviar_eventos(self, fragmentos: list[dict]):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        try:
+            for fragmento in fragmentos:
+                self.wfile.write(f"data: {json.dumps(fragmento, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente cortó la respuesta (p. ej. ya tenía todos los campos pedidos)
+            pass
+        self.close_connection = True
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.enviar_json(404, {"error": {"message": f"Ruta no simulada: {self.path}", "type": "invalid_request_error"}})
+            return
+        cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+        simulador = self.simulador
+        resultado = simulador.decidir()
+        if resultado == "limitada":
+            simulador.contar("limitadas")
+            self.enviar_json(429, {"error": {"message": "Rate limit simulado", "type": "rate_limit_error"}},
+                             {"Retry-After": str(simulador.retry_after)})
+            return
+        if resultado == "error":
+            simulador.contar("errores")
+            time.sleep(simulador.espera() / 2)
+            self.enviar_json(500, {"error": {"message": "Error simulado", "type": "server_error"}})
+            return
+
+        try:
+            time.sleep(simulador.espera())
+            contenido = simulador.responder(cuerpo)
+        finally:
+            simulador.liberar()
+        simulador.contar("ok")
+        if cuerpo.get("stream"):
+            self.enviar_eventos(construir_fragmentos(cuerpo, contenido))
+        else:
+            self.enviar_json(200, construir_respuesta(cuerpo, contenido))
+
+def iniciar_servidor(simulador: SimuladorOpenAI, puerto: int = 0, host: str = "127.0.0.1"):
+    """
+    Arranca el servidor en un hilo y lo devuelve; con puerto 0 se elige uno libre
+    (`servidor.server_address[1]`). Se detiene con `servidor.shutdown()`.
+    """
+    manejador = type("Manejador", (ManejadorSimulado,), {"simulador": simulador})
+    servidor = ThreadingHTTPServer((host, puerto), manejador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puerto", type=int, default=8011)
+    parser.add_argument("--latencia", type=float, default=1.0, help="Latencia media por petición (s)")
+    parser.add_argument("--variacion", type=float, default=0.5, help="Variación uniforme de la latencia (s)")
+    parser.add_argument("--errores", type=float, default=0.0, help="Proporción de respuestas 500")
+    parser.add_argument("--limite", type=float, default=0.0, help="Proporción de respuestas 429")
+    parser.add_argument("--max-concurrencia", type=int, default=0, help="Peticiones simultáneas antes de responder 429 (0 = sin límite)")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    simulador = SimuladorOpenAI(args.latencia, args.variacion, args.errores, args.limite,
+                                args.max_concurrencia, args.retry_after)
+    servidor = iniciar_servidor(simulador, args.puerto)
+    print(f"🧪 Servidor simulado en http://127.0.0.1:{servidor.server_address[1]}/v1 (Ctrl+C para parar)")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"📊 {simulador.estadisticas()}")
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+if __name__ == "__main__":
+    main()
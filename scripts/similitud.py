@@ -0,0 +1,108 @@
+import os
+import re
+import math
+import unicodedata
+from collections import Counter, defaultdict
+
+# Jaccard mínimo entre las palabras de dos elementos de lista para considerarlos el mismo
+# (p. ej. "Copia del DNI del solicitante" y "Copia DNI solicitante"); 1.0 = solo idénticos
+UMBRAL_CASI_DUPLICADOS = float(os.getenv("FICHAS_UMBRAL_CASI_DUPLICADOS", "0.7"))
+
+PALABRAS_VACIAS = frozenset("a al con de del e el en la las lo los o para por que se su sus u un una y".split())
+PATRON_PALABRA = re.compile(r"\w+")
+
+def palabras_normalizadas(texto: str) -> list[str]:
+    """Palabras en minúsculas y sin tildes, en orden."""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return PATRON_PALABRA.findall(texto)
+
+def firma_palabras(texto: str) -> frozenset:
+    """Conjunto de palabras significativas en minúsculas y sin tildes."""
+    return frozenset(p for p in palabras_normalizadas(texto) if p not in PALABRAS_VACIAS)
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    union = len(a | b)
+    return len(a & b) / union if union else 1.0
+
+class UnionConjuntos:
+    def __init__(self, n: int):
+        self.padre = list(range(n))
+
+    def raiz(self, i: int) -> int:
+        while self.padre[i] != i:
+            self.padre[i] = self.padre[self.padre[i]]
+            i = self.padre[i]
+        return i
+
+    def unir(self, i: int, j: int):
+        ri, rj = self.raiz(i), self.raiz(j)
+        if ri != rj:
+            # La raíz es siempre el índice menor: los grupos conservan el orden de aparición
+            self.padre[max(ri, rj)] = min(ri, rj)
+
+def unir_similares(firmas: list[frozenset], umbral: float, conjuntos: UnionConjuntos, indices: list[int]):
+    """
+    Une en `conjuntos` los `indices` cuyas firmas tienen Jaccard >= umbral, sin comparar
+    todos los pares: índice invertido con filtrado por prefijo. Con las palabras ordenadas
+    de la más rara a la más común, dos conjuntos con Jaccard >= umbral comparten
+    necesariamente una palabra de sus prefijos de |x| - ceil(umbral·|x|) + 1 palabras, así
+    que solo se verifican los pares que coinciden en alguna palabra poco frecuente.
+    """
+    frecuencia = Counter(p for i in indices for p in firmas[i])
+    por_palabra = defaultdict(list)
+    # De menor a mayor tamaño: los candidatos ya indexados nunca son más largos
+    for i in sorted(indices, key=lambda i: len(firmas[i])):
+        palabras = sorted(firmas[i], key=lambda p: (frecuencia[p], p))
+        if not palabras:
+            continue
+        minimo = umbral * len(palabras)
+        candidatos = set()
+        for palabra in palabras[:len(palabras) - math.ceil(minimo) + 1]:
+            candidatos.update(j for j in por_palabra[palabra] if len(firmas[j]) >= minimo)
+            por_palabra[palabra].append(i)
+        for j in candidatos:
+            if jaccard(firmas[i], firmas[j]) >= umbral:
+                conjuntos.unir(i, j)
+
+def completitud(item: dict) -> tuple:
+    # Más campos con contenido y, a igualdad, más texto
+    valores = [str(v).strip() for v in item.values() if v not in ("", None, [], {})]
+    return sum(1 for v in valores if v), sum(len(v) for v in valores)
+
+def agrupar_casi_duplicados(items: list[dict], texto, exacto=None, identidad=None,
+                            umbral: float = UMBRAL_CASI_DUPLICADOS) -> list[list[int]]:
+    """
+    Grupos de índices de `items` que son el mismo elemento, en orden de aparición:
+    - misma `identidad(item)` (si se da y no es vacía), o
+    - mismo `exacto(item)` (p. ej. el importe) y Jaccard de `texto(item)` >= umbral.
+    """
+    conjuntos = UnionConjuntos(len(items))
+    if identidad is not None:
+        primero = {}
+        for i, item in enumerate(items):
+            clave = identidad(item)
+            if clave:
+                conjuntos.unir(i, primero.setdefault(clave, i))
+
+    if umbral < 1.0:
+        firmas = [firma_palabras(texto(item)) for item in items]
+        por_exacto = defaultdict(list)
+        for i, item in enumerate(items):
+            por_exacto[exacto(item) if exacto else None].append(i)
+        for indices in por_exacto.values():
+            if len(indices) > 1:
+                unir_similares(firmas, umbral, conjuntos, indices)
+
+    grupos = defaultdict(list)
+    for i in range(len(items)):
+        grupos[conjuntos.raiz(i)].append(i)
+    return [grupos[raiz] for raiz in sorted(grupos)]
+
+def deduplicar_casi_iguales(items: list[dict], texto, exacto=None, identidad=None,
+                            umbral: float = UMBRAL_CASI_DUPLICADOS) -> list[dict]:
+    """Un representante por grupo de agrupar_casi_duplicados: el más completo (el primero si empatan)."""
+    return [
+        max((items[i] for i in grupo), key=completitud)
+        for grupo in agrupar_casi_duplicados(items, texto, exacto, identidad, umbral)
+    ]
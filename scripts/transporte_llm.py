@@ -0,0 +1,74 @@
+import os
+import json
+import threading
+from scripts.cache_llm import calcular_clave
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# "openai" (en vivo), "grabar" (en vivo guardando cada par petición/respuesta) o "reproducir" (sin red)
+MODO_TRANSPORTE = os.getenv("FICHAS_TRANSPORTE_LLM", "openai").lower()
+CARPETA_GRABACIONES = os.getenv("FICHAS_GRABACIONES_DIR", os.path.join(BASE_DIR, "..", "grabaciones_llm"))
+
+class GrabacionNoEncontrada(LookupError):
+    """La petición no se grabó nunca: en modo reproducción no hay respuesta que devolver."""
+
+def clave_peticion(peticion: dict) -> str:
+    return calcular_clave(json.dumps(peticion, sort_keys=True, ensure_ascii=False))
+
+class TransporteOpenAI:
+    """Llamada en vivo a chat.completions con el cliente indicado."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def completar(self, peticion: dict):
+        return self.client.chat.completions.create(**peticion)
+
+    def transmitir(self, peticion: dict):
+        # Fragmentos (ChatCompletionChunk) según se generan; el último trae el uso de tokens
+        return self.client.chat.completions.create(**peticion, stream=True, stream_options={"include_usage": True})
+
+class TransporteGrabacion:
+    """
+    Delega en otro transporte y guarda cada par petición/respuesta en
+    `carpeta/<clave>.json`, para reproducirlo después sin red.
+    """
+
+    def __init__(self, base, carpeta: str = CARPETA_GRABACIONES):
+        self.base = base
+        self.carpeta = carpeta
+
+    def completar(self, peticion: dict):
+        respuesta = self.base.completar(peticion)
+        ruta = os.path.join(self.carpeta, f"{clave_peticion(peticion)}.json")
+        os.makedirs(self.carpeta, exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"peticion": peticion, "respuesta": respuesta.model_dump(exclude_none=True)}, f,
+                      indent=2, ensure_ascii=False)
+        os.replace(temporal, ruta)
+        return respuesta
+
+class TransporteReproduccion:
+    """Devuelve las respuestas grabadas; una petición sin grabar es un error no reintentable."""
+
+    def __init__(self, carpeta: str = CARPETA_GRABACIONES):
+        self.carpeta = carpeta
+
+    def completar(self, peticion: dict):
+        ruta = os.path.join(self.carpeta, f"{clave_peticion(peticion)}.json")
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                grabacion = json.load(f)
+        except OSError:
+            raise GrabacionNoEncontrada(f"No hay grabación para la petición {os.path.basename(ruta)}")
+        from openai.types.chat import ChatCompletion
+        return ChatCompletion.model_validate(grabacion["respuesta"])
+
+def obtener_transporte_llm(obtener_cliente, modo: str = MODO_TRANSPORTE):
+    # `obtener_cliente` solo se llama si hace falta: reproducir no necesita cliente ni clave
+    if modo == "reproducir":
+        return TransporteReproduccion()
+    if modo == "grabar":
+        return TransporteGrabacion(TransporteOpenAI(obtener_cliente()))
+    return TransporteOpenAI(obtener_cliente())
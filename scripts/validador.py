@@ -2,12 +2,18 @@
 import re
 import json
 import os
+import glob
+import time
+from functools import lru_cache
+from typing import Callable, NamedTuple
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Cargar tipos válidos desde JSON externo
-with open(os.path.join(BASE_DIR, "..", "entradas", "tipos_ayuda.json"), encoding="utf-8") as f:
-    TIPOS_AYUDA_VALIDOS = set(json.load(f)["tipos_de_ayuda"])
+@lru_cache(maxsize=None)
+def tipos_ayuda_validos() -> frozenset:
+    # Tipos válidos desde JSON externo, leído en la primera validación y no al importar
+    with open(os.path.join(BASE_DIR, "..", "entradas", "tipos_ayuda.json"), encoding="utf-8") as f:
+        return frozenset(json.load(f)["tipos_de_ayuda"])
 
 def esta_vacio(valor):
     if valor in ["", None, [], "- "]:
@@ -20,71 +26,235 @@ def esta_vacio(valor):
         return True
     return False
 
+# Cantidad seguida del símbolo del euro ("1.500 €", "300,50€"); la reutiliza el preextractor
+PATRON_EUROS = re.compile(r"\d[\d\s]*[,\.]?\d*\s*€")
+
 def contiene_euros(texto):
-    return bool(re.search(r"\d[\d\s]*[,\.]?\d*\s*€", texto))
+    return bool(PATRON_EUROS.search(texto))
 
-def evaluar_json_por_reglas(json_data):
-    resultado = {}
-    score_total = 0
-    campos_evaluados = 0
-
-    def add_result(campo, valido, motivo=None):
-        nonlocal score_total, campos_evaluados
-        campos_evaluados += 1
-        resultado[campo] = {"valido": valido}
+# Cada punto de requisitos_acceso: texto entre saltos de línea, guiones o viñetas
+PATRON_PUNTO_REQUISITO = re.compile(r"[^\n\-\•]+")
+
+USUARIOS_GENERICOS = ("USUARIO", "FICHAS MIGUEL")
+
+# Comprobaciones de cada regla: reciben el valor del campo y devuelven si es válido
+def tipos_reconocidos(tipo_ayuda):
+    return tipos_ayuda_validos().issuperset(tipo_ayuda)
+
+def descripcion_suficiente(descripcion):
+    # Basta con saber si hay más de 50 palabras: no se trocea el texto entero
+    return len(descripcion.split(None, 50)) > 50 and not contiene_euros(descripcion)
+
+def lista_referencias(ref):
+    return isinstance(ref, str) and ref.strip().startswith("- ") and ref.strip().endswith(".") and "\n" in ref
+
+def cuantia_con_unidades(cuantia):
+    return any(e.get("valor") and not esta_vacio(e.get("unidad")) for e in cuantia if isinstance(e, dict))
+
+def menciona_red_sara(online):
+    return any("Red SARA" in e.get("valor", "") for e in online if isinstance(e, dict))
+
+def usuario_real(usuario):
+    return bool(usuario and usuario.upper() not in USUARIOS_GENERICOS)
+
+def documentos_completos(docs):
+    return sum(1 for d in docs if d.get("clave") and d.get("valor")) >= 2
+
+def requisitos_en_lista(req):
+    puntos = 0
+    for punto in PATRON_PUNTO_REQUISITO.finditer(req):
+        if len(punto.group().strip()) > 20:
+            puntos += 1
+            if puntos >= 2:
+                return True
+    return False
+
+def frase_breve(frase):
+    return bool(frase) and len(frase.split()) <= 30
+
+class Regla(NamedTuple):
+    campo: str  # ruta con puntos dentro de la ficha, p. ej. "lugares_presentacion.online"
+    comprobar: Callable
+    motivo: object  # texto, o función del valor si el motivo depende de él
+    defecto: object = ""
+
+# Reglas de calidad de una ficha, en el orden en que aparecen en el resultado
+REGLAS = (
+    Regla("tipo_ayuda", tipos_reconocidos, "Contiene términos no válidos", []),
+    Regla("descripcion", descripcion_suficiente, "Muy corta o contiene valores económicos"),
+    Regla("referencia_legislativa", lista_referencias, "Debe ser lista multilínea con guiones y punto final"),
+    Regla("cuantia", cuantia_con_unidades, "No contiene valores claros o unidades", []),
+    Regla("lugares_presentacion.online", menciona_red_sara, "Falta mención obligatoria a Red SARA", []),
+    Regla("usuario", usuario_real, "Valor genérico o vacío"),
+    Regla("documentos_presentar", documentos_completos, "Menos de 2 documentos completos", []),
+    Regla("requisitos_acceso", requisitos_en_lista, "No está estructurado como lista clara"),
+    Regla("frase_publicitaria", frase_breve, lambda frase: "Supera 30 palabras" if frase else "Campo vacío"),
+)
+
+def leer_ruta(ficha, ruta: tuple, defecto):
+    valor = ficha
+    for clave in ruta:
+        if not isinstance(valor, dict):
+            return defecto
+        valor = valor.get(clave, defecto)
+    return valor
+
+def _comprobar(regla: Regla, valor) -> bool:
+    # Un valor con un tipo inesperado (fichas antiguas o mal formadas) no supera la regla
+    try:
+        return bool(regla.comprobar(valor))
+    except (AttributeError, TypeError):
+        return False
+
+def _comprobar_columna(regla: Regla, valores: list) -> list[bool]:
+    # Toda la columna de una pasada; solo si algún valor falla se repite valor a valor
+    try:
+        return [bool(valido) for valido in map(regla.comprobar, valores)]
+    except (AttributeError, TypeError):
+        return [_comprobar(regla, valor) for valor in valores]
+
+class EvaluadorReglas:
+    """
+    Reglas compiladas una vez (rutas de campo ya partidas, patrones precompilados).
+    `evaluar` valida una ficha; `evaluar_lote` valida muchas a la vez recorriendo
+    una tabla por columnas (un campo de todas las fichas, regla a regla), y
+    `tasas_aprobado` resume el porcentaje de fichas que supera cada regla.
+    """
+
+    def __init__(self, reglas=REGLAS):
+        self.reglas = tuple(reglas)
+        self._rutas = [tuple(regla.campo.split(".")) for regla in self.reglas]
+        # Campos de primer nivel: se leen con un get, sin recorrer la ruta
+        self._claves = [ruta[0] if len(ruta) == 1 else None for ruta in self._rutas]
+
+    def _resultado_regla(self, regla: Regla, valido: bool, valor) -> dict:
         if valido:
-            score_total += 1
-        elif motivo:
-            resultado[campo]["motivo"] = motivo
-
-    # tipo_ayuda
-    tipo_ayuda = json_data.get("tipo_ayuda", [])
-    valido = all(t in TIPOS_AYUDA_VALIDOS for t in tipo_ayuda)
-    add_result("tipo_ayuda", valido, "Contiene términos no válidos" if not valido else None)
-
-    # descripcion
-    descripcion = json_data.get("descripcion", "")
-    valido = len(descripcion.split()) > 50 and not contiene_euros(descripcion)
-    add_result("descripcion", valido, "Muy corta o contiene valores económicos")
-
-    # referencia_legislativa
-    ref = json_data.get("referencia_legislativa", "")
-    valido = isinstance(ref, str) and ref.strip().startswith("- ") and ref.strip().endswith(".") and "\n" in ref
-    add_result("referencia_legislativa", valido, "Debe ser lista multilínea con guiones y punto final")
-
-    # cuantia
-    cuantia = json_data.get("cuantia", [])
-    cuantia_ok = any(e.get("valor") and not esta_vacio(e.get("unidad")) for e in cuantia if isinstance(e, dict))
-    add_result("cuantia", cuantia_ok, "No contiene valores claros o unidades")
-
-    # lugares_presentacion.online incluye Red SARA
-    online = json_data.get("lugares_presentacion", {}).get("online", [])
-    sara_ok = any("Red SARA" in e.get("valor", "") for e in online if isinstance(e, dict))
-    add_result("lugares_presentacion.online", sara_ok, "Falta mención obligatoria a Red SARA")
-
-    # usuario
-    usuario = json_data.get("usuario", "")
-    valido = bool(usuario and usuario.upper() not in ["USUARIO", "FICHAS MIGUEL"])
-    add_result("usuario", valido, "Valor genérico o vacío")
-
-    # documentos_presentar
-    docs = json_data.get("documentos_presentar", [])
-    doc_ok = sum(1 for d in docs if d.get("clave") and d.get("valor")) >= 2
-    add_result("documentos_presentar", doc_ok, "Menos de 2 documentos completos")
-
-    # requisitos_acceso como lista lógica
-    req = json_data.get("requisitos_acceso", "")
-    puntos = [x for x in re.split(r"[\n\-\•]+", req) if len(x.strip()) > 20]
-    req_ok = len(puntos) >= 2
-    add_result("requisitos_acceso", req_ok, "No está estructurado como lista clara")
-
-    # frase_publicitaria
-    frase = json_data.get("frase_publicitaria", "")
-    if frase:
-        valido = len(frase.split()) <= 30
-        add_result("frase_publicitaria", valido, "Supera 30 palabras")
-    else:
-        add_result("frase_publicitaria", False, "Campo vacío")
-
-    resultado["score_total"] = round(score_total / campos_evaluados, 2) if campos_evaluados else 0.0
-    return resultado
+            return {"valido": True}
+        motivo = regla.motivo(valor) if callable(regla.motivo) else regla.motivo
+        return {"valido": False, "motivo": motivo} if motivo else {"valido": False}
+
+    def evaluar(self, ficha: dict) -> dict:
+        resultado = {}
+        validos = 0
+        for regla, ruta, clave in zip(self.reglas, self._rutas, self._claves):
+            valor = ficha.get(clave, regla.defecto) if clave else leer_ruta(ficha, ruta, regla.defecto)
+            valido = _comprobar(regla, valor)
+            validos += valido
+            resultado[regla.campo] = self._resultado_regla(regla, valido, valor)
+        resultado["score_total"] = round(validos / len(self.reglas), 2) if self.reglas else 0.0
+        return resultado
+
+    def columnas(self, fichas: list[dict]) -> dict[str, list]:
+        """Tabla por columnas: para cada regla, el valor de su campo en cada ficha."""
+        return {
+            regla.campo: [ficha.get(clave, regla.defecto) for ficha in fichas] if clave
+            else [leer_ruta(ficha, ruta, regla.defecto) for ficha in fichas]
+            for regla, ruta, clave in zip(self.reglas, self._rutas, self._claves)
+        }
+
+    def validez_columnas(self, columnas: dict[str, list]) -> dict[str, list[bool]]:
+        return {regla.campo: _comprobar_columna(regla, columnas[regla.campo]) for regla in self.reglas}
+
+    def evaluar_lote(self, fichas: list[dict]) -> list[dict]:
+        """Mismo resultado que `evaluar` para cada ficha, calculado columna a columna."""
+        columnas = self.columnas(fichas)
+        validez = self.validez_columnas(columnas)
+        resultados = [{} for _ in fichas]
+        for regla in self.reglas:
+            for resultado, valido, valor in zip(resultados, validez[regla.campo], columnas[regla.campo]):
+                resultado[regla.campo] = self._resultado_regla(regla, valido, valor)
+        for i, resultado in enumerate(resultados):
+            validos = sum(validez[regla.campo][i] for regla in self.reglas)
+            resultado["score_total"] = round(validos / len(self.reglas), 2) if self.reglas else 0.0
+        return resultados
+
+    def contar_aprobados(self, fichas: list[dict]) -> dict[str, int]:
+        validez = self.validez_columnas(self.columnas(fichas))
+        return {campo: sum(valores) for campo, valores in validez.items()}
+
+    def tasas_aprobado(self, fichas: list[dict]) -> dict:
+        return informe_tasas(self.contar_aprobados(fichas), len(fichas))
+
+def informe_tasas(aprobados: dict[str, int], total: int) -> dict:
+    """Informe por regla a partir de los aprobados acumulados (se puede sumar por bloques)."""
+    return {
+        "fichas": total,
+        "reglas": {
+            campo: {"aprobadas": n, "tasa": round(n / total, 4) if total else 0.0}
+            for campo, n in aprobados.items()
+        },
+    }
+
+EVALUADOR = EvaluadorReglas()
+
+def evaluar_json_por_reglas(json_data):
+    return EVALUADOR.evaluar(json_data)
+
+def campos_rechazados(json_data, campos=None) -> list[str]:
+    """
+    Campos que `json_data` trae con contenido y no superan su regla (solo los de `campos`,
+    si se indican). Los ausentes o vacíos no cuentan: la respuesta de un chunk solo
+    informa parte de la ficha.
+    """
+    validacion = evaluar_json_por_reglas(json_data)
+    return [
+        regla.campo for regla in EVALUADOR.reglas
+        if (campos is None or regla.campo in campos) and not validacion[regla.campo]["valido"]
+        and not esta_vacio(leer_ruta(json_data, tuple(regla.campo.split(".")), ""))
+    ]
+
+def iterar_fichas(carpeta: str, patron: str = "*_limpio.json"):
+    # Recorre el archivo histórico; los JSON ilegibles se saltan con aviso
+    for ruta in sorted(glob.glob(os.path.join(carpeta, "**", patron), recursive=True)):
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                ficha = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ No se pudo leer {ruta}: {e}")
+            continue
+        if isinstance(ficha, dict):
+            yield ficha
+
+def auditar_archivo(carpeta: str, patron: str = "*_limpio.json", tamano_bloque: int = 5000,
+                    evaluador: EvaluadorReglas = EVALUADOR) -> dict:
+    """
+    Tasa de aprobado de cada regla sobre todas las fichas de `carpeta` (recursivo).
+    Se evalúa por bloques de `tamano_bloque` fichas para no cargar el archivo entero.
+    """
+    aprobados = {regla.campo: 0 for regla in evaluador.reglas}
+    total = 0
+    bloque = []
+    for ficha in iterar_fichas(carpeta, patron):
+        bloque.append(ficha)
+        if len(bloque) >= tamano_bloque:
+            for campo, n in evaluador.contar_aprobados(bloque).items():
+                aprobados[campo] += n
+            total += len(bloque)
+            bloque = []
+    if bloque:
+        for campo, n in evaluador.contar_aprobados(bloque).items():
+            aprobados[campo] += n
+        total += len(bloque)
+    return informe_tasas(aprobados, total)
+
+# Modo CLI / n8n: auditoría del archivo de fichas generadas
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tasa de aprobado de cada regla sobre un archivo de fichas JSON.")
+    parser.add_argument("carpeta")
+    parser.add_argument("--patron", default="*_limpio.json")
+    parser.add_argument("--bloque", type=int, default=5000)
+    parser.add_argument("--salida", help="Guarda el informe en este JSON")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    informe = auditar_archivo(args.carpeta, args.patron, args.bloque)
+    informe["segundos"] = round(time.perf_counter() - inicio, 2)
+    print(f"\n🔍 {informe['fichas']} fichas auditadas en {informe['segundos']}s:")
+    for campo, datos in informe["reglas"].items():
+        print(f"   {campo:<30} {datos['tasa']:7.1%}  ({datos['aprobadas']}/{informe['fichas']})")
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False)
+        print(f"💾 Informe guardado en: {args.salida}")
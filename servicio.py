@@ -0,0 +1,319 @@
+"""
+Modo servicio: un proceso residente que atiende trabajos por una API HTTP local.
+
+Al arrancar se cargan una sola vez el tokenizador, las plantillas del prompt y del Word,
+PyMuPDF, el cliente del modelo (con su pool de conexiones) y el almacén; cada trabajo
+paga solo su propio proceso, sin arranque del intérprete ni importaciones. Los trabajos
+esperan en una cola acotada: con la cola llena se responde 429 con Retry-After.
+
+Uso:
+    python servicio.py [--puerto 8012 | --socket /tmp/fichas.sock] [--trabajos 2] [--cola 16] [--peticiones 8]
+
+API (JSON):
+    POST /trabajos          {"nombre": "...", "documentos": ["ruta1.pdf", ...]} o {"carpeta": "..."}
+                            -> 202 {"id", "estado", "posicion"}; con "esperar": true responde al terminar
+    GET  /trabajos          estado de los trabajos recientes
+    GET  /trabajos/<id>     estado, progreso (etapa y chunks resueltos) y resultado
+    GET  /salud             trabajos en cola y en curso
+
+P. ej.: curl --unix-socket /tmp/fichas.sock -d '{"carpeta": "entradas/documentos"}' http://local/trabajos
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import signal
+import argparse
+import threading
+import socketserver
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from main import listar_documentos
+from lotes import normalizar_nombre_trabajo, ejecutar_trabajo
+from scripts.metricas import MetricasEjecucion
+from scripts.resumidor_ia import configurar_limite_peticiones, MAX_PETICIONES_GLOBALES
+
+PUERTO_SERVICIO = int(os.getenv("FICHAS_SERVICIO_PUERTO", "8012"))
+# Trabajos en paralelo y trabajos que pueden esperar en cola antes de rechazar con 429
+TRABAJOS_SERVICIO = int(os.getenv("FICHAS_SERVICIO_TRABAJOS", "2"))
+MAX_COLA_SERVICIO = int(os.getenv("FICHAS_SERVICIO_COLA", "16"))
+# Trabajos terminados que se conservan para consultar su resultado
+MAX_TRABAJOS_GUARDADOS = 200
+# Segundos que se sugieren al cliente cuando la cola está llena
+RETRY_AFTER_COLA = 5
+# Tope de espera de una petición con "esperar": true
+MAX_ESPERA_S = 600
+
+def precalentar() -> dict:
+    """
+    Carga lo que cada ejecución de main.py paga al empezar. Devuelve los milisegundos de
+    cada paso; un fallo (p. ej. sin OPENAI_API_KEY) se avisa y se deja para el primer trabajo.
+    """
+    from scripts.chunker import get_tokenizer
+    from scripts.prompt_ia import construir_prefijo_prompt, contar_tokens_prefijo, campos_plantilla
+    from scripts.almacen import obtener_almacen
+    import scripts.resumidor_ia as resumidor
+
+    def modelos():
+        get_tokenizer(resumidor.MODELO)
+        if resumidor.ENRUTAR_MODELO:
+            get_tokenizer(resumidor.MODELO_LIGERO)
+
+    def prompt():
+        construir_prefijo_prompt()
+        campos_plantilla()
+        contar_tokens_prefijo(resumidor.MODELO)
+
+    def lectores():
+        import fitz  # noqa: F401 (PyMuPDF)
+        import scripts.generar_docx  # noqa: F401
+
+    pasos = {
+        "tokenizador": modelos,
+        "prompt": prompt,
+        "lectores": lectores,
+        "cliente": resumidor.obtener_transporte,
+        "almacen": obtener_almacen,
+    }
+    tiempos = {}
+    for nombre, paso in pasos.items():
+        inicio = time.perf_counter()
+        try:
+            paso()
+        except Exception as e:
+            print(f"⚠️ No se pudo precargar {nombre}: {e}")
+        tiempos[nombre] = round((time.perf_counter() - inicio) * 1000, 1)
+    return tiempos
+
+class TrabajoServicio:
+    """Un trabajo recibido por la API: documentos, estado y métricas en curso."""
+
+    def __init__(self, nombre: str, documentos: list[str]):
+        self.id = uuid.uuid4().hex[:12]
+        self.nombre = nombre
+        self.documentos = documentos
+        self.estado = "en_cola"
+        self.recibido = datetime.now().isoformat(timespec="seconds")
+        self.metricas = MetricasEjecucion(nombre)
+        self.resultado = None
+        self.terminado = threading.Event()
+        self._reloj = time.perf_counter()
+
+    def descripcion(self) -> dict:
+        datos = {"id": self.id, "nombre": self.nombre, "estado": self.estado, "recibido": self.recibido}
+        if self.estado == "en_curso":
+            datos["progreso"] = self.metricas.progreso()
+        elif self.resultado is not None:
+            datos["resultado"] = self.resultado
+        else:
+            datos["espera_s"] = round(time.perf_counter() - self._reloj, 3)
+        return datos
+
+class ColaTrabajos:
+    """
+    Cola acotada con `num_trabajadores` hilos fijos. Los hilos viven lo que el servicio,
+    así que conservan la plantilla del Word que generar_docx abre una vez por hilo.
+    """
+
+    def __init__(self, num_trabajadores: int = TRABAJOS_SERVICIO, max_cola: int = MAX_COLA_SERVICIO):
+        self.cola = queue.Queue(maxsize=max(max_cola, 1))
+        self.trabajos = OrderedDict()
+        self.en_curso = 0
+        self._lock = threading.Lock()
+        # Dos trabajos con el mismo nombre escriben en la misma carpeta: se ejecutan de uno en uno
+        self._locks_espacio = {}
+        self.hilos = [threading.Thread(target=self._atender, name=f"trabajador-{i+1}", daemon=True)
+                      for i in range(max(num_trabajadores, 1))]
+        for hilo in self.hilos:
+            hilo.start()
+
+    def encolar(self, nombre: str, documentos: list[str]) -> TrabajoServicio:
+        """Añade el trabajo o lanza queue.Full si la cola está llena."""
+        trabajo = TrabajoServicio(nombre, documentos)
+        with self._lock:
+            self.cola.put_nowait(trabajo)
+            self.trabajos[trabajo.id] = trabajo
+            self._olvidar_terminados()
+        return trabajo
+
+    def _olvidar_terminados(self):
+        terminados = [t.id for t in self.trabajos.values() if t.terminado.is_set()]
+        for id_trabajo in terminados[:max(len(terminados) - MAX_TRABAJOS_GUARDADOS, 0)]:
+            del self.trabajos[id_trabajo]
+
+    def obtener(self, id_trabajo: str):
+        with self._lock:
+            return self.trabajos.get(id_trabajo)
+
+    def listar(self) -> list[dict]:
+        with self._lock:
+            trabajos = list(self.trabajos.values())
+        return [t.descripcion() for t in trabajos]
+
+    def salud(self) -> dict:
+        with self._lock:
+            return {"en_cola": self.cola.qsize(), "en_curso": self.en_curso, "max_cola": self.cola.maxsize,
+                    "trabajadores": len(self.hilos)}
+
+    def _atender(self):
+        from scripts.generar_docx import documento_en_blanco
+        documento_en_blanco()
+        while True:
+            trabajo = self.cola.get()
+            if trabajo is None:
+                return
+            with self._lock:
+                lock_espacio = self._locks_espacio.setdefault(trabajo.nombre, threading.Lock())
+            with lock_espacio:
+                with self._lock:
+                    self.en_curso += 1
+                trabajo.estado = "en_curso"
+                resultado = ejecutar_trabajo({"nombre": trabajo.nombre, "documentos": trabajo.documentos}, trabajo.metricas)
+                trabajo.resultado = resultado
+                trabajo.estado = resultado["estado"]
+                with self._lock:
+                    self.en_curso -= 1
+            trabajo.terminado.set()
+            print(f"🏁 {trabajo.nombre} ({trabajo.id}): {resultado['estado']} en {resultado['duracion_s']}s")
+
+    def detener(self):
+        # Los trabajos ya encolados se terminan antes de parar
+        for _ in self.hilos:
+            self.cola.put(None)
+        for hilo in self.hilos:
+            hilo.join()
+
+def leer_trabajo(cuerpo: dict) -> tuple[str, list[str]]:
+    """Nombre y rutas de un POST /trabajos; lanza ValueError si no es válido."""
+    if not isinstance(cuerpo, dict):
+        raise ValueError("El cuerpo debe ser un objeto JSON")
+    for campo in ("nombre", "carpeta"):
+        if cuerpo.get(campo) is not None and not isinstance(cuerpo[campo], str):
+            raise ValueError(f"'{campo}' debe ser un texto")
+    if cuerpo.get("carpeta"):
+        if not os.path.isdir(cuerpo["carpeta"]):
+            raise ValueError(f"No existe la carpeta {cuerpo['carpeta']}")
+        documentos = listar_documentos(cuerpo["carpeta"])
+    else:
+        documentos = cuerpo.get("documentos") or []
+    if not isinstance(documentos, list) or not documentos or not all(isinstance(d, str) for d in documentos):
+        raise ValueError("Indica 'documentos' (lista de rutas) o 'carpeta'")
+    documentos = [os.path.abspath(d) for d in documentos]
+    faltan = [d for d in documentos if not os.path.isfile(d)]
+    if faltan:
+        raise ValueError(f"No existen: {', '.join(faltan)}")
+    nombre = cuerpo.get("nombre") or os.path.basename(os.path.normpath(cuerpo.get("carpeta") or documentos[0]))
+    return normalizar_nombre_trabajo(os.path.splitext(nombre)[0]), documentos
+
+class ManejadorServicio(BaseHTTPRequestHandler):
+    cola: ColaTrabajos = None
+
+    def log_message(self, formato, *args):
+        pass
+
+    def enviar_json(self, codigo: int, cuerpo, cabeceras: dict = None):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        ruta = self.path.rstrip("/")
+        if ruta == "/salud":
+            self.enviar_json(200, self.cola.salud())
+        elif ruta == "/trabajos":
+            self.enviar_json(200, self.cola.listar())
+        elif ruta.startswith("/trabajos/"):
+            trabajo = self.cola.obtener(ruta.rsplit("/", 1)[1])
+            if trabajo is None:
+                self.enviar_json(404, {"error": "Trabajo no encontrado"})
+            else:
+                self.enviar_json(200, trabajo.descripcion())
+        else:
+            self.enviar_json(404, {"error": f"Ruta desconocida: {self.path}"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/trabajos":
+            self.enviar_json(404, {"error": f"Ruta desconocida: {self.path}"})
+            return
+        try:
+            cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            nombre, documentos = leer_trabajo(cuerpo)
+        except ValueError as e:
+            self.enviar_json(400, {"error": str(e)})
+            return
+        try:
+            trabajo = self.cola.encolar(nombre, documentos)
+        except queue.Full:
+            self.enviar_json(429, {"error": "Cola llena", **self.cola.salud()}, {"Retry-After": str(RETRY_AFTER_COLA)})
+            return
+
+        if cuerpo.get("esperar"):
+            trabajo.terminado.wait(MAX_ESPERA_S)
+            self.enviar_json(200 if trabajo.terminado.is_set() else 202, trabajo.descripcion())
+        else:
+            self.enviar_json(202, {**trabajo.descripcion(), "posicion": self.cola.cola.qsize()})
+
+class ServidorUnixHTTP(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def iniciar_servicio(cola: ColaTrabajos, puerto: int = PUERTO_SERVICIO, socket_unix: str = None, host: str = "127.0.0.1"):
+    """
+    Arranca la API en un hilo y devuelve el servidor; con `socket_unix` escucha en ese
+    socket en lugar de en un puerto TCP. Se detiene con `servidor.shutdown()`.
+    """
+    manejador = type("Manejador", (ManejadorServicio,), {"cola": cola})
+    if socket_unix:
+        if os.path.exists(socket_unix):
+            os.unlink(socket_unix)
+        servidor = ServidorUnixHTTP(socket_unix, manejador)
+    else:
+        servidor = ThreadingHTTPServer((host, puerto), manejador)
+        servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--puerto", type=int, default=PUERTO_SERVICIO)
+    parser.add_argument("--socket", help="Socket Unix en el que escuchar en lugar del puerto")
+    parser.add_argument("--trabajos", type=int, default=TRABAJOS_SERVICIO, help="Trabajos en paralelo")
+    parser.add_argument("--cola", type=int, default=MAX_COLA_SERVICIO, help="Trabajos en espera antes de responder 429")
+    parser.add_argument("--peticiones", type=int, default=MAX_PETICIONES_GLOBALES, help="Tope global de peticiones al modelo en vuelo")
+    args = parser.parse_args(argv)
+
+    configurar_limite_peticiones(args.peticiones)
+    inicio = time.perf_counter()
+    tiempos = precalentar()
+    print(f"🔥 Precargado en {(time.perf_counter() - inicio) * 1000:.0f} ms: "
+          + ", ".join(f"{n} {ms:.0f} ms" for n, ms in tiempos.items()))
+
+    cola = ColaTrabajos(args.trabajos, args.cola)
+    servidor = iniciar_servicio(cola, args.puerto, args.socket)
+    direccion = args.socket or f"http://127.0.0.1:{servidor.server_address[1]}"
+    print(f"🟢 Servicio en {direccion}: {args.trabajos} trabajos en paralelo, cola de {args.cola} (Ctrl+C para parar)")
+
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    try:
+        while not parar.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    print("🛑 Deteniendo: se terminan los trabajos en cola...")
+    servidor.shutdown()
+    cola.detener()
+    if args.socket and os.path.exists(args.socket):
+        os.unlink(args.socket)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import types
+import threading
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+
+class TokenizadorBytes:
+    """Un token por byte UTF-8: las pruebas no descargan las codificaciones de tiktoken."""
+
+    def encode(self, texto: str, **_) -> list[int]:
+        return list(texto.encode("utf-8"))
+
+    def decode(self, tokens: list[int]) -> str:
+        return bytes(tokens).decode("utf-8", "ignore")
+
+def respuesta_chat(contenido: str, prompt_tokens: int = 100, completion_tokens: int = 20):
+    # Misma forma que el ChatCompletion del cliente de OpenAI, con lo que leen los módulos
+    mensaje = types.SimpleNamespace(content=contenido)
+    uso = types.SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, prompt_tokens_details=None)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=mensaje)], usage=uso)
+
+FICHA_RESPUESTA = {
+    "denominacion_normativa_nombre_ayuda": "Ayudas a la natalidad 2025",
+    "tipo_ayuda": ["Natalidad"],
+    "cuantia": [{"concepto": "Por hijo", "valor": "1.500", "unidad": "€"}],
+    "documentos_presentar": [{"clave": "DNI", "valor": "Copia del DNI"}],
+}
+
+class TransporteFalso:
+    """
+    Transporte del modelo en memoria: responde a cada petición con `responder(peticion)`
+    (un dict o un texto) y guarda las peticiones recibidas.
+    """
+
+    def __init__(self, responder=None):
+        self.responder = responder or (lambda peticion: FICHA_RESPUESTA)
+        self.peticiones = []
+        self._lock = threading.Lock()
+
+    def completar(self, peticion: dict):
+        with self._lock:
+            self.peticiones.append(peticion)
+        contenido = self.responder(peticion)
+        if not isinstance(contenido, str):
+            contenido = json.dumps(contenido, ensure_ascii=False)
+        return respuesta_chat(contenido)
+
+@pytest.fixture(autouse=True)
+def entorno_aislado(monkeypatch, tmp_path):
+    """
+    Sin red ni escrituras en el repositorio: tokenizador por bytes, sin caché de
+    respuestas, almacén en una carpeta temporal y reintentos sin espera.
+    """
+    import scripts.chunker as chunker
+    import scripts.pipeline as pipeline
+    import scripts.prompt_ia as prompt_ia
+    import scripts.resumidor_ia as resumidor
+    import scripts.almacen as almacen
+
+    tokenizador = TokenizadorBytes()
+    for modulo in (chunker, pipeline, prompt_ia):
+        monkeypatch.setattr(modulo, "get_tokenizer", lambda model="gpt-4o": tokenizador)
+    prompt_ia.contar_tokens_prefijo.cache_clear()
+    monkeypatch.setattr(resumidor, "cache", None)
+    monkeypatch.setattr(resumidor, "transporte", None)
+    monkeypatch.setattr(resumidor, "ESPERA_BASE_REINTENTO", 0.0)
+    monkeypatch.setattr(almacen, "RUTA_ALMACEN", str(tmp_path / "almacen.sqlite3"))
+    monkeypatch.setattr(almacen, "_almacen", None)
+    yield
+    if almacen._almacen is not None:
+        almacen._almacen.cerrar()
+    prompt_ia.contar_tokens_prefijo.cache_clear()
+
+@pytest.fixture
+def transporte_falso(monkeypatch):
+    import scripts.resumidor_ia as resumidor
+    transporte = TransporteFalso()
+    monkeypatch.setattr(resumidor, "transporte", transporte)
+    return transporte
+
+@pytest.fixture
+def crear_pdf(tmp_path):
+    """Escribe un PDF con una página por texto de `paginas` y devuelve su ruta."""
+    import fitz  # PyMuPDF
+
+    def crear(nombre: str, paginas: list[str]) -> str:
+        ruta = str(tmp_path / nombre)
+        with fitz.open() as doc:
+            for texto in paginas:
+                pagina = doc.new_page()
+                pagina.insert_textbox(fitz.Rect(50, 50, 550, 800), texto, fontsize=9)
+            doc.save(ruta)
+        return ruta
+
+    return crear
@@ -0,0 +1,129 @@
+import shutil
+
+import pytest
+
+import main
+import scripts.almacen as almacen_mod
+import scripts.extractor_texto as extractor_texto
+import scripts.manifiesto as manifiesto_mod
+import scripts.resumidor_ia as resumidor
+from scripts.almacen import AlmacenConvocatorias, obtener_almacen, version_pipeline
+
+TEXTO = " ".join(f"La base {i} regula las ayudas a la natalidad del municipio para el ejercicio." for i in range(40))
+
+@pytest.fixture
+def almacen(tmp_path):
+    almacen = AlmacenConvocatorias(str(tmp_path / "convocatorias.sqlite3"))
+    yield almacen
+    almacen.cerrar()
+
+@pytest.fixture
+def documento(tmp_path):
+    ruta = tmp_path / "bases.pdf"
+    ruta.write_bytes(b"%PDF contenido de prueba")
+    return str(ruta)
+
+def test_misma_ficha_para_los_mismos_documentos_con_otro_nombre(almacen, documento, tmp_path):
+    almacen.registrar_convocatoria([documento], "ficha", TEXTO, {})
+    almacen.registrar_ficha([documento], {"denominacion_normativa_nombre_ayuda": "Cheque bebé"})
+    copia = str(tmp_path / "copia.pdf")
+    shutil.copy(documento, copia)
+
+    previa = almacen.buscar_exacta([copia])
+
+    assert previa["nombre_base"] == "ficha" and previa["ficha"] == {"denominacion_normativa_nombre_ayuda": "Cheque bebé"}
+    (tmp_path / "copia.pdf").write_bytes(b"%PDF otro contenido")
+    assert almacen.buscar_exacta([copia]) is None
+
+def test_otra_configuracion_no_reutiliza_la_ficha(almacen, documento, monkeypatch):
+    almacen.registrar_convocatoria([documento], "ficha", TEXTO, {})
+    almacen.registrar_ficha([documento], {"descripcion": "x"})
+    version = version_pipeline()
+
+    monkeypatch.setattr(resumidor, "ENRUTAR_MODELO", True)
+
+    assert version_pipeline() != version
+    assert almacen.buscar_exacta([documento]) is None
+
+def test_otra_extraccion_no_reutiliza_la_ficha(almacen, documento, tmp_path, monkeypatch):
+    (tmp_path / "extractor.py").write_text("version = 1")
+    monkeypatch.setattr(manifiesto_mod, "RAIZ", str(tmp_path))
+    monkeypatch.setitem(manifiesto_mod.DEPENDENCIAS_ETAPA, "extraccion", ["extractor.py"])
+    almacen.registrar_convocatoria([documento], "ficha", TEXTO, {})
+    almacen.registrar_ficha([documento], {"descripcion": "x"})
+    assert almacen.buscar_exacta([documento]) is not None
+
+    # Otro código de extracción o distintas opciones de limpieza de cabeceras: otro texto
+    (tmp_path / "extractor.py").write_text("version = 2")
+    assert almacen.buscar_exacta([documento]) is None
+    (tmp_path / "extractor.py").write_text("version = 1")
+    monkeypatch.setattr(extractor_texto, "MIN_PAGINAS_REPETIDA", 5)
+    assert almacen.buscar_exacta([documento]) is None
+
+def test_volver_a_registrar_sustituye_la_convocatoria_y_conserva_las_partes(almacen, documento):
+    almacen.registrar_convocatoria([documento], "ficha", TEXTO, {"h1": (0, {"cuantia": []})})
+    almacen.registrar_convocatoria([documento], "ficha", TEXTO, {"h2": (1, {"plazo": "15 días"})})
+    assert almacen.estadisticas() == {"convocatorias": 1, "documentos": 1, "partes": 2}
+
+def test_partes_conocidas_por_huella_del_chunk(almacen, documento):
+    almacen.registrar_convocatoria([documento], "ficha", TEXTO, {"h1": (0, {"cuantia": []}), "h2": (1, {"plazo": "x"})})
+    # Los índices son los del chunk en la convocatoria nueva, no en la registrada
+    assert almacen.partes_conocidas(["h9", "h2", "h1", "h2"]) == {1: {"plazo": "x"}, 2: {"cuantia": []}, 3: {"plazo": "x"}}
+
+def test_buscar_similares_por_bosquejo(almacen, documento, tmp_path):
+    otro = tmp_path / "otro.pdf"
+    otro.write_bytes(b"%PDF otro")
+    almacen.registrar_convocatoria([documento], "natalidad", TEXTO, {})
+    almacen.registrar_convocatoria([str(otro)], "deportes", "Subvenciones a clubes deportivos federados. " * 40, {})
+
+    similares = almacen.buscar_similares(TEXTO.replace("base 3 ", "base 33 "))
+
+    assert [s["nombre_base"] for s in similares] == ["natalidad"]
+    assert 0.8 <= similares[0]["similitud"] < 1
+    assert almacen.buscar_similares("Texto sin relación con ninguna convocatoria registrada") == []
+
+def test_busqueda_de_texto_completo(almacen, documento):
+    almacen.registrar_convocatoria([documento], "ficha", TEXTO, {})
+    almacen.registrar_ficha([documento], {"denominacion_normativa_nombre_ayuda": "Cheque bebé", "cuantia": []})
+    resultados = almacen.buscar("cheque")
+    assert [r["nombre_base"] for r in resultados] == ["ficha"]
+    assert resultados[0]["denominacion"] == "Cheque bebé"
+    assert almacen.buscar("natalidad AND municipio")[0]["nombre_base"] == "ficha"
+
+def test_sin_poder_abrir_el_almacen_se_continua_sin_el(tmp_path, monkeypatch):
+    (tmp_path / "archivo").write_text("no es una carpeta")
+    monkeypatch.setattr(almacen_mod, "RUTA_ALMACEN", str(tmp_path / "archivo" / "convocatorias.sqlite3"))
+    assert obtener_almacen() is None
+
+PAGINAS = [f"Artículo {i}. Convocatoria de ayudas a la natalidad.\n" + f"Texto de la base reguladora {i}. " * 60
+           for i in range(1, 5)]
+
+@pytest.fixture
+def convocatoria(crear_pdf, tmp_path, transporte_falso):
+    def ejecutar(nombre: str, paginas):
+        # `paginas` es el texto de un PDF nuevo o la ruta de uno ya creado (mismos bytes). El
+        # nombre del archivo no cambia: aparece en la cabecera del texto y, con ella, en el primer chunk
+        (tmp_path / nombre).mkdir()
+        if isinstance(paginas, str):
+            rutas = [shutil.copy(paginas, tmp_path / nombre / "bases.pdf")]
+        else:
+            rutas = [crear_pdf(f"{nombre}/bases.pdf", paginas)]
+        carpetas = {clave: str(tmp_path / nombre / clave) for clave in ("txt", "json", "docx", "logs")}
+        antes = len(transporte_falso.peticiones)
+        resultado = main.procesar_convocatoria(rutas, nombre, carpetas)
+        assert resultado["estado"] == "ok"
+        with open(tmp_path / nombre / "json" / f"{nombre}_limpio.json", encoding="utf-8") as f:
+            return len(transporte_falso.peticiones) - antes, f.read()
+
+    return ejecutar
+
+def test_documentos_identicos_reutilizan_la_ficha_sin_llamar_al_modelo(convocatoria, tmp_path):
+    llamadas, ficha = convocatoria("primera", PAGINAS)
+    assert llamadas > 1
+    assert convocatoria("reenvio", str(tmp_path / "primera" / "bases.pdf")) == (0, ficha)
+
+def test_correccion_de_una_pagina_solo_resume_los_chunks_nuevos(convocatoria):
+    llamadas, _ = convocatoria("primera", PAGINAS)
+    corregida = PAGINAS[:-1] + [PAGINAS[-1].replace("reguladora 4", "corregida 4")]
+    nuevas, _ = convocatoria("correccion", corregida)
+    assert 0 < nuevas < llamadas
@@ -0,0 +1,23 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+import arranque
+from conftest import RAIZ
+
+MODULOS = ["main", "lotes", "servicio", "scripts.resumidor_ia", "scripts.lote_openai", "scripts.extractor_texto"]
+
+@pytest.mark.parametrize("modulo", MODULOS)
+def test_importar_no_carga_dependencias_pesadas(modulo):
+    _, pesadas = arranque.medir_importacion(modulo, RAIZ)
+    assert pesadas == []
+
+def test_importar_sin_clave_de_openai():
+    entorno = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    sonda = "import json, main, scripts.resumidor_ia as r; print(json.dumps([r._cliente is None, r.transporte is None]))"
+    proceso = subprocess.run([sys.executable, "-c", sonda], cwd=RAIZ, env=entorno, capture_output=True, text=True)
+    assert proceso.returncode == 0, proceso.stderr
+    assert json.loads(proceso.stdout.strip().splitlines()[-1]) == [True, True]
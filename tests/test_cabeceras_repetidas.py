@@ -0,0 +1,54 @@
+import os
+import sys
+import subprocess
+
+import scripts.extractor_texto as extractor_texto
+from scripts.extractor_texto import detectar_lineas_repetidas, limpiar_paginas_repetidas, extraer_documentos
+from conftest import RAIZ
+
+def pagina(numero: int, cuerpo: str) -> str:
+    return (f"BOLETÍN OFICIAL DE LA PROVINCIA\nNúm. 15 - Página {numero}\n{cuerpo}\n"
+            f"Artículo {numero}. Objeto\nCSV: ABCD-{numero} Verificable en https://sede.ejemplo.es\n")
+
+CUERPOS = ["Primera base.", "Segunda base.", "Tercera base.", "Cuarta base.", "Quinta base.", "Sexta base."]
+PAGINAS = [pagina(i, cuerpo) for i, cuerpo in enumerate(CUERPOS, start=1)]
+
+def test_detecta_cabeceras_y_pies_con_numeros_distintos():
+    repetidas = detectar_lineas_repetidas([PAGINAS])[0]
+    assert "boletín oficial de la provincia" in repetidas
+    assert "núm. # - página #" in repetidas
+    assert "csv: abcd-# verificable en https://sede.ejemplo.es" in repetidas
+    assert not any(clave.startswith("artículo") for clave in repetidas)
+
+def test_conserva_la_primera_aparicion_y_las_lineas_estructurales():
+    (limpias, metricas), = limpiar_paginas_repetidas([PAGINAS])
+    assert limpias[0] == PAGINAS[0]
+    for i, (texto, cuerpo) in enumerate(zip(limpias[1:], CUERPOS[1:]), start=2):
+        assert "BOLETÍN" not in texto and "CSV" not in texto
+        assert f"Artículo {i}. Objeto" in texto and cuerpo in texto
+    assert metricas["lineas_repetidas"] == 3 * 5
+    assert metricas["caracteres_repetidos"] == sum(len(a) - len(b) for a, b in zip(PAGINAS, limpias))
+
+def test_pocas_paginas_no_se_limpian():
+    assert limpiar_paginas_repetidas([PAGINAS[:2]]) == [(PAGINAS[:2], {})]
+
+def test_extraccion_quita_las_cabeceras_del_pdf(crear_pdf, monkeypatch):
+    ruta = crear_pdf("bases.pdf", PAGINAS)
+    con = extraer_documentos([ruta], max_procesos=1)[0]
+    monkeypatch.setattr(extractor_texto, "QUITAR_REPETIDAS", False)
+    sin = extraer_documentos([ruta], max_procesos=1)[0]
+
+    assert con.texto.count("BOLETÍN OFICIAL") == 1 and sin.texto.count("BOLETÍN OFICIAL") == 6
+    assert con.metadatos["lineas_repetidas"] == 15
+    assert len(sin.texto) - len(con.texto) == con.metadatos["caracteres_repetidos"]
+
+def test_cli_imprime_solo_el_texto(crear_pdf):
+    # Se ejecuta como script (modo n8n): el aviso de limpieza va por stderr
+    ruta = crear_pdf("bases.pdf", PAGINAS)
+    proceso = subprocess.run([sys.executable, os.path.join(RAIZ, "scripts", "extractor_texto.py"), ruta],
+                             capture_output=True, text=True)
+    assert proceso.returncode == 0, proceso.stderr
+    assert "--- DOCUMENTO 1 (bases.pdf) ---" in proceso.stdout
+    assert proceso.stdout.count("BOLETÍN OFICIAL") == 1
+    assert "🧹" in proceso.stderr and "🧹" not in proceso.stdout
+    assert "tiktoken" not in proceso.stderr
@@ -0,0 +1,58 @@
+import os
+import json
+import time
+
+import scripts.resumidor_ia as resumidor
+from scripts.cache_llm import CacheRespuestas, calcular_clave
+
+def test_calcular_clave_separa_las_partes():
+    assert calcular_clave("a", "b") == calcular_clave("a", "b")
+    assert calcular_clave("ab", "") != calcular_clave("a", "b")
+
+def test_guardar_y_obtener(tmp_path):
+    cache = CacheRespuestas(str(tmp_path))
+    clave = calcular_clave("chunk", "prompt")
+    assert cache.obtener(clave) is None
+    cache.guardar(clave, '{"descripcion": "x"}')
+    assert cache.obtener(clave) == '{"descripcion": "x"}'
+    assert cache.estadisticas()["aciertos"] == 1 and cache.estadisticas()["fallos"] == 1
+
+def test_entradas_caducadas_no_se_devuelven(tmp_path):
+    cache = CacheRespuestas(str(tmp_path), edad_maxima_dias=1)
+    clave = calcular_clave("viejo")
+    cache.guardar(clave, "respuesta")
+    ruta = cache._ruta(clave)
+    with open(ruta, "r", encoding="utf-8") as f:
+        entrada = json.load(f)
+    entrada["creado"] = time.time() - 2 * 86400
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(entrada, f)
+
+    assert cache.obtener(clave) is None
+    assert not os.path.exists(ruta)
+
+def test_purgar_expulsa_primero_la_menos_usada(tmp_path):
+    cache = CacheRespuestas(str(tmp_path))
+    claves = [calcular_clave(i) for i in range(3)]
+    for i, clave in enumerate(claves):
+        cache.guardar(clave, "x" * 1000)
+        os.utime(cache._ruta(clave), (time.time() - 100 + i, time.time() - 100 + i))
+    # La primera es la más antigua, pero al leerla pasa a ser la usada más recientemente
+    cache.obtener(claves[0])
+    cache.tamano_maximo = sum(os.path.getsize(cache._ruta(c)) for c in (claves[0], claves[2]))
+    cache.purgar()
+
+    assert cache.obtener(claves[0]) is not None
+    assert cache.obtener(claves[1]) is None
+    assert cache.obtener(claves[2]) is not None
+
+def test_generar_resumen_usa_la_cache_en_la_segunda_llamada(transporte_falso, tmp_path, monkeypatch):
+    monkeypatch.setattr(resumidor, "cache", CacheRespuestas(str(tmp_path / "cache")))
+    texto = "Convocatoria de ayudas a la natalidad."
+
+    primera = resumidor.generar_resumen_con_openai(texto, "ficha_parte1", str(tmp_path))
+    segunda = resumidor.generar_resumen_con_openai(texto, "ficha_parte1", str(tmp_path))
+
+    assert primera == segunda
+    assert len(transporte_falso.peticiones) == 1
+    assert resumidor.cache.estadisticas()["aciertos"] == 1
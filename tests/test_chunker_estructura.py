@@ -0,0 +1,58 @@
+from scripts.chunker import dividir_en_secciones, dividir_en_apartados, dividir_por_estructura, dividir_en_chunks
+from scripts.pipeline import ContextoPipeline
+
+def articulo(numero: int, palabras: int) -> str:
+    return f"Artículo {numero}. Título {numero}\n" + " ".join(f"texto{numero}" for _ in range(palabras)) + "\n"
+
+def test_el_contexto_trocea_segun_el_modo():
+    # Independiente de FICHAS_MODO_CHUNKING: cada modo se pide explícitamente
+    texto = "".join(articulo(i, 40 * i) for i in range(1, 6))
+    contexto = ContextoPipeline([], "ficha")
+    contexto.usar_texto(texto)
+    assert contexto.chunks(300, 50, modo="tokens") == dividir_en_chunks(texto, 300, 50)
+    assert contexto.chunks(300, 50, modo="estructura") == dividir_por_estructura(texto, 300, 50)
+    assert dividir_por_estructura(texto, 300, 50) != dividir_en_chunks(texto, 300, 50)
+
+def test_dividir_en_secciones_corta_en_encabezados_y_no_en_citas():
+    texto = ("Preámbulo.\n"
+             "Artículo 1. Objeto\nSegún el artículo 2 del presente decreto.\n"
+             "BASE SEGUNDA. Beneficiarios\n"
+             "ANEXO I\nModelo de solicitud\n"
+             "Disposición final primera\n")
+    secciones = dividir_en_secciones(texto)
+    assert "".join(secciones) == texto
+    assert [s.split("\n")[0] for s in secciones] == [
+        "Preámbulo.", "Artículo 1. Objeto", "BASE SEGUNDA. Beneficiarios", "ANEXO I", "Disposición final primera"]
+
+def test_dividir_en_apartados():
+    seccion = "Artículo 3. Requisitos\n1. Estar empadronado.\n2. Tener hijos.\na) Menores de edad.\n"
+    apartados = dividir_en_apartados(seccion)
+    assert "".join(apartados) == seccion
+    assert [a.strip() for a in apartados[1:]] == ["1. Estar empadronado.", "2. Tener hijos.", "a) Menores de edad."]
+
+def test_los_articulos_que_caben_no_se_parten():
+    articulos = [articulo(i, 20) for i in range(1, 9)]
+    texto = "".join(articulos)
+    tamano = len(articulos[0].encode())
+
+    chunks = dividir_por_estructura(texto, max_tokens=3 * tamano + 10, overlap=20)
+
+    assert len(chunks) == 3
+    for a in articulos:
+        assert sum(a.strip() in c for c in chunks) == 1
+    assert all(c.startswith("Artículo") for c in chunks)
+
+def test_articulo_mayor_que_el_presupuesto_se_corta_con_solapamiento():
+    largo = articulo(1, 200)
+    chunks = dividir_por_estructura(largo + articulo(2, 5), max_tokens=300, overlap=50)
+    assert all(len(c.encode()) <= 300 for c in chunks)
+    assert chunks[-1].startswith("Artículo 2")
+    assert chunks[0][-50:].strip()[:20] in chunks[1]
+
+def test_hueco_grande_se_llena_por_apartados():
+    pequeno = articulo(1, 3)
+    grande = "Artículo 2. Requisitos\n" + "".join(f"{i}. Requisito número {i} de la ayuda.\n" for i in range(1, 30))
+    chunks = dividir_por_estructura(pequeno + grande, max_tokens=400, overlap=0)
+    # El artículo 2 no cabe entero detrás del 1, pero el chunk está casi vacío: se completa con apartados
+    assert chunks[0].startswith("Artículo 1") and "Artículo 2" in chunks[0]
+    assert all(len(c.encode()) <= 400 for c in chunks)
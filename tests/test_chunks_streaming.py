@@ -0,0 +1,52 @@
+from scripts.chunker import dividir_en_chunks, iterar_chunks
+from scripts.extractor_texto import iterar_paginas, extraer_textos_unificados
+import scripts.extractor_texto as extractor_texto
+
+TEXTO = "".join(f"Base {i}. Texto de la convocatoria número {i}.\n" for i in range(200))
+
+def trozos(texto: str, tamano: int):
+    return [texto[i:i + tamano] for i in range(0, len(texto), tamano)]
+
+def test_iterar_chunks_igual_que_dividir_en_chunks():
+    for tamano in (1, 37, 500, len(TEXTO)):
+        assert list(iterar_chunks(trozos(TEXTO, tamano), 300, 50)) == dividir_en_chunks(TEXTO, 300, 50)
+
+def test_iterar_chunks_no_repite_solo_el_solapamiento():
+    assert list(iterar_chunks(["a" * 250], 100, 50)) == ["a" * 100, "a" * 100, "a" * 100, "a" * 100]
+    assert list(iterar_chunks(["a" * 150], 100, 50)) == ["a" * 100, "a" * 100]
+
+def test_iterar_chunks_consume_la_entrada_bajo_demanda():
+    leidos = []
+
+    def fragmentos():
+        for i, trozo in enumerate(trozos(TEXTO, 100)):
+            leidos.append(i)
+            yield trozo
+
+    primero = next(iterar_chunks(fragmentos(), 300, 50))
+    assert primero == dividir_en_chunks(TEXTO, 300, 50)[0]
+    assert len(leidos) == 3
+
+def test_iterar_paginas_reproduce_el_texto_unificado(crear_pdf, monkeypatch):
+    # Sin quitar cabeceras: el modo streaming no ve todas las páginas a la vez
+    monkeypatch.setattr(extractor_texto, "QUITAR_REPETIDAS", False)
+    rutas = [crear_pdf("a.pdf", ["Convocatoria.", "Base primera."]), crear_pdf("b.pdf", ["Anexo I."])]
+    streaming = "".join(iterar_paginas(rutas))
+    assert " ".join(streaming.split()) == " ".join(extraer_textos_unificados(rutas).split())
+
+def test_iterar_paginas_quita_cabeceras_como_el_texto_unificado(crear_pdf, monkeypatch):
+    # Las repetidas se detectan en las 3 primeras páginas y se quitan también de las siguientes
+    monkeypatch.setattr(extractor_texto, "PAGINAS_MUESTRA_REPETIDAS", 3)
+    paginas = [f"BOLETÍN OFICIAL DE LA PROVINCIA\nPágina {i}\nBase {'primera segunda tercera cuarta quinta'.split()[i]}.\n"
+               for i in range(5)]
+    rutas = [crear_pdf("a.pdf", paginas), crear_pdf("b.pdf", ["Anexo I."])]
+    streaming = "".join(iterar_paginas(rutas))
+    assert streaming.count("BOLETÍN OFICIAL") == 1
+    assert " ".join(streaming.split()) == " ".join(extraer_textos_unificados(rutas).split())
+
+def test_iterar_paginas_sin_cabecera_para_documentos_sin_texto(crear_pdf, tmp_path):
+    (tmp_path / "roto.pdf").write_bytes(b"no es un PDF")
+    rutas = [crear_pdf("vacio.pdf", [""]), str(tmp_path / "roto.pdf"), crear_pdf("b.pdf", ["Anexo I."])]
+    streaming = "".join(iterar_paginas(rutas))
+    assert streaming.startswith("--- DOCUMENTO 3 (b.pdf) ---")
+    assert " ".join(streaming.split()) == " ".join(extraer_textos_unificados(rutas).split())
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+import scripts.resumidor_ia as resumidor
+from scripts.metricas import MetricasEjecucion
+from conftest import FICHA_RESPUESTA
+
+CHUNK_POBRE = "Convocatoria de ayudas para las familias del municipio. " * 8
+CHUNK_DENSO = ("Convocatoria de ayudas. La cuantía será de 1.500 euros por hijo y 500 € por familia numerosa, "
+               "con un plazo de 15 días desde el 3 de marzo. Requisitos: estar empadronado (artículo 4).")
+
+@pytest.fixture
+def enrutado(monkeypatch, transporte_falso):
+    monkeypatch.setattr(resumidor, "ENRUTAR_MODELO", True)
+    return transporte_falso
+
+def test_sin_enrutado_siempre_el_modelo_principal():
+    assert resumidor.elegir_modelo(CHUNK_POBRE) == (resumidor.MODELO, resumidor.MAX_TOKENS_RESPUESTA, None)
+
+def test_la_densidad_elige_el_modelo(enrutado):
+    modelo, max_tokens, densidad = resumidor.elegir_modelo(CHUNK_POBRE)
+    assert (modelo, max_tokens, densidad) == (resumidor.MODELO_LIGERO, resumidor.MAX_TOKENS_LIGERO, 0.0)
+    modelo, max_tokens, densidad = resumidor.elegir_modelo(CHUNK_DENSO)
+    assert (modelo, max_tokens) == (resumidor.MODELO, resumidor.MAX_TOKENS_RESPUESTA) and densidad >= resumidor.UMBRAL_DENSIDAD
+
+def test_respuesta_valida_del_modelo_ligero_no_escala(enrutado, tmp_path):
+    metricas = MetricasEjecucion()
+    resultado = resumidor.generar_resumen_con_openai(CHUNK_POBRE, "ficha_parte1", str(tmp_path), metricas=metricas)
+
+    assert [p["model"] for p in enrutado.peticiones] == [resumidor.MODELO_LIGERO]
+    assert enrutado.peticiones[0]["max_tokens"] == resumidor.MAX_TOKENS_LIGERO
+    assert resumidor.parsear_json_generado(resultado) == FICHA_RESPUESTA
+    assert [e["escalado"] for e in metricas.enrutado] == [False]
+
+@pytest.mark.parametrize("ligera, motivo", [
+    ({**FICHA_RESPUESTA, "tipo_ayuda": ["Inventado"]}, "tipo_ayuda"),
+    ("no es JSON", "JSON no válido"),
+])
+def test_respuesta_rechazada_se_repite_con_el_principal(enrutado, tmp_path, ligera, motivo):
+    enrutado.responder = lambda peticion: ligera if peticion["model"] == resumidor.MODELO_LIGERO else FICHA_RESPUESTA
+    metricas = MetricasEjecucion()
+    assert resumidor.motivos_escalado(ligera if isinstance(ligera, str) else json.dumps(ligera)) == [motivo]
+
+    resultado = resumidor.generar_resumen_con_openai(CHUNK_POBRE, "ficha_parte1", str(tmp_path), metricas=metricas)
+
+    assert [p["model"] for p in enrutado.peticiones] == [resumidor.MODELO_LIGERO, resumidor.MODELO]
+    assert enrutado.peticiones[1]["max_tokens"] == resumidor.MAX_TOKENS_RESPUESTA
+    assert resumidor.parsear_json_generado(resultado) == FICHA_RESPUESTA
+    assert [e["escalado"] for e in metricas.enrutado] == [True]
+
+def test_las_reglas_de_completitud_no_escalan():
+    # Una descripción corta la devuelve cualquier chunk con poca información
+    assert resumidor.motivos_escalado('{"descripcion": "Corta.", "usuario": "Familias"}') == []
@@ -0,0 +1,37 @@
+import scripts.enrutador as enrutador
+import scripts.resumidor_ia as resumidor
+from scripts.enrutador import campos_relevantes, campos_no_relevantes, CAMPOS_GENERALES
+from scripts.limpiador_json import sanear_json_final
+from scripts.prompt_ia import campos_plantilla
+
+CHUNK_CUANTIA = "La cuantía será de 1.500 euros por hijo, con un importe adicional de 500 euros."
+CHUNK_FIRMAS = "Firmado: El Secretario General. Fdo.: Juan Pérez. Mérida, a 3 de marzo."
+
+def test_chunk_de_la_ayuda_pide_generales_y_concretos():
+    relevantes = campos_relevantes("Convocatoria de ayudas. " + CHUNK_CUANTIA)
+    assert set(CAMPOS_GENERALES) <= set(relevantes)
+    assert "cuantia" in relevantes and "criterios_concesion" not in relevantes
+
+def test_chunk_sin_la_ayuda_solo_pide_lo_que_informa():
+    assert campos_relevantes(CHUNK_CUANTIA) == ("cuantia",)
+
+def test_chunk_sin_nada_relevante_se_descarta(transporte_falso, tmp_path):
+    assert campos_no_relevantes(CHUNK_FIRMAS, campos_plantilla()) is None
+    assert resumidor.generar_resumen_con_openai(CHUNK_FIRMAS, "ficha_parte1", str(tmp_path)) == ""
+    assert transporte_falso.peticiones == []
+
+def test_el_prompt_solo_pide_los_campos_relevantes(transporte_falso, tmp_path):
+    resumidor.generar_resumen_con_openai(CHUNK_CUANTIA, "ficha_parte1", str(tmp_path))
+    mensaje = transporte_falso.peticiones[0]["messages"][-1]["content"]
+    assert "Devuelve solo estos campos de la plantilla (el resto no se necesita): cuantia." in mensaje
+
+def test_sin_enrutado_no_se_omite_nada(monkeypatch):
+    monkeypatch.setattr(enrutador, "ENRUTAR_CHUNKS", False)
+    assert campos_no_relevantes(CHUNK_FIRMAS, campos_plantilla()) == ()
+
+def test_limpieza_de_campos_que_ningun_chunk_relleno():
+    # Con enrutado, un campo que no se pide a ningún chunk llega a la limpieza como None
+    ficha = sanear_json_final({"cuantia": None, "lugares_presentacion": None})
+    assert ficha["cuantia"] == []
+    assert len(ficha["lugares_presentacion"]["presencial"]) == 1
+    assert len(ficha["lugares_presentacion"]["online"]) == 1
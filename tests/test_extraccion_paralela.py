@@ -0,0 +1,50 @@
+import docx
+
+import scripts.extractor_texto as extractor_texto
+from scripts.extractor_texto import extraer_documentos, planificar_tareas_extraccion, unir_textos_documentos
+
+PAGINAS = [f"Artículo {i}. Página {i} de la convocatoria.\nTexto propio de la página {i}." for i in range(1, 7)]
+
+def crear_docx(ruta: str, parrafos: list[str]) -> str:
+    documento = docx.Document()
+    for parrafo in parrafos:
+        documento.add_paragraph(parrafo)
+    documento.save(ruta)
+    return ruta
+
+def test_planificar_reparte_los_pdf_en_rangos_contiguos(crear_pdf, tmp_path, monkeypatch):
+    monkeypatch.setattr(extractor_texto, "PAGINAS_MINIMAS_POR_TAREA", 1)
+    pdf = crear_pdf("bases.pdf", PAGINAS)
+    anexo = crear_docx(str(tmp_path / "anexo.docx"), ["Anexo I"])
+
+    tareas = planificar_tareas_extraccion([pdf, anexo], 3)
+
+    assert tareas == [
+        (0, (pdf, "pdf", 0, 2)),
+        (0, (pdf, "pdf", 2, 4)),
+        (0, (pdf, "pdf", 4, 6)),
+        (1, (anexo, "docx", 0, None)),
+    ]
+
+def test_extraccion_paralela_igual_a_secuencial(crear_pdf, tmp_path, monkeypatch):
+    monkeypatch.setattr(extractor_texto, "PAGINAS_MINIMAS_POR_TAREA", 1)
+    rutas = [
+        crear_pdf("bases.pdf", PAGINAS),
+        crear_docx(str(tmp_path / "anexo.docx"), ["ANEXO I", "Modelo de solicitud"]),
+        crear_pdf("extracto.pdf", ["Extracto de la convocatoria."]),
+    ]
+
+    secuencial = extraer_documentos(rutas, max_procesos=1)
+    paralelo = extraer_documentos(rutas, max_procesos=2)
+
+    assert [d.texto for d in paralelo] == [d.texto for d in secuencial]
+    assert unir_textos_documentos(paralelo) == unir_textos_documentos(secuencial)
+    assert paralelo[0].metadatos["num_paginas"] == 6
+    assert "Página 6" in paralelo[0].texto and paralelo[0].texto.index("Página 1") < paralelo[0].texto.index("Página 6")
+
+def test_archivo_no_compatible_se_omite(crear_pdf, tmp_path):
+    otro = tmp_path / "notas.txt"
+    otro.write_text("texto")
+    documentos = extraer_documentos([str(otro), crear_pdf("bases.pdf", PAGINAS[:1])], max_procesos=1)
+    assert [d.nombre for d in documentos] == ["bases.pdf"]
+    assert documentos[0].metadatos["posicion"] == 1
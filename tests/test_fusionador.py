@@ -0,0 +1,68 @@
+import json
+import itertools
+
+from scripts.fusionador import FusionadorIncremental, fusionar_jsons
+
+PARTES = {
+    0: {"resolucion": "Ayuda breve.", "tipo_ayuda": ["Natalidad"],
+        "cuantia": [{"concepto": "Por hijo", "valor": "1.500", "unidad": "€"}]},
+    1: {"resolucion": "Ayuda económica por nacimiento o adopción de hijos.", "tipo_ayuda": ["Familia"]},
+    2: {"cuantia": [{"concepto": "Por parto múltiple", "valor": "3.000", "unidad": "€"}],
+        "documentos_presentar": [{"clave": "DNI", "valor": "Copia del DNI"}]},
+}
+
+def test_resultado_no_depende_del_orden_de_llegada():
+    resultados = []
+    for orden in itertools.permutations(PARTES):
+        fusionador = FusionadorIncremental()
+        for indice in orden:
+            fusionador.agregar(indice, PARTES[indice])
+        resultados.append(fusionador.resultado())
+    assert all(r == resultados[0] for r in resultados)
+    assert resultados[0]["resolucion"] == PARTES[1]["resolucion"]
+    assert [c["concepto"] for c in resultados[0]["cuantia"]] == ["Por hijo", "Por parto múltiple"]
+
+def test_igual_que_fusionar_las_partes_en_disco(tmp_path):
+    fusionador = FusionadorIncremental()
+    for indice, data in PARTES.items():
+        fusionador.agregar(indice, data)
+        (tmp_path / f"ficha_parte{indice+1}_resumen.json").write_text(json.dumps(data), encoding="utf-8")
+
+    fusionar_jsons("ficha", str(tmp_path))
+
+    assert json.loads((tmp_path / "ficha_fusionado.json").read_text(encoding="utf-8")) == fusionador.resultado()
+
+def test_resultado_provisional_se_actualiza():
+    fusionador = FusionadorIncremental()
+    fusionador.agregar(0, PARTES[0])
+    assert fusionador.resultado()["resolucion"] == "Ayuda breve."
+    fusionador.agregar(1, PARTES[1])
+    assert fusionador.resultado()["resolucion"] == PARTES[1]["resolucion"]
+    assert fusionador.partes == 2
+
+def test_agregar_sustituye_la_parte_anterior_del_mismo_chunk():
+    fusionador = FusionadorIncremental()
+    fusionador.agregar(0, {"resolucion": "Texto de un intento anterior, más largo que el final."})
+    fusionador.agregar(0, {"resolucion": "Texto final."})
+    assert fusionador.resultado()["resolucion"] == "Texto final."
+
+def test_retirar_descarta_los_campos_del_chunk():
+    fusionador = FusionadorIncremental()
+    fusionador.agregar(0, PARTES[0])
+    fusionador.agregar_campo(1, "resolucion", "Campo adelantado de una respuesta que luego falló.")
+    fusionador.retirar(1)
+    assert fusionador.resultado()["resolucion"] == "Ayuda breve."
+
+def test_valores_sembrados_se_fusionan_sin_contar_como_parte():
+    fusionador = FusionadorIncremental()
+    fusionador.sembrar({"fecha_publicacion": "15/01/2025"})
+    assert fusionador.partes == 0
+    assert fusionador.resultado()["fecha_publicacion"] == "15/01/2025"
+
+def test_versiones_rechazadas_por_el_validador_no_se_fusionan():
+    fusionador = FusionadorIncremental()
+    larga = " ".join(["palabra"] * 60)
+    fusionador.agregar(0, {"descripcion": "Demasiado corta."})
+    assert fusionador.resultado()["descripcion"] is None
+    fusionador.agregar(1, {"descripcion": larga})
+    assert fusionador.resultado()["descripcion"] == larga
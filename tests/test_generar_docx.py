@@ -0,0 +1,73 @@
+import os
+import json
+import zipfile
+
+import docx
+
+import scripts.generar_docx as generar_docx
+from scripts.generar_docx import generar_docx_desde_dict, generar_docx_lote, cargar_fichas
+
+def ficha(n: int) -> dict:
+    return {
+        "denominacion_normativa_nombre_ayuda": f"Ayuda número {n}",
+        "descripcion": f"Descripción de la ayuda {n}.",
+        "cuantia": [{"concepto": "Por hijo", "valor": f"{n}00", "unidad": "€"}],
+        "documentos_presentar": [{"clave": "DNI", "valor": "Copia"}],
+        "lugares_presentacion": {"presencial": [{"clave": "Registro", "valor": "Oficinas"}], "online": []},
+        "portales": [],
+    }
+
+def texto_docx(ruta: str) -> str:
+    return "\n".join(p.text for p in docx.Document(ruta).paragraphs)
+
+def test_la_plantilla_reutilizada_no_arrastra_la_ficha_anterior(tmp_path):
+    primera = generar_docx_desde_dict(ficha(1), "uno", str(tmp_path))
+    segunda = generar_docx_desde_dict(ficha(2), "dos", str(tmp_path))
+    assert "Ayuda número 1" in texto_docx(primera)
+    assert "Ayuda número 2" in texto_docx(segunda) and "Ayuda número 1" not in texto_docx(segunda)
+    assert "Portales" not in texto_docx(segunda)
+    assert sorted(os.listdir(tmp_path)) == ["dos.docx", "uno.docx"]
+
+def test_archivo_bloqueado_no_deja_temporales(tmp_path, monkeypatch):
+    def bloqueado(origen, destino):
+        raise PermissionError(destino)
+
+    monkeypatch.setattr(generar_docx.os, "replace", bloqueado)
+    assert generar_docx_desde_dict(ficha(1), "uno", str(tmp_path)) is None
+    assert os.listdir(tmp_path) == []
+
+def test_lote_con_procesos_igual_que_secuencial(tmp_path, monkeypatch):
+    monkeypatch.setattr(generar_docx, "FICHAS_POR_TAREA", 2)
+    for i in range(5):
+        carpeta = tmp_path / "json" / f"trabajo{i % 2}"
+        carpeta.mkdir(parents=True, exist_ok=True)
+        (carpeta / f"ficha{i}_limpio.json").write_text(json.dumps(ficha(i)), encoding="utf-8")
+    fichas = cargar_fichas(str(tmp_path / "json"))
+
+    secuencial = generar_docx_lote(fichas, str(tmp_path / "a"), procesos=1)
+    paralelo = generar_docx_lote(fichas, str(tmp_path / "b"), procesos=2, ruta_zip=str(tmp_path / "fichas.zip"),
+                                 ruta_combinado=str(tmp_path / "todas.docx"))
+
+    assert [r["nombre"] for r in paralelo] == [r["nombre"] for r in secuencial] == [n for n, _ in fichas]
+    assert all(r["error"] is None for r in paralelo)
+    assert [texto_docx(r["docx"]) for r in paralelo] == [texto_docx(r["docx"]) for r in secuencial]
+    assert paralelo[0]["docx"] == str(tmp_path / "b" / "trabajo0" / "ficha0_limpio.docx")
+    with zipfile.ZipFile(tmp_path / "fichas.zip") as paquete:
+        assert sorted(paquete.namelist()) == sorted(f"{n}.docx" for n, _ in fichas)
+    combinado = texto_docx(str(tmp_path / "todas.docx"))
+    assert all(f"Ayuda número {i}" in combinado for i in range(5))
+
+def test_lote_con_procesos_no_usa_fork(tmp_path, monkeypatch):
+    contextos = []
+
+    class Pool(generar_docx.ProcessPoolExecutor):
+        def __init__(self, *args, mp_context=None, **kwargs):
+            contextos.append(mp_context)
+            super().__init__(*args, mp_context=mp_context, **kwargs)
+
+    monkeypatch.setattr(generar_docx, "ProcessPoolExecutor", Pool)
+    monkeypatch.setattr(generar_docx, "FICHAS_POR_TAREA", 1)
+    resultados = generar_docx_lote([("uno", ficha(1)), ("dos", ficha(2))], str(tmp_path), procesos=2)
+
+    assert all(r["error"] is None for r in resultados)
+    assert [c.get_start_method() for c in contextos] in (["forkserver"], ["spawn"])
@@ -0,0 +1,145 @@
+import json
+import types
+import random
+
+import pytest
+
+import scripts.resumidor_ia as resumidor
+from scripts.json_incremental import AnalizadorJSONIncremental
+from scripts.prompt_ia import campos_plantilla
+from conftest import TransporteFalso
+
+FICHA = {
+    "denominacion_normativa_nombre_ayuda": "Ayudas \"Cheque bebé\" 2025",
+    "cuantia": [{"concepto": "Por hijo, o hija", "valor": "1.500", "unidad": "€"}],
+    "lugares_presentacion": {"presencial": [], "online": [{"clave": "Sede {electrónica}", "valor": "Red SARA"}]},
+    "resolucion": "Plazo de 3 meses.\nRecurso: \\alzada\\ [art. 121]",
+    "plazo": None,
+}
+TEXTO = "```json\n" + json.dumps(FICHA, ensure_ascii=False, indent=2) + "\n```"
+
+def trocear(texto: str, azar: random.Random) -> list[str]:
+    cortes = sorted(azar.sample(range(1, len(texto)), 25))
+    return [texto[a:b] for a, b in zip([0] + cortes, cortes + [len(texto)])]
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_cualquier_troceado_da_los_mismos_campos(semilla):
+    recibidos = []
+    analizador = AnalizadorJSONIncremental(lambda clave, valor: recibidos.append(clave))
+    for fragmento in trocear(TEXTO, random.Random(semilla)):
+        analizador.alimentar(fragmento)
+    assert analizador.completo and analizador.errores == 0
+    assert analizador.campos == FICHA
+    assert recibidos == list(FICHA)
+    assert json.loads(analizador.texto()) == FICHA
+
+def test_cada_campo_se_entrega_al_cerrarse():
+    recibidos = []
+    analizador = AnalizadorJSONIncremental(lambda clave, valor: recibidos.append(clave))
+    analizador.alimentar('{"cuantia": [{"valor": "1"}], "resolucion": "a, b')
+    assert recibidos == ["cuantia"]
+    analizador.alimentar('", ')
+    assert recibidos == ["cuantia", "resolucion"]
+
+def test_respuesta_cortada_conserva_los_campos_cerrados():
+    analizador = AnalizadorJSONIncremental()
+    analizador.alimentar(TEXTO[:TEXTO.index('"resolucion"') + 20])
+    assert not analizador.completo
+    assert analizador.campos == {k: FICHA[k] for k in ("denominacion_normativa_nombre_ayuda", "cuantia",
+                                                         "lugares_presentacion")}
+
+def test_campo_mal_formado_no_pierde_el_resto():
+    analizador = AnalizadorJSONIncremental()
+    analizador.alimentar('{"cuantia": [1,], "resolucion": "ok"} texto final {"otro": 1}')
+    assert analizador.completo and analizador.errores == 1
+    assert analizador.campos == {"resolucion": "ok"}
+
+def fragmento(contenido: str = None, uso=None):
+    delta = types.SimpleNamespace(content=contenido)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=delta)] if contenido else [], usage=uso)
+
+class TransporteTransmision(TransporteFalso):
+    """Como TransporteFalso, pero entrega la respuesta en fragmentos de 7 caracteres."""
+
+    def __init__(self, responder=None):
+        super().__init__(responder)
+        self.leidos = []
+
+    def transmitir(self, peticion: dict):
+        self.peticiones.append(peticion)
+        contenido = self.responder(peticion)
+        texto = contenido if isinstance(contenido, str) else json.dumps(contenido, ensure_ascii=False)
+        leidos = []
+        self.leidos.append(leidos)
+
+        def flujo():
+            for i in range(0, len(texto), 7):
+                leidos.append(texto[i:i + 7])
+                yield fragmento(texto[i:i + 7])
+            yield fragmento(uso=types.SimpleNamespace(prompt_tokens=100, completion_tokens=20, prompt_tokens_details=None))
+
+        return flujo()
+
+CHUNK = "Convocatoria de ayudas. La cuantía será de 1.500 euros por hijo."
+
+@pytest.fixture
+def transmision(monkeypatch):
+    transporte = TransporteTransmision()
+    monkeypatch.setattr(resumidor, "transporte", transporte)
+    monkeypatch.setattr(resumidor, "STREAMING_RESPUESTAS", True)
+    return transporte
+
+def test_streaming_corta_al_tener_los_campos_pedidos(transmision, tmp_path):
+    pedidos = [c for c in campos_plantilla() if c not in resumidor.campos_omitidos_chunk(CHUNK)]
+    # El modelo devuelve la plantilla entera: lo que sigue a los campos pedidos no se lee
+    respuesta = {c: f"valor de {c}" for c in pedidos}
+    respuesta.update(cuantia=FICHA["cuantia"], sobrante="x" * 500)
+    transmision.responder = lambda peticion: respuesta
+    recibidos = []
+
+    resumenes = resumidor.resumir_chunks([CHUNK], "ficha", carpeta_salida=str(tmp_path),
+                                         al_campo=lambda indice, clave, valor: recibidos.append((indice, clave)))
+
+    assert "sobrante" not in "".join(transmision.leidos[0])
+    assert recibidos == [(0, c) for c in pedidos]
+    assert resumidor.parsear_json_generado(resumenes[0])["cuantia"] == FICHA["cuantia"]
+
+def test_streaming_truncado_usa_lo_recuperado(transmision, tmp_path):
+    transmision.responder = lambda peticion: TEXTO[:TEXTO.index('"resolucion"')]
+    resultado = resumidor.generar_resumen_con_openai(CHUNK, "ficha_parte1", str(tmp_path))
+    assert resumidor.parsear_json_generado(resultado)["cuantia"] == FICHA["cuantia"]
+
+class ErrorHTTP(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+class TransporteCortado(TransporteTransmision):
+    """El primer intento adelanta algunos campos y se corta con un 503; el segundo falla con un 400."""
+
+    def transmitir(self, peticion: dict):
+        if self.peticiones:
+            self.peticiones.append(peticion)
+            raise ErrorHTTP(400)
+        flujo = super().transmitir(peticion)
+
+        def cortado():
+            for parte in flujo:
+                if parte.usage is not None:
+                    raise ErrorHTTP(503)
+                yield parte
+
+        return cortado()
+
+def test_chunk_fallido_retira_los_campos_adelantados(monkeypatch, transmision, tmp_path):
+    transporte = TransporteCortado(lambda peticion: TEXTO[:TEXTO.index('"resolucion"')])
+    monkeypatch.setattr(resumidor, "transporte", transporte)
+    eventos = []
+
+    resumenes = resumidor.resumir_chunks([CHUNK], "ficha", carpeta_salida=str(tmp_path),
+                                         al_campo=lambda indice, clave, valor: eventos.append(("campo", clave)),
+                                         al_descartar=lambda indice: eventos.append(("descartar", indice)))
+
+    assert resumenes == [""]
+    assert len(transporte.peticiones) == 2
+    assert ("campo", "cuantia") in eventos and eventos[-1] == ("descartar", 0)
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import scripts.lote_openai as lote_openai
+import scripts.resumidor_ia as resumidor
+from scripts.cache_llm import CacheRespuestas
+from scripts.metricas import MetricasEjecucion
+from scripts.lote_openai import TransporteLoteLocal, generar_jsonl_lote, resumir_en_lote
+from conftest import FICHA_RESPUESTA
+
+CHUNKS = ["Convocatoria de ayudas, parte uno.", "", "Convocatoria de ayudas, parte tres.", "Convocatoria: parte que falla."]
+
+def responder(cuerpo: dict) -> str:
+    texto = cuerpo["messages"][-1]["content"]
+    if "falla" in texto:
+        raise RuntimeError("rechazada")
+    return json.dumps({"descripcion": "uno" if "uno" in texto else "tres"})
+
+def test_generar_jsonl_una_peticion_por_chunk_con_texto(tmp_path):
+    ruta = tmp_path / "lote.jsonl"
+    incluidas = generar_jsonl_lote(CHUNKS, "ficha", str(ruta))
+
+    lineas = [json.loads(l) for l in ruta.read_text(encoding="utf-8").splitlines()]
+    assert [l["custom_id"] for l in lineas] == ["ficha_parte1", "ficha_parte3", "ficha_parte4"]
+    assert list(incluidas) == ["ficha_parte1", "ficha_parte3", "ficha_parte4"]
+    assert lineas[0]["url"] == "/v1/chat/completions"
+    assert lineas[0]["body"]["model"] == resumidor.MODELO
+
+def test_resumir_en_lote_reparte_respuestas_y_usa_la_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(lote_openai, "CARPETA_LOTES", str(tmp_path / "lotes"))
+    monkeypatch.setattr(resumidor, "cache", CacheRespuestas(str(tmp_path / "cache")))
+    transporte = TransporteLoteLocal(str(tmp_path / "local"), responder)
+    recibidas = {}
+
+    resultado = resumir_en_lote(CHUNKS, "ficha", transporte, str(tmp_path / "json"), intervalo=0,
+                                al_completar=recibidas.__setitem__)
+
+    assert recibidas == {0: {"descripcion": "uno"}, 2: {"descripcion": "tres"}}
+    assert json.loads((tmp_path / "json" / "ficha_parte3_resumen.json").read_text()) == {"descripcion": "tres"}
+    assert not (tmp_path / "json" / "ficha_parte4_resumen.json").exists()
+    assert resultado.count("descripcion") == 2
+
+    # Segunda vez: las partes correctas salen de la caché y solo se reenvía la que falló
+    ruta = tmp_path / "segundo.jsonl"
+    recibidas.clear()
+    incluidas = generar_jsonl_lote(CHUNKS, "ficha", str(ruta), str(tmp_path / "json"), al_completar=recibidas.__setitem__)
+    assert list(incluidas) == ["ficha_parte4"]
+    assert set(recibidas) == {0, 2}
+
+CHUNK_POBRE = "Convocatoria de ayudas para las familias del municipio. " * 8
+
+@pytest.mark.parametrize("rechazada", [False, True])
+def test_lote_con_enrutado_usa_el_modelo_de_la_clave_de_cache(tmp_path, monkeypatch, transporte_falso, rechazada):
+    monkeypatch.setattr(resumidor, "ENRUTAR_MODELO", True)
+    monkeypatch.setattr(lote_openai, "CARPETA_LOTES", str(tmp_path / "lotes"))
+    monkeypatch.setattr(resumidor, "cache", CacheRespuestas(str(tmp_path / "cache")))
+    ligera = {"tipo_ayuda": ["Inventado"]} if rechazada else {"tipo_ayuda": ["Natalidad"]}
+    cuerpos = []
+    transporte = TransporteLoteLocal(str(tmp_path / "local"), lambda cuerpo: cuerpos.append(cuerpo) or json.dumps(ligera))
+    metricas = MetricasEjecucion()
+
+    resultado = resumir_en_lote([CHUNK_POBRE], "ficha", transporte, str(tmp_path / "json"), intervalo=0, metricas=metricas)
+
+    assert [(c["model"], c["max_tokens"]) for c in cuerpos] == [(resumidor.MODELO_LIGERO, resumidor.MAX_TOKENS_LIGERO)]
+    # Rechazada por el validador: se repite con el modelo principal fuera del lote, como en línea
+    assert [p["model"] for p in transporte_falso.peticiones] == ([resumidor.MODELO] if rechazada else [])
+    assert [p["modelo"] for p in metricas.peticiones] == [resumidor.MODELO_LIGERO] + ([resumidor.MODELO] if rechazada else [])
+    assert [e["escalado"] for e in metricas.enrutado] == [rechazada]
+    final = FICHA_RESPUESTA if rechazada else ligera
+    assert json.loads(resultado) == final
+
+    # La caché guarda la respuesta final con la clave que usa el modo en línea
+    clave = resumidor.clave_cache_chunk(CHUNK_POBRE, resumidor.campos_omitidos_chunk(CHUNK_POBRE))
+    assert json.loads(resumidor.cache.obtener(clave)) == final
+    transporte_falso.peticiones.clear()
+    assert json.loads(resumidor.generar_resumen_con_openai(CHUNK_POBRE, "ficha_parte1", str(tmp_path / "json"))) == final
+    assert transporte_falso.peticiones == []
@@ -0,0 +1,58 @@
+import os
+import json
+import time
+
+import lotes
+from main import carpetas_salida
+
+def test_normalizar_nombre_trabajo():
+    assert lotes.normalizar_nombre_trabajo(" Ayudas natalidad 2025/Badajoz ") == "Ayudas_natalidad_2025_Badajoz"
+    assert lotes.normalizar_nombre_trabajo("../..") == "trabajo"
+
+def test_cargar_trabajos_desde_carpeta(tmp_path):
+    for nombre, archivos in {"b ayuda": ["bases.pdf", "notas.txt"], "a_ayuda": ["anexo.docx"], "vacia": ["x.txt"]}.items():
+        (tmp_path / nombre).mkdir()
+        for archivo in archivos:
+            (tmp_path / nombre / archivo).write_bytes(b"")
+
+    trabajos = lotes.cargar_trabajos_desde_carpeta(str(tmp_path))
+
+    assert [t["nombre"] for t in trabajos] == ["a_ayuda", "b_ayuda"]
+    assert [os.path.basename(d) for d in trabajos[1]["documentos"]] == ["bases.pdf"]
+
+def test_cargar_trabajos_desde_manifiesto_resuelve_rutas_relativas(tmp_path):
+    manifiesto = tmp_path / "trabajos.json"
+    manifiesto.write_text(json.dumps({"trabajos": [{"nombre": "Uno", "documentos": ["docs/a.pdf", "/abs/b.pdf"]}, {}]}))
+
+    trabajos = lotes.cargar_trabajos_desde_manifiesto(str(manifiesto))
+
+    assert trabajos == [
+        {"nombre": "Uno", "documentos": [str(tmp_path / "docs" / "a.pdf"), "/abs/b.pdf"]},
+        {"nombre": "trabajo_2", "documentos": []},
+    ]
+
+def test_carpetas_salida_por_trabajo():
+    carpetas = carpetas_salida("uno")
+    assert set(carpetas) == {"txt", "json", "docx", "logs"}
+    assert all(os.path.basename(c) == "uno" for c in carpetas.values())
+    assert len({os.path.dirname(c) for c in carpetas.values()}) == 4
+
+def test_ejecutar_lote_conserva_el_orden_y_aisla_errores(monkeypatch):
+    recibidos = {}
+
+    def procesar(rutas, nombre_base, carpetas, trabajo=None, metricas=None):
+        if trabajo == "falla":
+            raise RuntimeError("documento ilegible")
+        time.sleep(0.05 if trabajo == "lento" else 0)
+        recibidos[trabajo] = carpetas
+        return {"estado": "ok"}
+
+    monkeypatch.setattr(lotes, "procesar_convocatoria", procesar)
+    trabajos = [{"nombre": n, "documentos": [f"/d/{n}.pdf"]} for n in ("lento", "falla", "rapido")]
+
+    resultados = lotes.ejecutar_lote(trabajos, max_trabajos=3)
+
+    assert [r["nombre"] for r in resultados] == ["lento", "falla", "rapido"]
+    assert [r["estado"] for r in resultados] == ["ok", "error", "ok"]
+    assert resultados[1]["detalle"] == "documento ilegible"
+    assert recibidos["lento"]["json"] != recibidos["rapido"]["json"]
@@ -0,0 +1,110 @@
+import os
+import json
+
+import pytest
+
+import main
+import scripts.manifiesto as manifiesto_mod
+import scripts.extractor_texto as extractor_texto
+import scripts.resumidor_ia as resumidor
+from scripts.manifiesto import Manifiesto, huella_dependencias
+
+def test_etapa_vigente_hasta_que_cambian_entradas_o_salidas(tmp_path):
+    salida = tmp_path / "salida.txt"
+    salida.write_text("texto")
+    manifiesto = Manifiesto(str(tmp_path / "manifiesto.json"))
+    manifiesto.registrar("extraccion", "h1", [str(salida)])
+
+    recargado = Manifiesto(str(tmp_path / "manifiesto.json"))
+    assert recargado.vigente("extraccion", "h1")
+    assert not recargado.vigente("extraccion", "h2")
+    assert not Manifiesto(str(tmp_path / "manifiesto.json"), forzar=True).vigente("extraccion", "h1")
+
+    salida.write_text("editado a mano")
+    assert not recargado.vigente("extraccion", "h1")
+
+def test_huella_cambia_con_el_codigo_de_la_etapa(tmp_path, monkeypatch):
+    (tmp_path / "dep.py").write_text("version = 1")
+    monkeypatch.setattr(manifiesto_mod, "RAIZ", str(tmp_path))
+    monkeypatch.setitem(manifiesto_mod.DEPENDENCIAS_ETAPA, "resumen", ["dep.py"])
+    manifiesto = Manifiesto(str(tmp_path / "m.json"))
+    antes = (manifiesto.huella("resumen", "x"), huella_dependencias("resumen"))
+
+    (tmp_path / "dep.py").write_text("version = 2")
+
+    despues = (manifiesto.huella("resumen", "x"), huella_dependencias("resumen"))
+    assert antes[0] != despues[0] and antes[1] != despues[1]
+
+def test_reutilizar_partes_sigue_a_los_chunks_desplazados(tmp_path):
+    carpeta = tmp_path / "json"
+    manifiesto = Manifiesto(str(tmp_path / "m.json"))
+    carpeta.mkdir()
+    for i, valor in enumerate(["a", "b", "c"]):
+        (carpeta / f"ficha_parte{i+1}_resumen.json").write_text(json.dumps({"descripcion": valor}))
+    manifiesto.registrar_partes("ficha", str(carpeta), ["ha", "hb", "hc"])
+
+    # Se inserta un chunk nuevo al principio y desaparece el último
+    reutilizados = Manifiesto(str(tmp_path / "m.json")).reutilizar_partes("ficha", str(carpeta), ["hnuevo", "ha", "hb"])
+
+    assert reutilizados == {1: {"descripcion": "a"}, 2: {"descripcion": "b"}}
+    assert sorted(os.listdir(carpeta)) == ["ficha_parte2_resumen.json", "ficha_parte3_resumen.json"]
+    assert json.loads((carpeta / "ficha_parte2_resumen.json").read_text()) == {"descripcion": "a"}
+
+def test_reutilizar_partes_sin_archivos_de_parte(tmp_path):
+    manifiesto = Manifiesto(str(tmp_path / "m.json"))
+    manifiesto.registrar_partes("ficha", str(tmp_path / "json"), ["ha", "hb"], {0: {"descripcion": "a"}, 1: {"descripcion": "b"}})
+
+    reutilizados = Manifiesto(str(tmp_path / "m.json")).reutilizar_partes("ficha", str(tmp_path / "json"), ["hb"])
+    assert reutilizados == {0: {"descripcion": "b"}}
+
+@pytest.fixture
+def convocatoria(crear_pdf, tmp_path, monkeypatch, transporte_falso):
+    # Sin almacén: solo el manifiesto decide qué se repite
+    monkeypatch.setattr(main, "obtener_almacen", lambda: None)
+    paginas = [f"Artículo {i}. Convocatoria de ayudas a la natalidad.\n" + "Texto de la base reguladora. " * 60
+               for i in range(1, 5)]
+    rutas = [crear_pdf("bases.pdf", paginas)]
+    carpetas = {clave: str(tmp_path / "salidas" / clave) for clave in ("txt", "json", "docx", "logs")}
+
+    def ejecutar():
+        antes = len(transporte_falso.peticiones)
+        resultado = main.procesar_convocatoria(rutas, "ficha", carpetas)
+        assert resultado["estado"] == "ok"
+        return len(transporte_falso.peticiones) - antes
+
+    return ejecutar
+
+def test_segunda_ejecucion_no_llama_al_modelo(convocatoria):
+    assert convocatoria() > 1
+    assert convocatoria() == 0
+
+def test_sin_guardar_partes_tambien_se_reutilizan(convocatoria, monkeypatch):
+    monkeypatch.setattr(resumidor, "GUARDAR_PARTES", False)
+    assert convocatoria() > 1
+    assert convocatoria() == 0
+
+def test_cambio_en_el_codigo_del_resumen_invalida_las_partes(convocatoria, tmp_path, monkeypatch):
+    (tmp_path / "resumidor.py").write_text("version = 1")
+    monkeypatch.setattr(manifiesto_mod, "RAIZ", str(tmp_path))
+    monkeypatch.setitem(manifiesto_mod.DEPENDENCIAS_ETAPA, "resumen", ["resumidor.py"])
+    llamadas = convocatoria()
+
+    (tmp_path / "resumidor.py").write_text("version = 2")
+
+    assert convocatoria() == llamadas
+
+def test_dependencias_de_extraccion_y_resumen():
+    # El chunker decide qué líneas son estructurales; el validador, cuándo se escala de modelo
+    assert "scripts/chunker.py" in manifiesto_mod.DEPENDENCIAS_ETAPA["extraccion"]
+    assert "scripts/validador.py" in manifiesto_mod.DEPENDENCIAS_ETAPA["resumen"]
+    for rutas in manifiesto_mod.DEPENDENCIAS_ETAPA.values():
+        assert all(os.path.isfile(os.path.join(manifiesto_mod.RAIZ, r)) for r in rutas)
+
+def test_cambio_en_las_opciones_de_extraccion_repite_la_extraccion(convocatoria, monkeypatch, capsys):
+    convocatoria()
+    convocatoria()
+    assert "Documentos sin cambios" in capsys.readouterr().out
+
+    monkeypatch.setattr(extractor_texto, "QUITAR_REPETIDAS", False)
+    convocatoria()
+    assert "Documentos sin cambios" not in capsys.readouterr().out
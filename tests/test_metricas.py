@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import scripts.resumidor_ia as resumidor
+from scripts.lote_openai import demultiplexar_resultados
+from scripts.metricas import MetricasEjecucion, calcular_coste, percentil, uso_desde_respuesta
+from conftest import respuesta_chat
+
+def test_coste_con_tokens_cacheados_y_lote():
+    uso = {"prompt_tokens": 1_000_000, "completion_tokens": 100_000, "cached_tokens": 400_000}
+    assert calcular_coste("gpt-4o", uso) == pytest.approx(0.6 * 2.5 + 0.4 * 1.25 + 0.1 * 10)
+    assert calcular_coste("gpt-4o", uso, lote=True) == pytest.approx(calcular_coste("gpt-4o", uso) / 2)
+    assert calcular_coste("modelo-desconocido", uso) == 0.0
+
+def test_coste_con_el_nombre_fechado_del_modelo():
+    uso = {"prompt_tokens": 1_000_000, "completion_tokens": 0}
+    assert calcular_coste("gpt-4o-2024-08-06", uso) == calcular_coste("gpt-4o", uso)
+    assert calcular_coste("gpt-4o-mini-2024-07-18", uso) == calcular_coste("gpt-4o-mini", uso)
+    assert calcular_coste("gpt-4omni", uso) == 0.0
+
+def test_coste_de_un_lote_con_modelo_fechado(tmp_path):
+    registro = {"custom_id": "ficha_parte1", "error": None, "response": {"status_code": 200, "body": {
+        "model": "gpt-4o-2024-08-06", "usage": {"prompt_tokens": 1_000_000, "completion_tokens": 0},
+        "choices": [{"message": {"content": '{"descripcion": "x"}'}}]}}}
+    metricas = MetricasEjecucion()
+    incluidas = {"ficha_parte1": {"clave": "clave", "peticion": {"model": "gpt-4o"}, "omitidos": (), "densidad": None}}
+    demultiplexar_resultados(json.dumps(registro), incluidas, str(tmp_path), metricas=metricas)
+    assert metricas.resumen()["coste_usd"] == pytest.approx(2.5 / 2)
+
+def test_uso_desde_objeto_y_desde_dict_del_lote():
+    assert uso_desde_respuesta(respuesta_chat("{}", 10, 5)) == {"prompt_tokens": 10, "completion_tokens": 5, "cached_tokens": 0}
+    lote = {"usage": {"prompt_tokens": 7, "completion_tokens": 3, "prompt_tokens_details": {"cached_tokens": 2}}}
+    assert uso_desde_respuesta(lote) == {"prompt_tokens": 7, "completion_tokens": 3, "cached_tokens": 2}
+
+def test_percentil():
+    assert percentil([], 0.95) == 0.0
+    assert percentil([3, 1, 2], 0.5) == 2
+    assert percentil(list(range(1, 101)), 0.95) == 95
+
+def test_resumen_y_prometheus(tmp_path):
+    metricas = MetricasEjecucion("natalidad")
+    with metricas.etapa("resumen"):
+        metricas.registrar_peticion("p1", "gpt-4o", 0.7, respuesta_chat("{}", 1000, 100))
+        metricas.registrar_peticion("p2", "gpt-4o", 3.0, respuesta_chat("{}", 1000, 100))
+        metricas.registrar_peticion("p3", "gpt-4o", cache=True)
+    metricas.contar("reintentos", 2)
+
+    resumen = metricas.resumen()
+    assert (resumen["peticiones"], resumen["aciertos_cache"]) == (2, 1)
+    assert resumen["prompt_tokens"] == 2000 and resumen["latencia_max"] == 3.0
+    assert resumen["contadores"] == {"reintentos": 2}
+    assert "resumen" in resumen["etapas_segundos"]
+
+    ruta = metricas.guardar_prometheus(str(tmp_path))
+    texto = open(ruta, encoding="utf-8").read()
+    assert 'fichas_peticion_latencia_segundos_bucket{trabajo="natalidad",le="1"} 1' in texto
+    assert 'fichas_peticion_latencia_segundos_bucket{trabajo="natalidad",le="+Inf"} 2' in texto
+    assert 'fichas_eventos{trabajo="natalidad",evento="reintentos"} 2' in texto
+
+    detalle = json.load(open(metricas.guardar_json(str(tmp_path / "m.json")), encoding="utf-8"))
+    assert len(detalle["detalle_peticiones"]) == 3
+
+class ErrorLimite(Exception):
+    status_code = 429
+
+def test_resumen_registra_peticiones_y_reintentos(transporte_falso, tmp_path):
+    fallos = [ErrorLimite("rate limit")]
+    responder = transporte_falso.responder
+
+    def responder_con_un_fallo(peticion):
+        if fallos:
+            raise fallos.pop()
+        return responder(peticion)
+
+    transporte_falso.responder = responder_con_un_fallo
+    metricas = MetricasEjecucion()
+    resumidor.resumir_chunks(["Convocatoria de ayudas."] * 2, "ficha", max_concurrencia=1,
+                             carpeta_salida=str(tmp_path), metricas=metricas)
+
+    resumen = metricas.resumen()
+    assert resumen["peticiones"] == 2
+    assert resumen["prompt_tokens"] == 200
+    assert resumen["contadores"]["reintentos"] == 1
+    assert metricas.progreso()["chunks_resueltos"] == 2
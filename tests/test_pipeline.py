@@ -0,0 +1,39 @@
+import scripts.pipeline as pipeline
+from scripts.pipeline import ContextoPipeline
+
+def test_contexto_extrae_una_sola_vez(crear_pdf, monkeypatch):
+    ruta = crear_pdf("bases.pdf", ["Artículo 1. Objeto\nConvocatoria de ayudas a la natalidad.",
+                                   "Artículo 2. Cuantía\nSe concederán 1.500 euros por hijo."])
+    llamadas = []
+    extraer = pipeline.extraer_documentos
+
+    def espia(rutas, *args, **kwargs):
+        llamadas.append(list(rutas))
+        return extraer(rutas, max_procesos=1)
+
+    monkeypatch.setattr(pipeline, "extraer_documentos", espia)
+    contexto = ContextoPipeline([ruta], "bases")
+
+    assert "1.500 euros" in contexto.texto_unificado
+    assert contexto.tokens
+    assert contexto.chunks(50, 10) is contexto.chunks(50, 10)
+    contexto.preextraccion
+    contexto.metadatos_documentos()
+    assert llamadas == [[ruta]]
+
+def test_usar_texto_evita_la_extraccion(monkeypatch):
+    def no_extraer(*args, **kwargs):
+        raise AssertionError("no debería extraerse")
+
+    monkeypatch.setattr(pipeline, "extraer_documentos", no_extraer)
+    contexto = ContextoPipeline(["no_existe.pdf"], "ficha")
+    contexto.usar_texto("Convocatoria de ayudas.")
+    assert contexto.chunks(10, 2)[0] == "Convocator"
+
+def test_usar_texto_invalida_tokens_y_chunks():
+    contexto = ContextoPipeline([], "ficha")
+    contexto.usar_texto("uno")
+    antes = contexto.chunks(100, 0)
+    contexto.usar_texto("dos")
+    assert antes == ["uno"] and contexto.chunks(100, 0) == ["dos"]
+    assert contexto.tokens == list(b"dos")
@@ -0,0 +1,40 @@
+from scripts.preextractor import preextraer, campos_preextraidos, campos_resueltos, normalizar_fecha
+
+TEXTO = (
+    "Extracto publicado en el BOE núm. 15, de 17 de enero de 2025. "
+    "De acuerdo con la Ley 38/2003, de 17 de noviembre, General de Subvenciones, y el "
+    "Real Decreto 887/2006, de 21 de julio, por el que se aprueba el Reglamento de la Ley 38/2003. "
+    "El plazo de presentación de solicitudes será desde el 1 de febrero de 2025 hasta el 31/03/2025. "
+    "Se concederán 1.500 € por hijo. La cuantía máxima por familia será de 3.000 euros. "
+    "La Ley 38/2003 establece que las bases se publicarán."
+)
+
+def test_normalizar_fecha():
+    assert normalizar_fecha("5 de julio de 2025") == "05/07/2025"
+    assert normalizar_fecha("1/2/2025") == "01/02/2025"
+
+def test_preextraer_candidatos():
+    resultado = preextraer(TEXTO)
+    assert resultado["fechas_publicacion"] == ["17/01/2025"]
+    assert resultado["plazos"] == [("01/02/2025", "31/03/2025")]
+    assert resultado["importes"] == ["1.500", "3.000"]
+    assert resultado["importes_maximos"] == ["3.000"]
+    assert resultado["referencias"] == [
+        "- Ley 38/2003, de 17 de noviembre, General de Subvenciones.",
+        "- Real Decreto 887/2006, de 21 de julio, por el que se aprueba el Reglamento de la Ley 38/2003.",
+    ]
+
+def test_campos_con_formato_de_plantilla():
+    campos = campos_preextraidos(preextraer(TEXTO))
+    assert campos["fecha_publicacion"] == "17/01/2025"
+    assert (campos["fecha_inicio"], campos["fecha_fin"]) == ("01/02/2025", "31/03/2025")
+    assert campos["importe_maximo"] == [{"concepto": "Importe máximo", "cantidad": "3.000 €"}]
+    assert campos["referencia_legislativa"].count("\n") == 1
+
+def test_campos_ambiguos_no_se_rellenan():
+    texto = "BOE núm. 1, de 2 de enero de 2025 y BOE núm. 9, de 10 de enero de 2025."
+    assert "fecha_publicacion" not in campos_preextraidos(preextraer(texto))
+
+def test_solo_varias_normas_resuelven_la_referencia():
+    assert campos_resueltos(preextraer(TEXTO)) == ("referencia_legislativa",)
+    assert campos_resueltos(preextraer("Según la Ley 38/2003, General de Subvenciones.")) == ()
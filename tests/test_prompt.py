@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+import scripts.prompt_ia as prompt_ia
+from scripts.prompt_ia import (construir_mensajes, construir_prefijo_prompt, campos_plantilla, calcular_max_tokens_chunk,
+                               contar_tokens_prefijo, formato_respuesta, MIN_TOKENS_CHUNK)
+
+def test_prefijo_identico_entre_chunks():
+    a = construir_mensajes("Primer chunk.")
+    b = construir_mensajes("Segundo chunk.", campos_omitidos=("cuantia",))
+    assert a[0] == b[0]
+    assert a[0]["content"] is construir_prefijo_prompt()
+    assert "Primer chunk." in a[1]["content"] and "Primer chunk." not in a[0]["content"]
+
+def test_mensaje_enumera_la_lista_mas_corta():
+    campos = campos_plantilla()
+    pocos_omitidos = construir_mensajes("x", campos_omitidos=campos[:1])[1]["content"]
+    muchos_omitidos = construir_mensajes("x", campos_omitidos=campos[1:])[1]["content"]
+    assert "No incluyas" in pocos_omitidos and campos[0] in pocos_omitidos
+    assert "Devuelve solo estos campos" in muchos_omitidos and campos[0] in muchos_omitidos
+
+def test_presupuesto_de_chunk_respeta_la_ventana(monkeypatch):
+    prefijo = contar_tokens_prefijo("gpt-4o")
+    assert calcular_max_tokens_chunk("gpt-4o", 4096, 3000) == 3000
+
+    monkeypatch.setitem(prompt_ia.CONTEXTO_MODELOS, "pequeno", prefijo + 4096 + prompt_ia.MARGEN_TOKENS + 1000)
+    assert calcular_max_tokens_chunk("pequeno", 4096, 3000) == 1000
+
+    justo = prefijo + 4096 + prompt_ia.MARGEN_TOKENS + MIN_TOKENS_CHUNK
+    monkeypatch.setitem(prompt_ia.CONTEXTO_MODELOS, "justo", justo)
+    assert calcular_max_tokens_chunk("justo", 4096, 3000) == MIN_TOKENS_CHUNK
+
+    # Si no cabe ni el chunk mínimo, falla antes de enviar peticiones que desbordarían la ventana
+    monkeypatch.setitem(prompt_ia.CONTEXTO_MODELOS, "diminuto", justo - 1)
+    with pytest.raises(ValueError):
+        calcular_max_tokens_chunk("diminuto", 4096, 3000)
+
+def test_formato_respuesta_solo_con_los_campos_pedidos():
+    campos = campos_plantilla()
+    esquema = formato_respuesta(campos[2:])["json_schema"]["schema"]
+    assert list(esquema["properties"]) == list(campos[:2])
+    assert esquema["required"] == list(campos[:2])
+    json.dumps(esquema)
@@ -0,0 +1,72 @@
+import re
+import time
+import threading
+
+import pytest
+
+import scripts.resumidor_ia as resumidor
+
+def chunks_numerados(total: int) -> list[str]:
+    return [f"Convocatoria de ayudas, bloque {i}." for i in range(total)]
+
+def test_resumir_chunks_limita_concurrencia_y_conserva_orden(transporte_falso, tmp_path):
+    en_vuelo, maximo = [0], [0]
+    lock = threading.Lock()
+
+    def responder(peticion):
+        with lock:
+            en_vuelo[0] += 1
+            maximo[0] = max(maximo[0], en_vuelo[0])
+        time.sleep(0.02)
+        with lock:
+            en_vuelo[0] -= 1
+        # Responde con el número del bloque para comprobar el orden de salida
+        bloque = re.search(r"bloque (\d+)", peticion["messages"][-1]["content"]).group(1)
+        return {"descripcion": f"parte {bloque}"}
+
+    transporte_falso.responder = responder
+    resumenes = resumidor.resumir_chunks(chunks_numerados(8), "ficha", max_concurrencia=3, carpeta_salida=str(tmp_path))
+
+    assert len(transporte_falso.peticiones) == 8
+    assert 1 < maximo[0] <= 3
+    assert [resumidor.parsear_json_generado(r)["descripcion"] for r in resumenes] == [f"parte {i}" for i in range(8)]
+    assert (tmp_path / "ficha_parte8_resumen.json").exists()
+
+class ErrorHTTP(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+def test_llamar_con_reintentos_repite_errores_reintentables():
+    llamadas = []
+
+    def funcion():
+        llamadas.append(1)
+        if len(llamadas) < 3:
+            raise ErrorHTTP(429)
+        return "ok"
+
+    assert resumidor.llamar_con_reintentos(funcion, max_reintentos=5) == "ok"
+    assert len(llamadas) == 3
+
+def test_llamar_con_reintentos_no_repite_errores_de_cliente():
+    llamadas = []
+
+    def funcion():
+        llamadas.append(1)
+        raise ErrorHTTP(400)
+
+    with pytest.raises(ErrorHTTP):
+        resumidor.llamar_con_reintentos(funcion, max_reintentos=5)
+    assert len(llamadas) == 1
+
+def test_llamar_con_reintentos_se_rinde_tras_el_maximo():
+    llamadas = []
+
+    def funcion():
+        llamadas.append(1)
+        raise ErrorHTTP(503)
+
+    with pytest.raises(ErrorHTTP):
+        resumidor.llamar_con_reintentos(funcion, max_reintentos=2)
+    assert len(llamadas) == 3
@@ -0,0 +1,118 @@
+import json
+import time
+import threading
+import http.client
+
+import pytest
+
+import lotes
+from servicio import ColaTrabajos, iniciar_servicio, leer_trabajo
+
+@pytest.fixture
+def servicio():
+    """Arranca cola y API en un puerto libre; devuelve una función que hace peticiones."""
+    arrancados = []
+
+    def arrancar(trabajadores: int = 1, max_cola: int = 4):
+        cola = ColaTrabajos(trabajadores, max_cola)
+        servidor = iniciar_servicio(cola, puerto=0)
+        arrancados.append((cola, servidor))
+
+        def peticion(metodo: str, ruta: str, cuerpo=None, crudo: bytes = None):
+            conexion = http.client.HTTPConnection("127.0.0.1", servidor.server_address[1], timeout=30)
+            datos = crudo if crudo is not None else json.dumps(cuerpo).encode("utf-8") if cuerpo is not None else None
+            conexion.request(metodo, ruta, body=datos)
+            respuesta = conexion.getresponse()
+            resultado = respuesta.status, dict(respuesta.getheaders()), json.loads(respuesta.read())
+            conexion.close()
+            return resultado
+
+        return cola, peticion
+
+    yield arrancar
+    for cola, servidor in arrancados:
+        servidor.shutdown()
+        servidor.server_close()
+        cola.detener()
+
+@pytest.fixture
+def bloqueado(monkeypatch):
+    """Trabajos que se quedan en la etapa de resumen (3 chunks) hasta que se libere el evento."""
+    liberar = threading.Event()
+
+    def procesar(documentos, nombre_base, carpetas, trabajo=None, metricas=None):
+        with metricas.etapa("resumen"):
+            metricas.contar("chunks", 3)
+            liberar.wait(30)
+        return {"estado": "ok"}
+
+    monkeypatch.setattr(lotes, "procesar_convocatoria", procesar)
+    yield liberar
+    liberar.set()
+
+@pytest.fixture
+def documento(tmp_path):
+    ruta = tmp_path / "bases.pdf"
+    ruta.write_bytes(b"%PDF")
+    return str(ruta)
+
+def esperar(condicion, limite: float = 10):
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, "tiempo de espera agotado"
+        time.sleep(0.01)
+
+@pytest.mark.parametrize("cuerpo", [[], "texto", {"documentos": []}, {"documentos": ["no_existe.pdf"]},
+                                    {"carpeta": "no_existe"}, {"carpeta": 3}, {"documentos": [1]},
+                                    {"documentos": "bases.pdf"}, {"documentos": ["/etc/hosts"], "nombre": 5}])
+def test_cuerpos_no_validos(cuerpo):
+    with pytest.raises(ValueError):
+        leer_trabajo(cuerpo)
+
+def test_nombre_del_trabajo_desde_el_documento(documento):
+    assert leer_trabajo({"documentos": [documento]}) == ("bases", [documento])
+
+def test_peticiones_no_validas_responden_400(servicio):
+    _, peticion = servicio()
+    assert peticion("POST", "/trabajos", [1, 2])[0] == 400
+    assert peticion("POST", "/trabajos", crudo=b"{no es json")[0] == 400
+    assert peticion("POST", "/trabajos", {"documentos": ["no_existe.pdf"]})[0] == 400
+    assert peticion("POST", "/trabajos", {"documentos": [1]})[0] == 400
+    assert peticion("POST", "/trabajos", {"carpeta": 3})[0] == 400
+    assert peticion("GET", "/trabajos/desconocido")[0] == 404
+
+def test_progreso_y_cola_llena(servicio, bloqueado, documento):
+    cola, peticion = servicio(trabajadores=1, max_cola=1)
+    codigo, _, primero = peticion("POST", "/trabajos", {"nombre": "uno", "documentos": [documento]})
+    assert codigo == 202
+    esperar(lambda: cola.salud()["en_curso"] == 1)
+
+    codigo, _, estado = peticion("GET", f"/trabajos/{primero['id']}")
+    assert codigo == 200 and estado["estado"] == "en_curso"
+    assert estado["progreso"]["etapa"] == "resumen" and estado["progreso"]["chunks"] == 3
+
+    # Uno en curso y uno esperando: la cola (de 1) está llena
+    codigo, _, segundo = peticion("POST", "/trabajos", {"nombre": "dos", "documentos": [documento]})
+    assert codigo == 202 and segundo["estado"] == "en_cola" and segundo["posicion"] == 1
+    codigo, cabeceras, rechazo = peticion("POST", "/trabajos", {"nombre": "tres", "documentos": [documento]})
+    assert codigo == 429 and cabeceras["Retry-After"] == "5"
+    assert rechazo["en_cola"] == 1 and rechazo["en_curso"] == 1
+
+    bloqueado.set()
+    esperar(lambda: all(t["estado"] == "ok" for t in peticion("GET", "/trabajos")[2]))
+    assert [t["nombre"] for t in peticion("GET", "/trabajos")[2]] == ["uno", "dos"]
+    assert peticion("GET", "/salud")[2]["en_curso"] == 0
+
+def test_trabajo_completo_esperando_la_respuesta(servicio, crear_pdf, transporte_falso, tmp_path, monkeypatch):
+    monkeypatch.setattr(lotes, "carpetas_salida", lambda espacio: {
+        clave: str(tmp_path / "salidas" / espacio / clave) for clave in ("txt", "json", "docx", "logs")})
+    ruta = crear_pdf("natalidad.pdf", ["Convocatoria de ayudas a la natalidad. La cuantía será de 1.500 euros."])
+    _, peticion = servicio()
+
+    codigo, _, trabajo = peticion("POST", "/trabajos", {"documentos": [ruta], "esperar": True})
+
+    assert codigo == 200
+    assert trabajo["nombre"] == "natalidad" and trabajo["estado"] == "ok"
+    assert trabajo["resultado"]["documentos"] == ["natalidad.pdf"]
+    assert len(transporte_falso.peticiones) == 1
+    assert (tmp_path / "salidas" / "natalidad" / "json" / "ficha_unificada_limpio.json").exists()
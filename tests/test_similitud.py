@@ -0,0 +1,52 @@
+import random
+import itertools
+
+import pytest
+
+from scripts.similitud import (UnionConjuntos, unir_similares, jaccard, firma_palabras, agrupar_casi_duplicados,
+                               deduplicar_casi_iguales)
+
+def particion(conjuntos: UnionConjuntos, n: int) -> set:
+    grupos = {}
+    for i in range(n):
+        grupos.setdefault(conjuntos.raiz(i), set()).add(i)
+    return {frozenset(g) for g in grupos.values()}
+
+def fuerza_bruta(firmas: list[frozenset], umbral: float) -> set:
+    # Todos los pares; las firmas vacías no se unen con nada
+    conjuntos = UnionConjuntos(len(firmas))
+    for i, j in itertools.combinations(range(len(firmas)), 2):
+        if firmas[i] and firmas[j] and jaccard(firmas[i], firmas[j]) >= umbral:
+            conjuntos.unir(i, j)
+    return particion(conjuntos, len(firmas))
+
+@pytest.mark.parametrize("umbral", [0.3, 0.5, 0.7, 0.9, 1.0])
+def test_filtrado_por_prefijo_igual_que_comparar_todos_los_pares(umbral):
+    azar = random.Random(int(umbral * 10))
+    vocabulario = [f"p{i}" for i in range(25)]
+    base = [frozenset(azar.sample(vocabulario, azar.randint(1, 8))) for _ in range(40)]
+    # Variantes con una palabra de más o de menos para que haya pares cerca del umbral
+    firmas = base + [b | {azar.choice(vocabulario)} for b in base] + [frozenset(list(b)[1:]) for b in base]
+
+    conjuntos = UnionConjuntos(len(firmas))
+    unir_similares(firmas, umbral, conjuntos, list(range(len(firmas))))
+
+    assert particion(conjuntos, len(firmas)) == fuerza_bruta(firmas, umbral)
+
+def test_firma_sin_tildes_ni_palabras_vacias():
+    assert firma_palabras("Copia del DNI de la Solicitante") == frozenset({"copia", "dni", "solicitante"})
+    assert firma_palabras("Declaración") == firma_palabras("declaracion")
+
+def test_deduplicar_conserva_el_mas_completo_y_el_orden():
+    items = [
+        {"clave": "DNI", "valor": "Copia del DNI del solicitante"},
+        {"clave": "Empadronamiento", "valor": "Certificado"},
+        {"clave": "DNI solicitante", "valor": "Copia del DNI del solicitante, compulsada"},
+    ]
+    resultado = deduplicar_casi_iguales(items, texto=lambda d: d["valor"], umbral=0.7)
+    assert resultado == [items[2], items[1]]
+
+def test_importes_distintos_no_se_unen():
+    items = [{"concepto": "Por hijo", "valor": "1.500"}, {"concepto": "Por cada hijo", "valor": "3.000"}]
+    grupos = agrupar_casi_duplicados(items, texto=lambda d: d["concepto"], exacto=lambda d: d["valor"], umbral=0.5)
+    assert grupos == [[0], [1]]
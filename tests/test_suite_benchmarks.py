@@ -0,0 +1,34 @@
+import json
+
+import suite
+from corpus_sintetico import generar_corpus
+from scripts.extractor_texto import extraer_textos_unificados
+
+def test_corpus_determinista(tmp_path):
+    a = extraer_textos_unificados(generar_corpus(str(tmp_path / "a"), 3, semilla=7))
+    b = extraer_textos_unificados(generar_corpus(str(tmp_path / "b"), 3, semilla=7))
+    c = extraer_textos_unificados(generar_corpus(str(tmp_path / "c"), 3, semilla=8))
+    assert a.replace("/a/", "/") == b.replace("/b/", "/")
+    assert a != c
+    assert "Artículo" in a and "€" in a
+
+def test_ficha_sintetica_determinista():
+    texto = "Artículo 4. La cuantía será de 1.200,00 € por persona."
+    assert suite.ficha_sintetica(texto) == suite.ficha_sintetica(texto)
+    assert suite.ficha_sintetica(texto)["cuantia"][0]["valor"] == "1.200,00 €"
+
+def test_comparar_con_lineas_base():
+    base = {"fusion@10": {"segundos": 1.0, "rss_mb": 100.0}}
+    assert suite.comparar_con_lineas_base({"fusion@10": {"segundos": 1.2, "rss_mb": 110.0}}, base, 0.25) == []
+    regresiones = suite.comparar_con_lineas_base({"fusion@10": {"segundos": 2.0, "rss_mb": 200.0}}, base, 0.25)
+    assert len(regresiones) == 2
+
+def test_suite_completa_guarda_y_compara_lineas_base(tmp_path):
+    ruta = tmp_path / "lineas_base.json"
+    argumentos = ["--paginas", "3", "--repeticiones", "1", "--lineas-base", str(ruta)]
+
+    assert suite.main(argumentos + ["--guardar-linea-base"]) == 0
+    lineas_base = json.loads(ruta.read_text(encoding="utf-8"))
+    assert set(lineas_base) == {f"{etapa}@3" for etapa in suite.ETAPAS}
+
+    assert suite.main(argumentos + ["--etapas", "chunking,fusion", "--tolerancia", "100"]) == 0
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+from openai import OpenAI
+
+import scripts.resumidor_ia as resumidor
+from scripts.servidor_simulado import SimuladorOpenAI, iniciar_servidor
+from scripts.transporte_llm import (TransporteOpenAI, TransporteGrabacion, TransporteReproduccion, GrabacionNoEncontrada,
+                                    clave_peticion)
+
+def responder_ficha(cuerpo: dict) -> str:
+    return json.dumps({"descripcion": cuerpo["messages"][-1]["content"][-20:]})
+
+@pytest.fixture
+def servidor():
+    def arrancar(**opciones):
+        simulador = SimuladorOpenAI(latencia=0.0, variacion=0.0, responder=responder_ficha, **opciones)
+        servidores.append(iniciar_servidor(simulador))
+        return simulador, OpenAI(base_url=f"http://127.0.0.1:{servidores[-1].server_address[1]}/v1",
+                                 api_key="simulado", max_retries=0)
+
+    servidores = []
+    yield arrancar
+    for s in servidores:
+        s.shutdown()
+        s.server_close()
+
+def peticion(texto: str) -> dict:
+    return resumidor.construir_peticion([{"role": "user", "content": texto}])
+
+def test_clave_no_depende_del_orden_de_las_claves():
+    assert clave_peticion({"a": 1, "b": 2}) == clave_peticion({"b": 2, "a": 1})
+
+def test_grabar_y_reproducir_sin_red(servidor, tmp_path):
+    _, cliente = servidor()
+    grabacion = TransporteGrabacion(TransporteOpenAI(cliente), str(tmp_path))
+    en_vivo = grabacion.completar(peticion("Convocatoria uno"))
+
+    reproducida = TransporteReproduccion(str(tmp_path)).completar(peticion("Convocatoria uno"))
+
+    assert reproducida.choices[0].message.content == en_vivo.choices[0].message.content
+    assert reproducida.usage.prompt_tokens == en_vivo.usage.prompt_tokens
+
+def test_peticion_no_grabada_falla_sin_reintentos(tmp_path):
+    with pytest.raises(GrabacionNoEncontrada):
+        TransporteReproduccion(str(tmp_path)).completar(peticion("nunca grabada"))
+    assert not resumidor.es_error_reintentable(GrabacionNoEncontrada("x"))
+
+def test_servidor_simulado_limita_y_el_resumidor_reintenta(servidor, tmp_path, monkeypatch):
+    simulador, cliente = servidor(tasa_limite=0.4, retry_after=0.0, semilla=1)
+    monkeypatch.setattr(resumidor, "transporte", TransporteOpenAI(cliente))
+    chunks = [f"Convocatoria de ayudas, bloque {i}." for i in range(6)]
+
+    resumenes = resumidor.resumir_chunks(chunks, "ficha", max_concurrencia=3, carpeta_salida=str(tmp_path))
+
+    estadisticas = simulador.estadisticas()
+    assert all(resumenes)
+    assert estadisticas["ok"] == 6 and estadisticas["limitadas"] > 0
+    assert estadisticas["peticiones"] == 6 + estadisticas["limitadas"]
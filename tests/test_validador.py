@@ -0,0 +1,101 @@
+import re
+import json
+import random
+
+from scripts.validador import (EVALUADOR, evaluar_json_por_reglas, campos_rechazados, auditar_archivo, esta_vacio,
+                               contiene_euros, tipos_ayuda_validos)
+
+def evaluar_referencia(json_data):
+    # Evaluador regla a regla anterior a EvaluadorReglas: el compilado debe dar lo mismo
+    resultado = {}
+    score_total = 0
+    campos_evaluados = 0
+
+    def add_result(campo, valido, motivo=None):
+        nonlocal score_total, campos_evaluados
+        campos_evaluados += 1
+        resultado[campo] = {"valido": valido}
+        if valido:
+            score_total += 1
+        elif motivo:
+            resultado[campo]["motivo"] = motivo
+
+    tipo_ayuda = json_data.get("tipo_ayuda", [])
+    valido = all(t in tipos_ayuda_validos() for t in tipo_ayuda)
+    add_result("tipo_ayuda", valido, "Contiene términos no válidos" if not valido else None)
+    descripcion = json_data.get("descripcion", "")
+    add_result("descripcion", len(descripcion.split()) > 50 and not contiene_euros(descripcion),
+               "Muy corta o contiene valores económicos")
+    ref = json_data.get("referencia_legislativa", "")
+    add_result("referencia_legislativa",
+               isinstance(ref, str) and ref.strip().startswith("- ") and ref.strip().endswith(".") and "\n" in ref,
+               "Debe ser lista multilínea con guiones y punto final")
+    cuantia = json_data.get("cuantia", [])
+    add_result("cuantia", any(e.get("valor") and not esta_vacio(e.get("unidad")) for e in cuantia if isinstance(e, dict)),
+               "No contiene valores claros o unidades")
+    online = json_data.get("lugares_presentacion", {}).get("online", [])
+    add_result("lugares_presentacion.online", any("Red SARA" in e.get("valor", "") for e in online if isinstance(e, dict)),
+               "Falta mención obligatoria a Red SARA")
+    usuario = json_data.get("usuario", "")
+    add_result("usuario", bool(usuario and usuario.upper() not in ["USUARIO", "FICHAS MIGUEL"]), "Valor genérico o vacío")
+    docs = json_data.get("documentos_presentar", [])
+    add_result("documentos_presentar", sum(1 for d in docs if d.get("clave") and d.get("valor")) >= 2,
+               "Menos de 2 documentos completos")
+    req = json_data.get("requisitos_acceso", "")
+    add_result("requisitos_acceso", len([x for x in re.split(r"[\n\-\•]+", req) if len(x.strip()) > 20]) >= 2,
+               "No está estructurado como lista clara")
+    frase = json_data.get("frase_publicitaria", "")
+    if frase:
+        add_result("frase_publicitaria", len(frase.split()) <= 30, "Supera 30 palabras")
+    else:
+        add_result("frase_publicitaria", False, "Campo vacío")
+    resultado["score_total"] = round(score_total / campos_evaluados, 2) if campos_evaluados else 0.0
+    return resultado
+
+def ficha_aleatoria(azar: random.Random) -> dict:
+    tipos = sorted(tipos_ayuda_validos())
+    opciones = {
+        "tipo_ayuda": [[], [azar.choice(tipos)], [azar.choice(tipos), "Inventado"]],
+        "descripcion": ["", "Corta.", " ".join(["palabra"] * 60), " ".join(["palabra"] * 60) + " 1.500 €"],
+        "referencia_legislativa": ["", "- Ley 38/2003.", "- Ley 38/2003.\n- Real Decreto 887/2006.", "Ley 38/2003\nDecreto"],
+        "cuantia": [[], [{"concepto": "Hijo", "valor": "1.500", "unidad": "€"}], [{"concepto": "Hijo", "valor": "1.500", "unidad": ""}]],
+        "lugares_presentacion": [{"online": []}, {"online": [{"clave": "x", "valor": "Sede y Red SARA"}]}, {"presencial": []}],
+        "usuario": ["", "usuario", "Familias con hijos"],
+        "documentos_presentar": [[], [{"clave": "DNI", "valor": "Copia"}], [{"clave": "DNI", "valor": "Copia"}, {"clave": "NIE", "valor": "Copia"}]],
+        "requisitos_acceso": ["", "- Estar empadronado en el municipio\n- Tener hijos menores de edad", "- Corto\n- Breve"],
+        "frase_publicitaria": ["", "Ayuda para familias.", " ".join(["muy"] * 31)],
+    }
+    return {campo: azar.choice(valores) for campo, valores in opciones.items() if azar.random() < 0.9}
+
+def test_evaluador_compilado_igual_al_de_referencia():
+    azar = random.Random(3)
+    fichas = [ficha_aleatoria(azar) for _ in range(500)]
+    for ficha in fichas:
+        assert evaluar_json_por_reglas(ficha) == evaluar_referencia(ficha)
+
+def test_evaluar_lote_igual_a_evaluar_una_a_una():
+    azar = random.Random(5)
+    fichas = [ficha_aleatoria(azar) for _ in range(200)]
+    # Fichas mal formadas: el lote cae a la comprobación valor a valor sin romperse
+    fichas += [{"tipo_ayuda": None, "cuantia": "texto", "documentos_presentar": ["DNI"]}, {"lugares_presentacion": None}]
+    assert EVALUADOR.evaluar_lote(fichas) == [EVALUADOR.evaluar(f) for f in fichas]
+
+def test_campos_rechazados_ignora_los_vacios():
+    ficha = {"descripcion": "Corta.", "usuario": "", "frase_publicitaria": "Ayuda para familias."}
+    assert campos_rechazados(ficha) == ["descripcion"]
+    assert campos_rechazados(ficha, ("usuario",)) == []
+
+def test_auditar_archivo_por_bloques(tmp_path):
+    azar = random.Random(7)
+    fichas = [ficha_aleatoria(azar) for _ in range(23)]
+    for i, ficha in enumerate(fichas):
+        carpeta = tmp_path / f"trabajo{i % 3}"
+        carpeta.mkdir(exist_ok=True)
+        (carpeta / f"f{i}_limpio.json").write_text(json.dumps(ficha), encoding="utf-8")
+    (tmp_path / "roto_limpio.json").write_text("{", encoding="utf-8")
+
+    informe = auditar_archivo(str(tmp_path), tamano_bloque=5)
+
+    assert informe == auditar_archivo(str(tmp_path), tamano_bloque=1000)
+    assert informe["fichas"] == 23
+    assert informe["reglas"]["usuario"]["aprobadas"] == sum(evaluar_referencia(f)["usuario"]["valido"] for f in fichas)